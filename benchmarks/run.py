@@ -0,0 +1,322 @@
+"""Benchmarks for pkg's own overhead.
+
+uv, bun and go are replaced by stub executables on PATH, so the suite runs
+offline and measures pkg rather than the toolchains. Results are appended to a
+JSON history file and compared with the previous entry to catch regressions.
+
+    python benchmarks/run.py                # full run, append to history
+    python benchmarks/run.py --quick        # fewer iterations
+    python benchmarks/run.py -k hooks       # only benchmarks matching "hooks"
+    python benchmarks/run.py --no-save      # do not write the history
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from pkg import __version__  # noqa: E402
+from pkg.config import Config, find_project_root  # noqa: E402
+from pkg.hooks import run_hooks  # noqa: E402
+from pkg.plugins import PluginIndex, PluginManager  # noqa: E402
+from pkg.tools.base import ToolOptions  # noqa: E402
+from pkg.tools.bash import BashTool  # noqa: E402
+from pkg.tools.uv import UvTool  # noqa: E402
+
+DEFAULT_HISTORY = Path(__file__).resolve().parent / "history.json"
+REGRESSION_THRESHOLD = 0.20
+STUB_TOOLS = ["uv", "bun", "go"]
+
+SAMPLE_CONFIG = """[pkg]
+tool = "uv"
+
+[hooks.build]
+pre = ["echo lint", { name = "types", cmd = "echo types", parallel = true }]
+post = ["echo done"]
+
+[hooks.test]
+pre = []
+post = []
+
+[plugins]
+enabled = []
+"""
+
+BENCHMARKS: dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    def register(fn: Callable) -> Callable:
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Callable[[], object] | None = None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "repeat": repeat,
+    }
+
+
+@contextlib.contextmanager
+def stub_toolchains(work: Path):
+    """Put no-op uv/bun/go executables first on PATH."""
+    bin_dir = work / "stub-bin"
+    bin_dir.mkdir()
+    for tool in STUB_TOOLS:
+        stub = bin_dir / tool
+        stub.write_text("#!/bin/sh\nexit 0\n")
+        stub.chmod(0o755)
+    old_path = os.environ["PATH"]
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{old_path}"
+    try:
+        yield bin_dir
+    finally:
+        os.environ["PATH"] = old_path
+
+
+@benchmark("cli_cold_start_version")
+def bench_cli_cold_start(work: Path, quick: bool) -> dict:
+    args = [sys.executable, "-m", "pkg.cli", "--version"]
+    return measure(
+        lambda: subprocess.run(args, check=True, stdout=subprocess.DEVNULL),
+        repeat=5 if quick else 20,
+    )
+
+
+@benchmark("cli_build_uv_stubbed")
+def bench_cli_build(work: Path, quick: bool) -> dict:
+    project = work / "build-project"
+    project.mkdir()
+    (project / "pkg.toml").write_text('[pkg]\ntool = "uv"\n')
+    (project / "main.py").write_text("print('hi')\n")
+    args = [sys.executable, "-m", "pkg.cli", "build", "--no-cache"]
+    return measure(
+        lambda: subprocess.run(args, cwd=project, check=True, stdout=subprocess.DEVNULL),
+        repeat=3 if quick else 10,
+    )
+
+
+@benchmark("config_load")
+def bench_config_load(work: Path, quick: bool) -> dict:
+    project = work / "config-project"
+    project.mkdir()
+    (project / "pkg.toml").write_text(SAMPLE_CONFIG)
+    return measure(lambda: Config.load(project), repeat=200 if quick else 2000)
+
+
+def bench_find_project_root(depth: int) -> Callable:
+    def run(work: Path, quick: bool) -> dict:
+        root = work / f"root-depth-{depth}"
+        leaf = root.joinpath(*[f"d{i}" for i in range(depth)])
+        leaf.mkdir(parents=True)
+        (root / "pkg.toml").write_text(SAMPLE_CONFIG)
+        return measure(lambda: find_project_root(leaf), repeat=100 if quick else 1000)
+    return run
+
+
+for _depth in (1, 8, 32, 64):
+    benchmark(f"find_project_root_depth_{_depth}")(bench_find_project_root(_depth))
+
+
+def _fake_plugin_site(work: Path, count: int) -> Path:
+    site = work / f"site-{count}"
+    dist_info = site / "fake_pkg_plugins-1.0.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: fake-pkg-plugins\nVersion: 1.0\n")
+    (dist_info / "RECORD").write_text("")
+    lines = ["[pkg.plugins]"] + [f"plugin{i} = fake_pkg_plugins:Plugin{i}" for i in range(count)]
+    (dist_info / "entry_points.txt").write_text("\n".join(lines) + "\n")
+
+    body = ["from pkg.plugins import Plugin", ""]
+    for i in range(count):
+        body += [
+            f"class Plugin{i}(Plugin):",
+            "    @property",
+            "    def name(self):",
+            f"        return 'plugin{i}'",
+            "",
+        ]
+    (site / "fake_pkg_plugins.py").write_text("\n".join(body))
+    return site
+
+
+def bench_plugins(count: int, cached: bool) -> Callable:
+    def run(work: Path, quick: bool) -> dict:
+        site = _fake_plugin_site(work, count)
+        sys.path.insert(0, str(site))
+        index = PluginIndex(work / f"plugin-index-{count}-{cached}.json")
+        try:
+            def discover():
+                sys.modules.pop("fake_pkg_plugins", None)
+                PluginManager(index).discover_plugins()
+
+            def drop_index():
+                index.path.unlink(missing_ok=True)
+
+            setup = None if cached else drop_index
+            return measure(discover, repeat=5 if quick else 30, setup=setup)
+        finally:
+            sys.path.remove(str(site))
+    return run
+
+
+for _count in (10, 100):
+    benchmark(f"discover_plugins_{_count}_scan")(bench_plugins(_count, cached=False))
+    benchmark(f"discover_plugins_{_count}_indexed")(bench_plugins(_count, cached=True))
+
+
+@benchmark("run_hooks_100_trivial")
+def bench_run_hooks(work: Path, quick: bool) -> dict:
+    hooks = ["true"] * 100
+    return measure(lambda: run_hooks(hooks, "pre", "build", work), repeat=2 if quick else 5)
+
+
+def bench_bash_test(jobs: int) -> Callable:
+    def run(work: Path, quick: bool) -> dict:
+        project = work / f"bash-project-{jobs}"
+        tests = project / "tests"
+        tests.mkdir(parents=True)
+        for i in range(1000):
+            (tests / f"t{i:04d}_test.sh").write_text("exit 0\n")
+        tool = BashTool(project, ToolOptions(jobs=jobs))
+        return measure(tool.test, repeat=1 if quick else 3)
+    return run
+
+
+benchmark("bash_test_1000_serial")(bench_bash_test(1))
+benchmark("bash_test_1000_parallel")(bench_bash_test(0))
+
+
+@benchmark("clean_large_tree")
+def bench_clean(work: Path, quick: bool) -> dict:
+    project = work / "clean-project"
+    files = 2000 if quick else 20000
+
+    def populate():
+        if project.exists():
+            shutil.rmtree(project)
+        venv = project / ".venv" / "lib"
+        for i in range(files // 100):
+            d = venv / f"pkg{i}"
+            d.mkdir(parents=True)
+            for j in range(100):
+                (d / f"m{j}.py").write_text("")
+        for i in range(50):
+            cache = project / "src" / f"mod{i}" / "__pycache__"
+            cache.mkdir(parents=True)
+            (cache / "x.pyc").write_text("")
+
+    return measure(lambda: UvTool(project).clean(), repeat=2 if quick else 5, setup=populate)
+
+
+def load_history(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text())
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(previous: dict | None, results: dict) -> list[str]:
+    if previous is None:
+        return []
+    regressions = []
+    for name, stats in results.items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        change = stats["median"] / before["median"] - 1
+        marker = ""
+        if change > REGRESSION_THRESHOLD:
+            marker = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:40s} {before['median'] * 1000:10.3f}ms -> "
+              f"{stats['median'] * 1000:10.3f}ms ({change:+.0%}){marker}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    parser.add_argument("-k", dest="select", help="only run benchmarks whose name contains this")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY)
+    parser.add_argument("--no-save", action="store_true", help="do not append to the history")
+    args = parser.parse_args()
+
+    selected = {n: fn for n, fn in BENCHMARKS.items() if not args.select or args.select in n}
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="pkg-bench-") as tmp:
+        work = Path(tmp)
+        os.environ["PKG_CACHE_DIR"] = str(work / "cache")
+        with stub_toolchains(work):
+            for name, fn in selected.items():
+                bench_dir = work / name
+                bench_dir.mkdir()
+                results[name] = stats = fn(bench_dir, args.quick)
+                print(f"{name:40s} median {stats['median'] * 1000:10.3f}ms  "
+                      f"min {stats['min'] * 1000:10.3f}ms  (n={stats['repeat']})")
+
+    history = load_history(args.history)
+    machine = platform.node()
+    previous = next(
+        (h for h in reversed(history) if h["machine"] == machine and h["quick"] == args.quick),
+        None,
+    )
+    if previous is not None:
+        print(f"\nCompared with {previous['version']} ({previous['revision']}, {previous['timestamp']}):")
+    regressions = compare(previous, results)
+
+    if not args.no_save:
+        history.append({
+            "version": __version__,
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": machine,
+            "python": platform.python_version(),
+            "quick": args.quick,
+            "results": results,
+        })
+        args.history.write_text(json.dumps(history, indent=2) + "\n")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {REGRESSION_THRESHOLD:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
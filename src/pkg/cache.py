@@ -0,0 +1,474 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+from . import __version__
+from .console import console
+from .tools.base import TRASH_DIR, BuildTool, CleanPatterns
+
+MAX_BUILD_ENTRIES = 5
+MAX_ENV_STORE_BYTES = 5 * 1024 ** 3
+FICLONE = 0x40049409  # linux/fs.h
+
+# Never part of a fingerprint, at any depth
+IGNORED_NAMES = {".git", ".hg", ".svn", "__pycache__", ".DS_Store", TRASH_DIR}
+# Variables naming the CI session a command runs in, most specific first
+SESSION_VARS = ["PKG_SESSION", "GITHUB_RUN_ID", "CI_PIPELINE_ID", "BUILDKITE_BUILD_ID", "CIRCLE_WORKFLOW_ID"]
+
+
+def user_cache_dir() -> Path:
+    override = os.environ.get("PKG_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME")
+    return (Path(base) if base else Path.home() / ".cache") / "pkg"
+
+
+def project_cache_dir(project_dir: Path) -> Path:
+    resolved = project_dir.resolve()
+    key = hashlib.sha256(str(resolved).encode()).hexdigest()[:16]
+    return user_cache_dir() / "projects" / f"{resolved.name}-{key}"
+
+
+def iter_source_files(project_dir: Path, exclude: list[str]) -> Iterator[Path]:
+    """Yield project files, skipping VCS data and build artifacts matching exclude."""
+    artifacts = CleanPatterns(exclude)
+    for root, dirs, files in os.walk(project_dir):
+        top_level = Path(root) == project_dir
+        names = dirs + files
+        skipped = {
+            name for name in names
+            if name in IGNORED_NAMES or artifacts.matches(name, top_level)
+        }
+        dirs[:] = sorted(d for d in dirs if d not in skipped)
+        for name in sorted(files):
+            if name not in skipped:
+                yield Path(root) / name
+
+
+def hash_file(path: Path) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def toolchain_id(executable: str) -> str:
+    path = shutil.which(executable)
+    if path is None:
+        return f"{executable}:missing"
+    st = os.stat(path)
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def fingerprint(project_dir: Path, tool: BuildTool) -> str:
+    """Hash every input of a build: sources, lockfiles, pkg.toml and toolchain."""
+    digest = hashlib.sha256()
+    digest.update(f"pkg:{__version__}\0{tool.name}\0".encode())
+    digest.update(toolchain_id(tool.name).encode())
+    for path in iter_source_files(project_dir, tool.clean_patterns):
+        if path.is_symlink() or not path.is_file():
+            continue
+        rel = path.relative_to(project_dir).as_posix()
+        executable = os.access(path, os.X_OK)
+        digest.update(f"\0{rel}\0{int(executable)}\0".encode())
+        digest.update(hash_file(path))
+    return digest.hexdigest()
+
+
+def _copy(src: Path, dest: Path) -> None:
+    if src.is_dir():
+        shutil.copytree(src, dest, symlinks=True)
+    else:
+        shutil.copy2(src, dest)
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+class BuildCache:
+    def __init__(self, project_dir: Path, tool: BuildTool):
+        self.project_dir = project_dir
+        self.tool = tool
+        self.store_dir = project_cache_dir(project_dir) / "build"
+
+    def fingerprint(self) -> str:
+        return fingerprint(self.project_dir, self.tool)
+
+    def restore(self, key: str) -> bool:
+        """Put the recorded outputs of a green build back in place."""
+        entry = self.store_dir / key
+        manifest_path = entry / "manifest.json"
+        if not manifest_path.exists():
+            return False
+
+        manifest = json.loads(manifest_path.read_text())
+        for output in manifest["outputs"]:
+            stored = entry / output["stored"]
+            if not stored.exists() and not stored.is_symlink():
+                return False
+
+        for output in manifest["outputs"]:
+            dest = Path(output["path"])
+            if dest.exists() or dest.is_symlink():
+                _remove(dest)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            _copy(entry / output["stored"], dest)
+
+        os.utime(manifest_path)
+        return True
+
+    def save(self, key: str) -> None:
+        """Record the outputs of a green build under its fingerprint."""
+        entry = self.store_dir / key
+        if entry.exists():
+            shutil.rmtree(entry)
+        entry.mkdir(parents=True)
+
+        outputs = []
+        for index, path in enumerate(self.tool.build_outputs()):
+            if not path.exists():
+                continue
+            stored = str(index)
+            _copy(path, entry / stored)
+            outputs.append({"path": str(path), "stored": stored})
+
+        manifest = {"fingerprint": key, "tool": self.tool.name, "outputs": outputs}
+        (entry / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        self._prune()
+
+    def _prune(self) -> None:
+        entries = sorted(
+            (d for d in self.store_dir.iterdir() if (d / "manifest.json").exists()),
+            key=lambda d: (d / "manifest.json").stat().st_mtime,
+            reverse=True,
+        )
+        for stale in entries[MAX_BUILD_ENTRIES:]:
+            shutil.rmtree(stale)
+
+    def wrap(self, action: Callable[[], int]) -> Callable[[], int]:
+        def cached_action() -> int:
+            key = self.fingerprint()
+            if self.restore(key):
+                console.print("[green]Build up to date, restored cached outputs[/green]")
+                return 0
+
+            exit_code = action()
+            if exit_code == 0:
+                self.save(key)
+            return exit_code
+
+        return cached_action
+
+
+class InstallCache:
+    """Skips installs whose inputs match the last successful install."""
+
+    def __init__(self, project_dir: Path, tool: BuildTool):
+        self.project_dir = project_dir
+        self.tool = tool
+        self.path = project_cache_dir(project_dir) / "install.json"
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"pkg:{__version__}\0{self.tool.name}\0".encode())
+        digest.update(toolchain_id(self.tool.name).encode())
+        for path in self.tool.install_inputs():
+            rel = path.relative_to(self.project_dir).as_posix()
+            digest.update(f"\0{rel}\0".encode())
+            digest.update(hash_file(path) if path.is_file() else b"missing")
+        for item in self.tool.install_state():
+            digest.update(f"\0{item}".encode())
+        return digest.hexdigest()
+
+    def is_current(self, key: str) -> bool:
+        """True when key matches the last install and its environment still exists."""
+        try:
+            recorded = json.loads(self.path.read_text()).get("fingerprint")
+        except (OSError, ValueError):
+            return False
+        return recorded == key and all(p.exists() for p in self.tool.install_environment())
+
+    def record(self, key: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"fingerprint": key, "tool": self.tool.name}, indent=2))
+
+    def wrap(self, action: Callable[[], int], force: bool = False) -> Callable[[], int]:
+        if not self.tool.install_inputs():
+            return action
+
+        def cached_action() -> int:
+            if not force and self.is_current(self.fingerprint()):
+                console.print("[green]Dependencies up to date, skipping install[/green]")
+                return 0
+
+            exit_code = action()
+            if exit_code == 0:
+                # Installs may write lockfiles, so fingerprint the result
+                self.record(self.fingerprint())
+            return exit_code
+
+        return cached_action
+
+
+def session_id() -> str | None:
+    """The session this command runs in: PKG_SESSION, or the id of the CI run."""
+    for var in SESSION_VARS:
+        value = os.environ.get(var)
+        if value:
+            return value
+    return None
+
+
+class SessionTestCache:
+    """Reuses a passing test run within one session while the sources are unchanged.
+
+    Results live in a session file under the project cache; a different
+    session starts it afresh. Only passing runs are recorded, so failures are
+    always re-run.
+    """
+
+    def __init__(self, project_dir: Path, tool: BuildTool, session: str):
+        self.project_dir = project_dir
+        self.tool = tool
+        self.session = session
+        self.path = project_cache_dir(project_dir) / "test-session.json"
+
+    def fingerprint(self) -> str:
+        """The sources, plus the profile, since a fast run does not stand in for a full one."""
+        options = self.tool.options
+        digest = hashlib.sha256(fingerprint(self.project_dir, self.tool).encode())
+        digest.update(f"\0{options.profile}\0{int(options.coverage)}\0{int(options.parallel)}".encode())
+        return digest.hexdigest()
+
+    def _passed(self) -> list[str]:
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return []
+        return data.get("passed", []) if data.get("session") == self.session else []
+
+    def is_current(self, key: str) -> bool:
+        return key in self._passed()
+
+    def record(self, key: str) -> None:
+        passed = [k for k in self._passed() if k != key] + [key]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"session": self.session, "passed": passed}, indent=2))
+
+    def wrap(self, action: Callable[[], int], reuse: bool = True) -> Callable[[], int]:
+        def cached_action() -> int:
+            key = self.fingerprint()
+            if reuse and self.is_current(key):
+                console.print("[green]Tests already passed on these sources this session, skipping[/green]")
+                return 0
+
+            exit_code = action()
+            if exit_code == 0:
+                self.record(key)
+            return exit_code
+
+        return cached_action
+
+
+def env_store_limit() -> int:
+    override = os.environ.get("PKG_ENV_STORE_MAX_BYTES")
+    return int(override) if override else MAX_ENV_STORE_BYTES
+
+
+def tree_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def clone_tree(src: Path, dest: Path) -> None:
+    """Copy a tree, reflinking files where the filesystem supports it.
+
+    Reflinks share blocks copy-on-write, so either copy can be edited in
+    place without touching the other. Hardlinks would not: a venv rewriting
+    a ``.pth`` file would rewrite every stored snapshot too.
+    """
+    reflink = [sys.platform.startswith("linux")]
+
+    def clone_file(src_file: str, dest_file: str) -> None:
+        if reflink[0]:
+            import fcntl
+
+            try:
+                with open(src_file, "rb") as s, open(dest_file, "wb") as d:
+                    fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                shutil.copystat(src_file, dest_file)
+                return
+            except OSError:
+                reflink[0] = False
+                Path(dest_file).unlink(missing_ok=True)
+        shutil.copy2(src_file, dest_file)
+
+    shutil.copytree(src, dest, symlinks=True, copy_function=clone_file)
+
+
+class EnvironmentStore:
+    """Snapshots of installed environments (.venv, node_modules), keyed by their inputs.
+
+    Entries are evicted least recently used first once the store grows past
+    ``PKG_ENV_STORE_MAX_BYTES``.
+    """
+
+    def __init__(self, root: Path | None = None):
+        self.root = root or user_cache_dir() / "envs"
+
+    def key(self, project_dir: Path, tool: BuildTool) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{tool.name}\0{sys.platform}\0{platform.machine()}\0".encode())
+        digest.update(toolchain_id(tool.name).encode())
+        for path in tool.install_inputs():
+            rel = path.relative_to(project_dir).as_posix()
+            digest.update(f"\0{rel}\0".encode())
+            digest.update(hash_file(path) if path.is_file() else b"missing")
+        if not tool.relocatable_environment:
+            digest.update(f"\0{tool.environment_dir().resolve()}".encode())
+        return digest.hexdigest()
+
+    def restore(self, key: str, tool: BuildTool) -> bool:
+        entry = self.root / key
+        meta = entry / "meta.json"
+        if not meta.exists():
+            return False
+
+        env_dir = tool.environment_dir()
+        if env_dir.exists() or env_dir.is_symlink():
+            _remove(env_dir)
+        clone_tree(entry / "tree", env_dir)
+        if not all(p.exists() for p in tool.install_environment()):
+            # e.g. the interpreter a venv points at is gone
+            shutil.rmtree(env_dir)
+            shutil.rmtree(entry)
+            return False
+        os.utime(meta)
+        return True
+
+    def save(self, key: str, tool: BuildTool, replace: bool = False) -> None:
+        """Snapshot tool's environment under key.
+
+        An existing snapshot is kept unless ``replace`` is set, e.g. after a
+        forced install; the new one is then swapped in once it is complete.
+        """
+        entry = self.root / key
+        if (entry / "meta.json").exists() and not replace:
+            os.utime(entry / "meta.json")
+            return
+        env_dir = tool.environment_dir()
+        if not env_dir.is_dir():
+            return
+
+        tmp = self.root / f".tmp-{os.getpid()}-{key}"
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        clone_tree(env_dir, tmp / "tree")
+        meta = {"tool": tool.name, "env": str(env_dir), "size": tree_size(tmp / "tree"), "created": time.time()}
+        (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+        if entry.exists():
+            old = self.root / f".old-{os.getpid()}-{key}"
+            os.rename(entry, old)
+            os.rename(tmp, entry)
+            shutil.rmtree(old)
+        else:
+            os.rename(tmp, entry)
+        self.evict(env_store_limit(), keep=key)
+
+    def entries(self) -> list[dict]:
+        """Stored environments, most recently used first."""
+        if not self.root.is_dir():
+            return []
+        entries = []
+        for entry in self.root.iterdir():
+            meta = entry / "meta.json"
+            try:
+                data = json.loads(meta.read_text())
+                data.update(key=entry.name, used=meta.stat().st_mtime)
+            except (OSError, ValueError):
+                continue
+            entries.append(data)
+        return sorted(entries, key=lambda e: e["used"], reverse=True)
+
+    def evict(self, limit: int, keep: str | None = None) -> list[str]:
+        entries = self.entries()
+        total = sum(e["size"] for e in entries)
+        evicted = []
+        for entry in reversed(entries):
+            if total <= limit:
+                break
+            if entry["key"] == keep:
+                continue
+            shutil.rmtree(self.root / entry["key"])
+            total -= entry["size"]
+            evicted.append(entry["key"])
+        if evicted:
+            self._count("evictions", len(evicted))
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        try:
+            return json.loads((self.root / "stats.json").read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        import fcntl
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Concurrent installs (e.g. workspace members) update the same counters
+        with open(self.root / "stats.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = self.stats()
+            stats[name] = stats.get(name, 0) + amount
+            tmp = self.root / f".stats-{os.getpid()}.json"
+            tmp.write_text(json.dumps(stats, indent=2))
+            os.replace(tmp, self.root / "stats.json")
+
+    def clear(self) -> None:
+        if self.root.exists():
+            shutil.rmtree(self.root)
+
+    def wrap(
+        self,
+        project_dir: Path,
+        tool: BuildTool,
+        action: Callable[[], int],
+        force: bool = False,
+    ) -> Callable[[], int]:
+        if tool.environment_dir() is None or not tool.install_inputs():
+            return action
+
+        def cached_action() -> int:
+            if not force:
+                if self.restore(self.key(project_dir, tool), tool):
+                    self._count("hits")
+                    name = tool.environment_dir().name
+                    console.print(f"[green]Restored {name} from the environment store[/green]")
+                    return 0
+                self._count("misses")
+
+            exit_code = action()
+            if exit_code == 0:
+                self.save(self.key(project_dir, tool), tool, replace=force)
+            return exit_code
+
+        return cached_action
@@ -1,53 +1,214 @@
 import sys
+from functools import cached_property
 from pathlib import Path
 
 import click
-from rich.console import Console
-
-from . import __version__
-from .config import Config, find_project_root
-from .hooks import run_pre_hooks, run_post_hooks
-from .init import create_pkg_config
-from .init_hooks import run_init_hooks
-from .plugins import PluginManager
+
+from . import __version__, trace
+from .config import CONFIG_FILENAME, Config, ConfigCache, ConfigError, ResolvedConfig, find_project_root
 from .tools import get_tool, TOOLS
+from .tools.base import BuildTool, ToolOptions
 
-console = Console()
+# Everything beyond click and the config is imported inside the commands that
+# need it, so `pkg --version` and `pkg --help` stay cheap.
 
 
 class PkgContext:
-    def __init__(self):
-        self.project_dir = find_project_root()
-        self.config = Config.load(self.project_dir)
-        self.tool = get_tool(self.config.tool)(self.project_dir)
-        self.plugin_manager = PluginManager()
-        self.plugin_manager.load_plugins(self.config.plugins, self.config)
+    """Per-invocation state, resolved on first access."""
+
+    workspace = False
+
+    def __init__(self, cwd: Path | None = None):
+        self.cwd = cwd
+
+    @cached_property
+    def resolved(self) -> ResolvedConfig:
+        with trace.span("config.load", "config") as span_args:
+            resolved = ConfigCache().resolve(self.cwd or Path.cwd(), find_project_root)
+            span_args.update(cached=resolved.cached, reason=resolved.reason)
+        return resolved
+
+    @cached_property
+    def project_dir(self) -> Path:
+        return self.resolved.project_dir
+
+    @cached_property
+    def config(self) -> Config:
+        return self.resolved.config
+
+    @cached_property
+    def tool(self) -> BuildTool:
+        return get_tool(self.config.tool)(
+            self.project_dir, ToolOptions(jobs=self.config.jobs)
+        )
+
+    @cached_property
+    def session(self) -> str:
+        """The CI session, or a new one shared with the hooks of this command."""
+        import uuid
+
+        from .cache import session_id
+
+        return session_id() or f"pkg-{uuid.uuid4().hex}"
+
+    @cached_property
+    def plugin_manager(self):
+        from .plugins import PluginManager
+
+        with trace.span("plugins.load", "plugins", enabled=self.config.plugins):
+            plugin_manager = PluginManager()
+            plugin_manager.load_plugins(self.config.plugins, self.config)
+        return plugin_manager
 
 
 pass_context = click.make_pass_decorator(PkgContext, ensure=True)
 
 
+def reuse_option(f: callable) -> callable:
+    return click.option(
+        "--reuse/--no-reuse", default=True,
+        help="Skip tests that already passed on the same sources in this CI session (PKG_SESSION)",
+    )(f)
+
+
+def parallel_options(f: callable) -> callable:
+    f = click.option(
+        "--output", type=click.Choice(["grouped", "prefixed"]), default=None,
+        help="Print concurrent output as one block per task, or as lines prefixed with the task name",
+    )(f)
+    f = click.option(
+        "--timeout", type=click.FloatRange(min=0, min_open=True), default=None, metavar="SECONDS",
+        help="Kill tests and build steps still running after this many seconds",
+    )(f)
+    f = click.option("--fail-fast", "--ff", is_flag=True, help="Stop at the first failing test")(f)
+    f = click.option(
+        "-j", "--jobs", type=int, default=None,
+        help="Tests to run concurrently (0 = one per CPU, default from [pkg] jobs)",
+    )(f)
+    return f
+
+
+def apply_parallel_options(
+    ctx: PkgContext,
+    jobs: int | None,
+    fail_fast: bool,
+    timeout: float | None = None,
+    output: str | None = None,
+) -> None:
+    if jobs is not None:
+        ctx.tool.options.jobs = jobs
+    if fail_fast:
+        ctx.tool.options.fail_fast = True
+    if timeout is not None:
+        ctx.tool.options.timeout = timeout
+    if output is not None:
+        ctx.tool.options.output = output
+
+
+def apply_test_profile(ctx: PkgContext, name: str | None, jobs: int | None) -> None:
+    name = name or ctx.config.test_profile
+    try:
+        profile = ctx.config.get_profile(name)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--profile")
+    options = ctx.tool.options
+    options.profile = name
+    options.coverage = profile.coverage
+    options.parallel = profile.parallel
+    # A parallel profile uses every CPU unless -j or [pkg] jobs says otherwise
+    if profile.parallel and jobs is None and ctx.config.jobs == 1:
+        options.jobs = 0
+
+
+def reuse_test_results(ctx: PkgContext, command: str, reuse: bool) -> None:
+    """Skip test runs that already passed on the same sources this session.
+
+    Outside CI a session only spans this command and the pkg commands its
+    hooks run, so without hooks there is nothing to share.
+    """
+    from .cache import SessionTestCache, session_id
+
+    hooks = ctx.config.get_hooks(command)
+    if session_id() is None and not hooks.pre and not hooks.post:
+        return
+    cache = SessionTestCache(ctx.project_dir, ctx.tool, ctx.session)
+    ctx.tool.test = cache.wrap(ctx.tool.test, reuse=reuse)
+
+
 def run_with_hooks(ctx: PkgContext, command: str, action: callable) -> int:
+    from . import timings
+
+    recorder = timings.enable(ctx.project_dir)
+    try:
+        return _run_with_hooks(ctx, command, action)
+    finally:
+        timings.disable()
+        recorder.flush()
+
+
+def _run_with_hooks(ctx: PkgContext, command: str, action: callable) -> int:
+    import time
+
+    from . import timings
+    from .hooks import run_pre_hooks, run_post_hooks
+
     hooks = ctx.config.get_hooks(command)
+    # pkg commands run by hooks belong to the same session
+    env = {"PKG_SESSION": ctx.session} if hooks.pre or hooks.post else None
 
     ctx.plugin_manager.on_pre_command(command)
-    if not run_pre_hooks(hooks, command, ctx.project_dir):
-        return 1
-
-    exit_code = action()
+    with trace.span("pre hooks", "hooks", command=command):
+        if not run_pre_hooks(
+            hooks, command, ctx.project_dir, env=env, jobs=ctx.config.hook_jobs, config=ctx.config
+        ):
+            return 1
+
+    start = time.monotonic()
+    with trace.span(command, "command") as span_args:
+        exit_code = action()
+        span_args["exit_code"] = exit_code
+    timings.record("command", command, time.monotonic() - start, exit_code)
 
     if exit_code == 0:
-        run_post_hooks(hooks, command, ctx.project_dir)
+        with trace.span("post hooks", "hooks", command=command):
+            run_post_hooks(
+                hooks, command, ctx.project_dir, env=env, jobs=ctx.config.hook_jobs, config=ctx.config
+            )
 
     ctx.plugin_manager.on_post_command(command, exit_code)
     return exit_code
 
 
-@click.group()
+def run_in_workspace(command: str, fail_fast: bool = False) -> int:
+    from .workspace import run_workspace
+
+    return run_workspace(Path.cwd(), command, fail_fast=fail_fast)
+
+
+class PkgGroup(click.Group):
+    def invoke(self, ctx: click.Context):
+        try:
+            return super().invoke(ctx)
+        except ConfigError as e:
+            raise click.ClickException(f"Invalid {CONFIG_FILENAME}: {e}")
+
+
+@click.group(cls=PkgGroup)
 @click.version_option(version=__version__)
+@click.option(
+    "-w", "--workspace", is_flag=True,
+    help="Run build/test/install/clean in every workspace member",
+)
+@click.option(
+    "--trace", "trace_path", type=click.Path(dir_okay=False), default=None,
+    help="Write a Chrome trace of this run (open in Perfetto)",
+)
 @click.pass_context
-def main(ctx):
-    ctx.ensure_object(PkgContext)
+def main(ctx, workspace: bool, trace_path: str | None):
+    ctx.ensure_object(PkgContext).workspace = workspace
+    if trace_path:
+        tracer = trace.enable()
+        ctx.call_on_close(lambda: tracer.write(Path(trace_path)))
 
 
 @main.command()
@@ -55,6 +216,9 @@ def main(ctx):
 @click.option("--git/--no-git", default=True, help="Initialize git repository")
 @click.option("--tool", required=True, type=click.Choice(TOOLS.keys()), help="Build tool to use")
 def init(name: str, git: bool, tool: str):
+    from .init import create_pkg_config
+    from .init_hooks import run_init_hooks
+
     project_dir = Path.cwd() / name
     project_dir.mkdir(parents=True, exist_ok=True)
 
@@ -71,29 +235,136 @@ def init(name: str, git: bool, tool: str):
 
 
 @main.command()
+@click.option("--cache/--no-cache", default=True, help="Reuse outputs of an identical green build")
+@parallel_options
+@reuse_option
 @pass_context
-def build(ctx: PkgContext):
-    exit_code = run_with_hooks(ctx, "build", ctx.tool.build)
+def build(
+    ctx: PkgContext,
+    cache: bool,
+    jobs: int | None,
+    fail_fast: bool,
+    timeout: float | None,
+    output: str | None,
+    reuse: bool,
+):
+    from .cache import BuildCache
+
+    if ctx.workspace:
+        sys.exit(run_in_workspace("build", fail_fast))
+
+    apply_parallel_options(ctx, jobs, fail_fast, timeout, output)
+    reuse_test_results(ctx, "build", reuse)
+    action = ctx.tool.build
+    if cache:
+        action = BuildCache(ctx.project_dir, ctx.tool).wrap(action)
+    exit_code = run_with_hooks(ctx, "build", action)
     sys.exit(exit_code)
 
 
 @main.command()
+@parallel_options
+@click.option("--shard", default=None, metavar="K/N", help="Run only the K-th of N equal slices of the tests")
+@click.option("--shards", type=click.IntRange(min=1), default=None,
+              help="Split the tests into N slices and run them all locally in parallel")
+@click.option("--split-by", type=click.Choice(["duration", "size", "count"]), default=None,
+              help="Balance slices by durations (falling back to file size), file size or test count "
+                   "[default: size for --shard, duration for --shards]")
+@click.option("--durations", "durations_file", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="JSON map of test to seconds, shared by every --shard machine (see pkg stats --export)")
+@click.option("--profile", default=None,
+              help="fast (no coverage, parallel) or full (coverage gates); default from [pkg] test_profile")
+@click.option("--units-from", type=click.Path(exists=True, dir_okay=False), default=None, hidden=True)
+@reuse_option
 @pass_context
-def test(ctx: PkgContext):
-    exit_code = run_with_hooks(ctx, "test", ctx.tool.test)
+def test(
+    ctx: PkgContext,
+    jobs: int | None,
+    fail_fast: bool,
+    timeout: float | None,
+    output: str | None,
+    profile: str | None,
+    shard: str | None,
+    shards: int | None,
+    split_by: str | None,
+    durations_file: str | None,
+    units_from: str | None,
+    reuse: bool,
+):
+    if ctx.workspace:
+        sys.exit(run_in_workspace("test", fail_fast))
+
+    apply_test_profile(ctx, profile, jobs)
+    apply_parallel_options(ctx, jobs, fail_fast, timeout, output)
+    if units_from:
+        # One slice of `pkg test --shards`; the parent already ran the hooks
+        from .sharding import run_units_file
+
+        sys.exit(run_units_file(ctx.tool, Path(units_from)))
+
+    if shard and shards:
+        raise click.UsageError("--shard and --shards cannot be used together")
+    durations = None
+    if shard:
+        from .sharding import load_durations, parse_shard
+
+        try:
+            index, total = parse_shard(shard)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--shard")
+        # Machines with different timing histories would split differently
+        split_by = split_by or ("duration" if durations_file else "size")
+        if split_by == "duration":
+            if not durations_file:
+                raise click.UsageError(
+                    "--shard with --split-by duration needs --durations FILE shared by every machine"
+                )
+            try:
+                durations = load_durations(Path(durations_file))
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint="--durations")
+    elif durations_file:
+        raise click.UsageError("--durations only applies to --shard")
+    reuse_test_results(ctx, "test", reuse)
+
+    def action():
+        if shard:
+            from .sharding import run_shard
+
+            return run_shard(ctx.tool, index, total, split_by, durations)
+        if shards:
+            from .sharding import run_local_shards
+
+            return run_local_shards(ctx.tool, shards, split_by or "duration")
+        return ctx.tool.test()
+
+    exit_code = run_with_hooks(ctx, "test", action)
     sys.exit(exit_code)
 
 
 @main.command()
+@click.option("--force", is_flag=True, help="Install even if lockfiles are unchanged")
 @pass_context
-def install(ctx: PkgContext):
-    exit_code = run_with_hooks(ctx, "install", ctx.tool.install)
+def install(ctx: PkgContext, force: bool):
+    from .cache import EnvironmentStore, InstallCache
+
+    if ctx.workspace:
+        sys.exit(run_in_workspace("install"))
+
+    action = EnvironmentStore().wrap(ctx.project_dir, ctx.tool, ctx.tool.install, force=force)
+    action = InstallCache(ctx.project_dir, ctx.tool).wrap(action, force=force)
+    exit_code = run_with_hooks(ctx, "install", action)
     sys.exit(exit_code)
 
 
 @main.command()
+@click.option("--fast", is_flag=True, help="Move artifacts aside and delete them in the background")
 @pass_context
-def clean(ctx: PkgContext):
+def clean(ctx: PkgContext, fast: bool):
+    if ctx.workspace:
+        sys.exit(run_in_workspace("clean"))
+
+    ctx.tool.options.fast_clean = fast
     exit_code = run_with_hooks(ctx, "clean", ctx.tool.clean)
     sys.exit(exit_code)
 
@@ -114,6 +385,9 @@ def run(ctx: PkgContext, script: str, args: tuple):
 @pass_context
 def uplift(ctx: PkgContext):
     """Update the current project to support pkg commands."""
+    from .init import create_pkg_config
+    from .init_hooks import run_init_hooks
+
     name = ctx.project_dir.name
 
     create_pkg_config(ctx.project_dir, ctx.config.tool)
@@ -126,5 +400,241 @@ def uplift(ctx: PkgContext):
     sys.exit(exit_code)
 
 
+@main.command()
+@click.option("--explain", is_flag=True, help="Show where the config came from")
+@pass_context
+def config(ctx: PkgContext, explain: bool):
+    """Show the resolved pkg.toml configuration."""
+    from .console import console
+
+    resolved = ctx.resolved
+    cfg = resolved.config
+    if explain:
+        source = "cached" if resolved.cached else "fresh"
+        console.print(f"Project root: {resolved.project_dir}")
+        console.print(f"Config: {source} ({resolved.reason})")
+        for path in resolved.consulted:
+            console.print(f"[dim]  watching {path}[/dim]")
+
+    console.print(f"tool = {cfg.tool}", markup=False)
+    console.print(f"jobs = {cfg.jobs}", markup=False)
+    console.print(f"test_profile = {cfg.test_profile}", markup=False)
+    console.print(f"plugins = {cfg.plugins}", markup=False)
+    for command, hooks in sorted(cfg.hooks.items()):
+        console.print(f"hooks.{command}: pre={hooks.pre} post={hooks.post}", markup=False)
+    sys.exit(0)
+
+
+@main.command()
+@click.option("--since", required=True, metavar="REF", help="Git ref to compare with, e.g. origin/main")
+@click.option("--json", "as_json", is_flag=True, help="Print the affected members as a JSON list")
+@click.option("--fail-fast", is_flag=True, help="Stop at the first failing member")
+@click.argument("command", required=False, type=click.Choice(["build", "test", "install", "clean"]))
+def affected(since: str, as_json: bool, fail_fast: bool, command: str | None):
+    """List workspace members changed since REF, plus their dependents; optionally run COMMAND in them."""
+    import json
+
+    from .console import console
+    from .workspace import find_affected, find_workspace_root, run_workspace
+
+    if as_json and command:
+        raise click.UsageError("--json cannot be combined with a COMMAND, whose output would mix with it")
+    root = find_workspace_root(Path.cwd())
+    if root is None:
+        console.print(f"[red]No \\[workspace] table found in {CONFIG_FILENAME}[/red]")
+        sys.exit(1)
+    found = find_affected(root, since)
+    if found is None:
+        sys.exit(1)
+    members, reasons = found
+
+    if as_json:
+        click.echo(json.dumps(list(reasons)))
+    else:
+        console.print(f"[dim]{len(reasons)} of {len(members)} members affected since {since}[/dim]")
+        for name, reason in reasons.items():
+            console.print(f"{name} [dim]({reason})[/dim]")
+
+    if command:
+        sys.exit(run_workspace(root, command, fail_fast=fail_fast, only=set(reasons)))
+    sys.exit(0)
+
+
+@main.command("hooks")
+@click.option("--status", is_flag=True, help="Show which hooks with inputs or outputs are stale")
+@pass_context
+def list_hooks(ctx: PkgContext, status: bool):
+    """List configured hooks."""
+    from rich.markup import escape
+
+    from .console import console
+    from .hooks import HookCache, hook_key, named_hooks
+
+    if not ctx.config.hooks:
+        console.print("[dim]No hooks configured[/dim]")
+        sys.exit(0)
+
+    cache = HookCache(ctx.project_dir)
+    for command, hook_config in sorted(ctx.config.hooks.items()):
+        for phase, entries in (("pre", hook_config.pre), ("post", hook_config.post)):
+            for name, hook in named_hooks(entries):
+                line = f"{command} {phase}: {escape(name)}"
+                if status and not hook.cacheable:
+                    line += "  [dim]always runs[/dim]"
+                elif status:
+                    reason = cache.status(hook_key(command, phase, name), hook)
+                    line += f"  [yellow]stale ({reason})[/yellow]" if reason else "  [green]up to date[/green]"
+                elif name != hook.label:
+                    line += f"  [dim]{escape(hook.label)}[/dim]"
+                console.print(line)
+    sys.exit(0)
+
+
+@main.command()
+@click.option("--rebuild-index", is_flag=True, help="Rescan installed entry points")
+@pass_context
+def plugins(ctx: PkgContext, rebuild_index: bool):
+    """List installed plugins."""
+    from .console import console
+    from .plugins import PluginIndex
+
+    index = PluginIndex()
+    entries = index.rebuild() if rebuild_index else index.entries()
+    if rebuild_index:
+        console.print(f"[green]Rebuilt plugin index: {index.path}[/green]")
+
+    if not entries:
+        console.print("[dim]No plugins installed[/dim]")
+        sys.exit(0)
+
+    enabled = set(ctx.config.plugins)
+    for name, target in sorted(entries.items()):
+        marker = "[green]enabled[/green]" if name in enabled else "[dim]disabled[/dim]"
+        console.print(f"{name} ({target}) {marker}")
+    sys.exit(0)
+
+
+@main.command("env-store")
+@click.option("--clear", is_flag=True, help="Delete every stored environment")
+def env_store(clear: bool):
+    """Show stored environments and the store's hit rate."""
+    from .cache import EnvironmentStore, env_store_limit
+    from .console import console
+
+    store = EnvironmentStore()
+    if clear:
+        store.clear()
+        console.print(f"[green]Cleared {store.root}[/green]")
+        sys.exit(0)
+
+    entries = store.entries()
+    total = sum(e["size"] for e in entries)
+    console.print(f"{store.root}: {len(entries)} environments, "
+                  f"{total / 1024 ** 2:.1f} MiB of {env_store_limit() / 1024 ** 2:.0f} MiB")
+    for entry in entries:
+        console.print(f"[dim]  {entry['key'][:12]} {entry['tool']} {entry['env']} "
+                      f"{entry['size'] / 1024 ** 2:.1f} MiB[/dim]")
+
+    stats = store.stats()
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    rate = f"{hits / (hits + misses):.0%}" if hits + misses else "n/a"
+    console.print(f"hits {hits}, misses {misses} (hit rate {rate}), evictions {stats.get('evictions', 0)}")
+    sys.exit(0)
+
+
+@main.command()
+@click.option("--kind", type=click.Choice(["command", "hook", "task", "test", "shard", "stage"]), default=None,
+              help="Only show one kind of item")
+@click.option("--limit", type=int, default=10, show_default=True, help="Items to show")
+@click.option("--clear", is_flag=True, help="Forget all recorded timings")
+@click.option("--export", "export_path", type=click.Path(dir_okay=False), default=None,
+              help="Write median test durations as JSON, for pkg test --shard --durations")
+@pass_context
+def stats(ctx: PkgContext, kind: str | None, limit: int, clear: bool, export_path: str | None):
+    """Show recorded durations: p50/p95, trend and the slowest items."""
+    from rich.markup import escape
+
+    from .console import console
+    from .timings import TimingDB, has_timings, timings_path
+
+    path = timings_path(ctx.project_dir)
+    if not has_timings(ctx.project_dir):
+        console.print("[dim]No timings recorded yet[/dim]")
+        sys.exit(0)
+
+    with TimingDB(path) as db:
+        if clear:
+            db.clear()
+            console.print(f"[green]Cleared {path}[/green]")
+            sys.exit(0)
+        if export_path:
+            import json
+
+            estimates = db.estimates("test")
+            Path(export_path).write_text(json.dumps(estimates, indent=2, sort_keys=True) + "\n")
+            console.print(f"[green]Wrote {len(estimates)} test durations to {export_path}[/green]")
+            sys.exit(0)
+        summaries = db.summaries(kind)
+
+    if not summaries:
+        console.print("[dim]No timings recorded yet[/dim]")
+        sys.exit(0)
+
+    console.print(f"Slowest of {len(summaries)} items ({path})")
+    console.print(f"[dim]{'kind':<8} {'p50':>8} {'p95':>8} {'last':>8} {'runs':>5} {'trend':>7}  name[/dim]")
+    for item in summaries[:limit]:
+        trend = ""
+        if item.trend is not None:
+            color = "red" if item.trend > 0.1 else "green" if item.trend < -0.1 else "dim"
+            trend = f"[{color}]{item.trend:>+7.0%}[/{color}]"
+        failures = f" [red]({item.failures} failed)[/red]" if item.failures else ""
+        console.print(
+            f"{item.kind:<8} {item.p50:>7.2f}s {item.p95:>7.2f}s {item.last:>7.2f}s {item.runs:>5} "
+            f"{trend or ' ' * 7}  {escape(item.name)}{failures}"
+        )
+    sys.exit(0)
+
+
+@main.command()
+@click.argument("command", type=click.Choice(["test", "build"]), default="test")
+@click.option("--debounce", type=float, default=0.2, show_default=True, help="Seconds of quiet before running")
+@click.option("--poll", is_flag=True, help="Poll for changes instead of using inotify")
+@pass_context
+def watch(ctx: PkgContext, command: str, debounce: float, poll: bool):
+    """Re-run tests (only the affected ones) or the build on every change."""
+    from .watch import watch_project
+
+    sys.exit(watch_project(ctx.tool, command, debounce=debounce, poll=poll))
+
+
+@main.command()
+@click.option(
+    "--socket", "socket_file", type=click.Path(dir_okay=False), default=None,
+    help="Socket to listen on (default $PKG_DAEMON_SOCKET or the pkg cache dir)",
+)
+@click.option("--stop", is_flag=True, help="Stop the running daemon")
+@click.option("--status", is_flag=True, help="Show whether a daemon is running")
+def daemon(socket_file: str | None, stop: bool, status: bool):
+    """Serve pkg commands over a Unix socket for pkg-client."""
+    from .console import console
+    from .daemon import Daemon, request_control
+
+    path = Path(socket_file) if socket_file else None
+    if stop or status:
+        reply = request_control("stop" if stop else "status", path)
+        if reply is None:
+            console.print("[yellow]pkg daemon is not running[/yellow]")
+            sys.exit(1)
+        if stop:
+            console.print(f"[green]Stopped pkg daemon (pid {reply['stopping']})[/green]")
+        else:
+            console.print(f"pkg daemon running (pid {reply['pid']})")
+            for cwd in reply["contexts"]:
+                console.print(f"[dim]  warm: {cwd}[/dim]")
+        sys.exit(0)
+
+    sys.exit(Daemon(path).serve())
+
+
 if __name__ == "__main__":
     main()
@@ -1,21 +1,160 @@
-import tomllib
+import os
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable
 
 CONFIG_FILENAME = "pkg.toml"
+ROOT_MARKERS = (CONFIG_FILENAME, "pyproject.toml")
+MAX_CONFIG_CACHE_ENTRIES = 256
+# Hook commands starting with this call a Python function in the pkg process
+PYTHON_HOOK_PREFIX = "py:"
+
+
+class ConfigError(ValueError):
+    """pkg.toml is readable but holds a value pkg cannot use."""
+
+
+@dataclass
+class Hook:
+    """A hook declared as a table: ``{ name, cmd, needs, parallel, timeout, inputs, outputs }``.
+
+    A hook without ``parallel = true`` runs after every hook listed before it;
+    a parallel hook only waits for the hooks named in ``needs``. A hook still
+    running after ``timeout`` seconds is killed and fails.
+
+    ``cmd`` is a shell command, an argv list run without a shell, or
+    ``py:module:function`` (``py:name`` for a ``pkg.hooks`` entry point) to
+    call a Python function in the pkg process.
+
+    A hook declaring ``inputs`` or ``outputs`` globs is skipped while its
+    outputs exist and its inputs are unchanged since it last succeeded.
+    """
+
+    cmd: str | list[str]
+    name: str = ""
+    needs: list[str] = field(default_factory=list)
+    parallel: bool = False
+    timeout: float | None = None
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_data(cls, data: dict) -> "Hook":
+        _check_hook_table(data)
+        return cls(
+            cmd=data["cmd"],
+            name=data.get("name", ""),
+            needs=data.get("needs", []),
+            parallel=data.get("parallel", False),
+            timeout=data.get("timeout"),
+            inputs=data.get("inputs", []),
+            outputs=data.get("outputs", []),
+        )
+
+    @property
+    def label(self) -> str:
+        return self.cmd if isinstance(self.cmd, str) else " ".join(self.cmd)
+
+    @property
+    def is_python(self) -> bool:
+        return isinstance(self.cmd, str) and self.cmd.startswith(PYTHON_HOOK_PREFIX)
+
+    @property
+    def cacheable(self) -> bool:
+        return bool(self.inputs or self.outputs)
 
 
 @dataclass
 class HookConfig:
-    pre: list[str] = field(default_factory=list)
-    post: list[str] = field(default_factory=list)
+    pre: list[str | list[str] | Hook] = field(default_factory=list)
+    post: list[str | list[str] | Hook] = field(default_factory=list)
+
+
+def _is_str_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def _check_hook_table(data: dict) -> None:
+    name = data.get("name")
+    label = f"hook {name!r}" if isinstance(name, str) and name else f"hook {data!r}"
+    if "cmd" not in data:
+        raise ConfigError(f"{label} has no cmd")
+    if not isinstance(data["cmd"], str) and not (_is_str_list(data["cmd"]) and data["cmd"]):
+        raise ConfigError(f"{label}: cmd must be a string or a non-empty list of strings")
+    if "name" in data and not isinstance(name, str):
+        raise ConfigError(f"{label}: name must be a string")
+    for key in ("needs", "inputs", "outputs"):
+        if key in data and not _is_str_list(data[key]):
+            raise ConfigError(f"{label}: {key} must be a list of strings")
+    if "parallel" in data and not isinstance(data["parallel"], bool):
+        raise ConfigError(f"{label}: parallel must be true or false")
+    timeout = data.get("timeout")
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+        raise ConfigError(f"{label}: timeout must be a positive number of seconds")
+
+
+def _parse_hook(entry) -> str | list[str] | Hook:
+    if isinstance(entry, dict):
+        return Hook.from_data(entry)
+    if isinstance(entry, str) and entry.strip():
+        return entry
+    if _is_str_list(entry) and entry:
+        return entry
+    raise ConfigError(f"hook {entry!r} must be a command string, a non-empty list of strings or a table")
+
+
+def _parse_hooks(entries: list, where: str) -> list[str | list[str] | Hook]:
+    try:
+        if not isinstance(entries, list):
+            raise ConfigError("hooks must be a list")
+        return [_parse_hook(e) for e in entries]
+    except ConfigError as e:
+        raise ConfigError(f"{where}: {e}") from None
+
+
+@dataclass
+class Profile:
+    """How ``pkg test`` runs: with coverage gates, and/or with the tool's parallelism."""
+
+    coverage: bool = True
+    parallel: bool = False
+
+
+BUILTIN_PROFILES = {
+    "full": Profile(coverage=True, parallel=False),
+    "fast": Profile(coverage=False, parallel=True),
+}
+
+
+def _parse_profiles(data: dict) -> dict[str, Profile]:
+    """Built-in profiles, overridden or extended by ``[profiles.<name>]`` tables."""
+    profiles = dict(BUILTIN_PROFILES)
+    for name, table in data.items():
+        base = profiles.get(name, Profile())
+        profiles[name] = Profile(
+            coverage=table.get("coverage", base.coverage),
+            parallel=table.get("parallel", base.parallel),
+        )
+    return profiles
+
+
+@dataclass
+class WorkspaceConfig:
+    members: list[str] = field(default_factory=list)
+    jobs: int = 0
 
 
 @dataclass
 class Config:
     tool: str = "uv"
+    jobs: int = 1
+    hook_jobs: int = 0
+    depends_on: list[str] = field(default_factory=list)
     hooks: dict[str, HookConfig] = field(default_factory=dict)
     plugins: list[str] = field(default_factory=list)
+    workspace: WorkspaceConfig | None = None
+    test_profile: str = "full"
+    profiles: dict[str, Profile] = field(default_factory=lambda: dict(BUILTIN_PROFILES))
 
     @classmethod
     def load(cls, project_dir: Path) -> "Config":
@@ -23,36 +162,196 @@ class Config:
         if not config_path.exists():
             return cls()
 
+        import tomllib
+
         with open(config_path, "rb") as f:
             data = tomllib.load(f)
 
+        return cls.from_data(data)
+
+    @classmethod
+    def from_data(cls, data: dict) -> "Config":
         pkg_config = data.get("pkg", {})
         hooks_data = data.get("hooks", {})
         plugins_data = data.get("plugins", {})
+        workspace_data = data.get("workspace")
 
         hooks = {}
         for command, hook_data in hooks_data.items():
             hooks[command] = HookConfig(
-                pre=hook_data.get("pre", []),
-                post=hook_data.get("post", []),
+                pre=_parse_hooks(hook_data.get("pre", []), f"[hooks.{command}] pre"),
+                post=_parse_hooks(hook_data.get("post", []), f"[hooks.{command}] post"),
             )
 
         return cls(
             tool=pkg_config.get("tool", "uv"),
+            jobs=pkg_config.get("jobs", 1),
+            hook_jobs=pkg_config.get("hook_jobs", 0),
+            depends_on=pkg_config.get("depends_on", []),
             hooks=hooks,
             plugins=plugins_data.get("enabled", []),
+            workspace=WorkspaceConfig(
+                members=workspace_data.get("members", []),
+                jobs=workspace_data.get("jobs", 0),
+            ) if workspace_data is not None else None,
+            test_profile=pkg_config.get("test_profile", "full"),
+            profiles=_parse_profiles(data.get("profiles", {})),
         )
 
     def get_hooks(self, command: str) -> HookConfig:
         return self.hooks.get(command, HookConfig())
 
+    def get_profile(self, name: str) -> Profile:
+        if name not in self.profiles:
+            raise ValueError(f"Unknown test profile: {name}. Available: {', '.join(self.profiles)}")
+        return self.profiles[name]
+
 
 def find_project_root(start: Path | None = None) -> Path:
     current = start or Path.cwd()
     while current != current.parent:
-        if (current / CONFIG_FILENAME).exists():
-            return current
-        if (current / "pyproject.toml").exists():
+        if _has_root_marker(current):
             return current
         current = current.parent
     return start or Path.cwd()
+
+
+def _has_root_marker(directory: Path) -> bool:
+    return any((directory / marker).exists() for marker in ROOT_MARKERS)
+
+
+def consulted_dirs(start: Path, root: Path) -> list[Path] | None:
+    """Directories find_project_root(start) looked at to arrive at root.
+
+    Returns None when root is not on start's path, i.e. it was not found by
+    walking up from start.
+    """
+    if root != start and root not in start.parents:
+        return None
+
+    dirs = []
+    current = start
+    while current != current.parent:
+        dirs.append(current)
+        if current == root and _has_root_marker(current):
+            break
+        current = current.parent
+    return dirs
+
+
+def _stat_key(path: Path) -> list[int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+@dataclass
+class ResolvedConfig:
+    project_dir: Path
+    config: Config
+    cached: bool
+    reason: str
+    consulted: list[Path] = field(default_factory=list)
+
+
+class ConfigCache:
+    """Per-user map of cwd to project root and parsed pkg.toml.
+
+    An entry is reused while the stat data of everything find_project_root
+    consulted is unchanged: the root markers in the project root, and the
+    directories walked through below it. Creating or removing a marker in one
+    of those directories changes the directory's mtime, so they need one stat
+    each instead of a probe per marker.
+    """
+
+    def __init__(self, path: Path | None = None):
+        if path is None:
+            from .cache import user_cache_dir
+
+            path = user_cache_dir() / "config-cache.json"
+        self.path = path
+
+    def resolve(
+        self,
+        cwd: Path,
+        find_root: Callable[[Path], Path] = find_project_root,
+    ) -> ResolvedConfig:
+        entries = self._read()
+        key = str(cwd)
+        entry = entries.get(key)
+        if entry is not None:
+            stale = self._stale_path(entry)
+            if stale is None:
+                return ResolvedConfig(
+                    project_dir=Path(entry["root"]),
+                    config=Config.from_data(entry["data"]),
+                    cached=True,
+                    reason="cache hit",
+                    consulted=[Path(p) for p in entry["stats"]],
+                )
+            reason = f"{stale} changed"
+        else:
+            reason = "no cache entry"
+
+        root = find_root(cwd)
+        data = self._load_data(root)
+        config = Config.from_data(data) if data is not None else Config()
+        dirs = consulted_dirs(cwd, root)
+        if dirs is None:
+            return ResolvedConfig(root, config, cached=False, reason="root outside cwd")
+
+        found = _has_root_marker(root)
+        watched = [d for d in dirs if not (found and d == root)]
+        watched += [root / marker for marker in ROOT_MARKERS]
+        entries.pop(key, None)
+        entries[key] = {
+            "root": str(root),
+            "stats": {str(p): _stat_key(p) for p in watched},
+            "data": data or {},
+        }
+        self._write(entries)
+        return ResolvedConfig(root, config, cached=False, reason=reason, consulted=watched)
+
+    def _stale_path(self, entry: dict) -> str | None:
+        for path, recorded in entry["stats"].items():
+            if _stat_key(Path(path)) != recorded:
+                return path
+        return None
+
+    def _load_data(self, root: Path) -> dict | None:
+        config_path = root / CONFIG_FILENAME
+        if not config_path.exists():
+            return None
+
+        import tomllib
+
+        with open(config_path, "rb") as f:
+            return tomllib.load(f)
+
+    def _read(self) -> dict:
+        import json
+
+        from . import __version__
+
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != __version__:
+            return {}
+        return data.get("entries", {})
+
+    def _write(self, entries: dict) -> None:
+        import json
+
+        from . import __version__
+
+        while len(entries) > MAX_CONFIG_CACHE_ENTRIES:
+            entries.pop(next(iter(entries)))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"version": __version__, "entries": entries}, default=str))
+        os.replace(tmp, self.path)
@@ -0,0 +1,22 @@
+from typing import Any
+
+
+class LazyConsole:
+    """Stand-in for ``rich.console.Console`` that imports rich on first use."""
+
+    def __init__(self):
+        self._console = None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return getattr(self._console, name)
+
+    def reset(self) -> None:
+        """Drop the console so the next use re-detects the terminal."""
+        self._console = None
+
+
+console = LazyConsole()
@@ -0,0 +1,315 @@
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import traceback
+from pathlib import Path
+from typing import Any
+
+from .cache import user_cache_dir
+from .console import console
+
+# Kept import-light: pkg-client loads this module on every call.
+
+MAX_WARM_CONTEXTS = 32
+MAX_REQUEST_BYTES = 1 << 20
+FORWARDED_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT)
+
+
+def socket_path() -> Path:
+    override = os.environ.get("PKG_DAEMON_SOCKET")
+    if override:
+        return Path(override)
+    return user_cache_dir() / "daemon" / "daemon.sock"
+
+
+def peer_uid(sock: socket.socket) -> int | None:
+    """The uid of the process at the other end, or None where the OS cannot tell."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+def same_user(sock: socket.socket) -> bool:
+    return peer_uid(sock) in (None, os.getuid())
+
+
+def send_message(sock: socket.socket, message: dict[str, Any], fds: list[int] | None = None) -> None:
+    """Send one newline-terminated JSON message, optionally passing fds along."""
+    data = json.dumps(message).encode() + b"\n"
+    if fds:
+        sent = socket.send_fds(sock, [data], fds)
+        data = data[sent:]
+    sock.sendall(data)
+
+
+def recv_request(conn: socket.socket) -> tuple[dict[str, Any], list[int]]:
+    """Read the client's request and any file descriptors sent with it."""
+    data, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+    try:
+        while not data.endswith(b"\n"):
+            chunk = conn.recv(65536)
+            if not chunk or len(data) > MAX_REQUEST_BYTES:
+                raise ValueError("incomplete request")
+            data += chunk
+        return json.loads(data), fds
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+
+def connect(path: Path | None = None) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path or socket_path()))
+    except OSError:
+        sock.close()
+        return None
+    # The client hands over its stdio and environment; only to our own daemon.
+    if not same_user(sock):
+        print(f"pkg: ignoring {path or socket_path()}, served by another user", file=sys.stderr)
+        sock.close()
+        return None
+    return sock
+
+
+def exit_code(code: Any) -> int:
+    """Map a SystemExit code to a process exit status."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+class Daemon:
+    """Serves pkg commands from warm, per-directory PkgContexts.
+
+    Each request is handled in a forked child that takes over the client's
+    stdin/stdout/stderr, so commands run exactly as they would in-process.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or socket_path()
+        self.contexts: dict[Path, Any] = {}
+        self.listener: socket.socket | None = None
+
+    def context_for(self, cwd: Path):
+        """A PkgContext for cwd with config, tool and plugins loaded.
+
+        Rebuilt when the resolved config changes, e.g. after pkg.toml is edited.
+        """
+        from .cli import PkgContext
+        from .config import ConfigCache, find_project_root
+
+        try:
+            resolved = ConfigCache().resolve(cwd, find_project_root)
+            context = self.contexts.pop(cwd, None)
+            if context is None or context.resolved.project_dir != resolved.project_dir \
+                    or context.config != resolved.config:
+                if context is not None:
+                    console.print(f"[dim]Reloading {resolved.project_dir}[/dim]")
+                context = PkgContext(cwd)
+                for name in ("config", "tool", "plugin_manager"):
+                    getattr(context, name)
+        except Exception as e:
+            console.print(f"[yellow]Not warming {cwd}: {e}[/yellow]")
+            return None
+
+        self.contexts[cwd] = context
+        while len(self.contexts) > MAX_WARM_CONTEXTS:
+            del self.contexts[next(iter(self.contexts))]
+        return context
+
+    def serve(self) -> int:
+        if self.path.exists():
+            probe = connect(self.path)
+            if probe is not None:
+                probe.close()
+                console.print(f"[red]pkg daemon already running on {self.path}[/red]")
+                return 1
+            self.path.unlink()
+
+        self._preload()
+        self._make_directory()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            self.listener.bind(str(self.path))
+        finally:
+            os.umask(umask)
+        self.listener.listen()
+
+        # Children report their own exit codes; let the kernel reap them.
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        console.print(f"[green]pkg daemon listening on {self.path}[/green]")
+        try:
+            while True:
+                conn, _ = self.listener.accept()
+                with conn:
+                    if not same_user(conn):
+                        console.print(f"[yellow]Refused connection from uid {peer_uid(conn)}[/yellow]")
+                        continue
+                    if not self.handle(conn):
+                        break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.listener.close()
+            self.path.unlink(missing_ok=True)
+        console.print("[dim]pkg daemon stopped[/dim]")
+        return 0
+
+    def _make_directory(self) -> None:
+        """Create the socket's directory private to this user.
+
+        The default directory is ours alone and is tightened to 0700 if it
+        already exists; a directory named by PKG_DAEMON_SOCKET is only created
+        0700, never changed. The socket itself is always 0600.
+        """
+        directory = self.path.parent
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if directory == user_cache_dir() / "daemon":
+            directory.chmod(0o700)
+
+    def _preload(self) -> None:
+        from rich.console import Console  # noqa: F401
+
+        from . import cache, hooks, plugins, runner, workspace  # noqa: F401
+        from .cli import main  # noqa: F401
+        from .tools import TOOLS, get_tool
+
+        for name in TOOLS:
+            get_tool(name)
+
+    def handle(self, conn: socket.socket) -> bool:
+        """Serve one connection; returns False when asked to stop."""
+        try:
+            request, fds = recv_request(conn)
+        except (OSError, ValueError) as e:
+            console.print(f"[yellow]Bad request: {e}[/yellow]")
+            return True
+
+        try:
+            control = request.get("control")
+            if control == "stop":
+                send_message(conn, {"stopping": os.getpid()})
+                return False
+            if control == "status":
+                send_message(conn, {
+                    "pid": os.getpid(),
+                    "contexts": [str(cwd) for cwd in self.contexts],
+                })
+                return True
+            if len(fds) != 3:
+                console.print("[yellow]Bad request: expected stdin, stdout and stderr[/yellow]")
+                return True
+
+            cwd = Path(request["cwd"])
+            console.print(f"{cwd}: pkg {' '.join(request['argv'])}", style="dim", markup=False)
+            context = self.context_for(cwd)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                self._run_child(conn, request, fds, context)
+            return True
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _run_child(self, conn: socket.socket, request: dict[str, Any], fds: list[int], context) -> None:
+        """Run one command in the forked child, then exit without returning."""
+        code = 1
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            os.setsid()
+            self.listener.close()
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            console.reset()
+            send_message(conn, {"pid": os.getpid()})
+
+            from .cli import main
+
+            try:
+                main.main(args=request["argv"], prog_name="pkg", obj=context)
+                code = 0
+            except SystemExit as e:
+                code = exit_code(e.code)
+            except KeyboardInterrupt:
+                code = 130
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                send_message(conn, {"exit": code})
+            finally:
+                os._exit(code)
+
+
+def request_control(control: str, path: Path | None = None) -> dict[str, Any] | None:
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock:
+        send_message(sock, {"control": control})
+        line = sock.makefile("rb").readline()
+    return json.loads(line) if line else None
+
+
+def run_client(argv: list[str], path: Path | None = None) -> int | None:
+    """Run ``pkg argv`` in the daemon; None when no daemon is listening."""
+    sock = connect(path)
+    if sock is None:
+        return None
+
+    pid = None
+
+    def forward(signum, frame):
+        if pid is not None:
+            try:
+                os.killpg(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    previous = {sig: signal.signal(sig, forward) for sig in FORWARDED_SIGNALS}
+    try:
+        with sock:
+            request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+            send_message(sock, request, [0, 1, 2])
+            for line in sock.makefile("rb"):
+                message = json.loads(line)
+                if "pid" in message:
+                    pid = message["pid"]
+                elif "exit" in message:
+                    return message["exit"]
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+
+    print("pkg daemon closed the connection", file=sys.stderr)
+    return 1
+
+
+def client_main() -> None:
+    """Entry point for pkg-client: run through the daemon, or in-process without one."""
+    argv = sys.argv[1:]
+    code = run_client(argv)
+    if code is None:
+        from .cli import main
+
+        main(args=argv, prog_name="pkg")
+    sys.exit(code)
@@ -1,20 +1,209 @@
-import subprocess
+import hashlib
+import json
 import os
+import sys
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any, Callable
 
-from rich.console import Console
+from . import timings, trace
+from .config import PYTHON_HOOK_PREFIX, Config, Hook, HookConfig
+from .console import console
+from .runner import resolve_jobs, run_process
+from .scheduler import Node, run_graph, toposort
 
-from .config import HookConfig
 
-console = Console()
+@dataclass
+class HookContext:
+    """What a Python hook is called with."""
+
+    command: str
+    phase: str
+    project_dir: Path
+    config: Config | None = None
+    env: dict[str, str] = field(default_factory=dict)  # the environment a command hook would get
+
+
+def load_python_hook(target: str, project_dir: Path) -> Callable[[HookContext], Any]:
+    """Resolve ``module:function``, or the name of a ``pkg.hooks`` entry point.
+
+    Modules are imported with the project directory on ``sys.path``.
+    """
+    from .plugins import HOOK_ENTRY_POINT_GROUP, PluginIndex, load_target
+
+    if ":" not in target:
+        entries = PluginIndex(group=HOOK_ENTRY_POINT_GROUP).entries()
+        if target not in entries:
+            raise LookupError(f"no {HOOK_ENTRY_POINT_GROUP} entry point named {target}")
+        target = entries[target]
+    if str(project_dir) not in sys.path:
+        sys.path.insert(0, str(project_dir))
+    return load_target(target)
+
+
+def call_python_hook(target: str, context: HookContext) -> int:
+    """Call a Python hook: None or True passes, False fails, an int is an exit code.
+
+    Any other return value fails the hook.
+    """
+    try:
+        func = load_python_hook(target, context.project_dir)
+    except Exception as e:
+        console.print(f"[red]Cannot load hook {target}: {e}[/red]")
+        return 1
+    try:
+        result = func(context)
+    except Exception as e:
+        console.print(f"[red]Hook {target} raised {type(e).__name__}: {e}[/red]")
+        return 1
+    if result is None or result is True:
+        return 0
+    if result is False:
+        return 1
+    if isinstance(result, int):
+        return result
+    console.print(f"[red]Hook {target} returned {type(result).__name__}, expected None, a bool or an int[/red]")
+    return 1
+
+
+class HookCache:
+    """Per-project record of the inputs each hook last succeeded with."""
+
+    def __init__(self, project_dir: Path):
+        from .cache import project_cache_dir
+
+        self.project_dir = project_dir
+        self.path = project_cache_dir(project_dir) / "hooks.json"
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict[str, str]:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _matches(self, patterns: list[str]) -> list[Path]:
+        """Files matched by globs, including files inside matched directories."""
+        found = set()
+        for pattern in patterns:
+            for path in self.project_dir.glob(pattern):
+                if path.is_dir():
+                    found.update(p for p in path.rglob("*") if p.is_file())
+                elif path.is_file():
+                    found.add(path)
+        return sorted(found)
+
+    def digest(self, hook: Hook) -> str:
+        """Hash the hook's command and the content of every file its inputs match."""
+        from .cache import hash_file
+
+        digest = hashlib.sha256(hook.label.encode())
+        for path in self._matches(hook.inputs):
+            digest.update(f"\0{path.relative_to(self.project_dir).as_posix()}\0".encode())
+            digest.update(hash_file(path))
+        return digest.hexdigest()
+
+    def status(self, key: str, hook: Hook, digest: str | None = None) -> str | None:
+        """Why the hook has to run, or None when it is up to date."""
+        recorded = self._read().get(key)
+        if recorded is None:
+            return "never succeeded"
+        if any(not any(self.project_dir.glob(pattern)) for pattern in hook.outputs):
+            return "outputs missing"
+        if recorded != (digest or self.digest(hook)):
+            return "inputs changed"
+        return None
+
+    def record(self, key: str, digest: str) -> None:
+        with self._lock:
+            entries = self._read()
+            entries[key] = digest
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(entries, indent=2))
+            os.replace(tmp, self.path)
+
+
+def hook_key(command: str, phase: str, name: str) -> str:
+    return f"{command} {phase}: {name}"
+
+
+def named_hooks(hooks: list[str | list[str] | Hook]) -> list[tuple[str, Hook]]:
+    """Hook entries as tables, each with a unique name."""
+    named: list[tuple[str, Hook]] = []
+    for hook in hooks:
+        if not isinstance(hook, Hook):
+            hook = Hook(cmd=hook)
+        name = hook.name or hook.label
+        if not hook.name and any(n == name for n, _ in named):
+            name = f"{name} (#{len(named) + 1})"
+        named.append((name, hook))
+    return named
+
+
+def hook_graph(
+    hooks: list[str | list[str] | Hook],
+    context: HookContext,
+    buffered: bool,
+    cache: HookCache | None = None,
+) -> list[Node]:
+    """Turn hook entries into scheduler nodes.
+
+    With a cache, hooks declaring inputs or outputs are skipped while up to date.
+    """
+    def run_hook(token, hook: Hook, name: str) -> int | None:
+        header = f"[dim]Running {context.phase} hook: {hook.label}[/dim]"
+        with trace.span(f"{context.phase} hook {name}", "hook", cmd=hook.label):
+            if hook.is_python:
+                # Runs in this process, so it can be skipped but not interrupted
+                if token.cancelled:
+                    return None
+                console.print(header)
+                return call_python_hook(hook.cmd[len(PYTHON_HOOK_PREFIX):], context)
+            return run_process(
+                hook.cmd,
+                context.project_dir,
+                header=header,
+                token=token,
+                buffered=buffered,
+                shell=isinstance(hook.cmd, str),
+                env=context.env,
+                timeout=hook.timeout,
+            )
+
+    nodes: list[Node] = []
+    for name, hook in named_hooks(hooks):
+        needs = list(hook.needs)
+        if not hook.parallel:
+            needs += [n.name for n in nodes if n.name not in needs]
+
+        def action(token, hook=hook, name=name):
+            if cache is None or not hook.cacheable:
+                return run_hook(token, hook, name)
+            key = hook_key(context.command, context.phase, name)
+            # Hashed before running, so inputs edited meanwhile are picked up next time
+            digest = cache.digest(hook)
+            if cache.status(key, hook, digest) is None:
+                console.print(f"[dim]Skipping {context.phase} hook {name}: up to date[/dim]")
+                return 0
+            returncode = run_hook(token, hook, name)
+            if returncode == 0:
+                cache.record(key, digest)
+            return returncode
+
+        nodes.append(Node(name, action, needs))
+    return nodes
 
 
 def run_hooks(
-    hooks: list[str],
+    hooks: list[str | list[str] | Hook],
     phase: str,
     command: str,
     project_dir: Path,
     env: dict[str, str] | None = None,
+    jobs: int = 0,
+    config: Config | None = None,
 ) -> bool:
     if not hooks:
         return True
@@ -26,19 +215,34 @@ def run_hooks(
     if env:
         hook_env.update(env)
 
-    for hook in hooks:
-        console.print(f"[dim]Running {phase} hook: {hook}[/dim]")
-        result = subprocess.run(
-            hook,
-            shell=True,
-            cwd=project_dir,
-            env=hook_env,
-        )
-        if result.returncode != 0:
-            console.print(f"[red]Hook failed: {hook}[/red]")
-            return False
+    concurrent = any(isinstance(h, Hook) and h.parallel for h in hooks)
+    jobs = resolve_jobs(jobs) if concurrent else 1
+    context = HookContext(command, phase, project_dir, config, hook_env)
+    cache = HookCache(project_dir) if any(h.cacheable for _, h in named_hooks(hooks)) else None
+    nodes = hook_graph(hooks, context, buffered=jobs > 1, cache=cache)
+    try:
+        toposort(nodes)
+    except ValueError as e:
+        console.print(f"[red]Invalid {phase} hooks for {command}: {e}[/red]")
+        return False
+
+    results = run_graph(nodes, jobs=jobs, fail_fast=True)
+    for r in results:
+        timings.record("hook", hook_key(command, phase, r.name), r.duration, r.returncode)
+
+    durations = ", ".join(
+        f"{r.name} {r.duration:.2f}s" for r in results if r.returncode is not None
+    )
+    console.print(f"[dim]{phase} hooks: {durations}[/dim]")
+
+    failed = [r.name for r in results if r.returncode not in (0, None)]
+    for name in failed:
+        console.print(f"[red]Hook failed: {name}[/red]")
+    skipped = [r.name for r in results if r.returncode is None]
+    if skipped:
+        console.print(f"[yellow]Cancelled {phase} hooks: {', '.join(skipped)}[/yellow]")
 
-    return True
+    return not failed and not skipped
 
 
 def run_pre_hooks(
@@ -46,8 +250,10 @@ def run_pre_hooks(
     command: str,
     project_dir: Path,
     env: dict[str, str] | None = None,
+    jobs: int = 0,
+    config: Config | None = None,
 ) -> bool:
-    return run_hooks(hook_config.pre, "pre", command, project_dir, env)
+    return run_hooks(hook_config.pre, "pre", command, project_dir, env, jobs, config)
 
 
 def run_post_hooks(
@@ -55,5 +261,7 @@ def run_post_hooks(
     command: str,
     project_dir: Path,
     env: dict[str, str] | None = None,
+    jobs: int = 0,
+    config: Config | None = None,
 ) -> bool:
-    return run_hooks(hook_config.post, "post", command, project_dir, env)
+    return run_hooks(hook_config.post, "post", command, project_dir, env, jobs, config)
@@ -1,10 +1,7 @@
 from pathlib import Path
 
-from rich.console import Console
-
 from .config import CONFIG_FILENAME
-
-console = Console()
+from .console import console
 
 DEFAULT_CONFIG = '''[pkg]
 tool = "uv"
@@ -1,9 +1,7 @@
 from pathlib import Path
 from typing import Protocol
 
-from rich.console import Console
-
-console = Console()
+from ..console import console
 
 
 class InitHook(Protocol):
@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .cache import iter_source_files
+from .console import console
+from .timings import TimingDB, has_timings, timings_path
+from .tools.base import BuildTool
+
+
+@dataclass
+class Priorities:
+    """What to run first: tests that failed last time, then tests touching changed files."""
+
+    failed: set[str] = field(default_factory=set)
+    changed: list[Path] = field(default_factory=list)
+
+    def order(self, tool: BuildTool, units: list[str]) -> list[str]:
+        """Reorder units: last-failed, then recently changed, then the rest, each in input order."""
+        changed = set(self.changed)
+        recent = {unit for unit in units if _touches(tool.test_unit_path(unit), changed)}
+        if self.changed:
+            # Affected units may be whole files, such as pytest modules for node IDs
+            affected = set(tool.affected_units(self.changed) or [])
+            paths = {tool.test_unit_path(unit) for unit in affected} - {None}
+            recent |= {unit for unit in units if unit in affected or tool.test_unit_path(unit) in paths}
+        recent -= self.failed
+
+        failed = [u for u in units if u in self.failed]
+        touched = [u for u in units if u in recent]
+        if failed or touched:
+            console.print(
+                f"[dim]Running {len(failed)} previously failed and "
+                f"{len(touched)} recently changed tests first[/dim]"
+            )
+        return failed + touched + [u for u in units if u not in self.failed and u not in recent]
+
+
+def priorities(tool: BuildTool) -> Priorities | None:
+    """Priorities from the last recorded ``pkg test``, or None when nothing stands out."""
+    if not has_timings(tool.project_dir):
+        return None
+    with TimingDB(timings_path(tool.project_dir)) as db:
+        failed = db.last_failed("test")
+        last_run = db.last_started("command", "test")
+
+    changed = []
+    if last_run is not None:
+        for source in iter_source_files(tool.project_dir, tool.clean_patterns):
+            try:
+                if source.stat().st_mtime > last_run:
+                    changed.append(source)
+            except OSError:
+                continue
+    if not failed and not changed:
+        return None
+    return Priorities(failed, changed)
+
+
+def _touches(path: Path | None, changed: set[Path]) -> bool:
+    """Whether a test file, or a file in a package directory, changed."""
+    if path is None:
+        return False
+    return path in changed or any(p.parent == path for p in changed)
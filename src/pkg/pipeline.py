@@ -0,0 +1,120 @@
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from . import timings
+from .console import console
+from .runner import cancel_scope, resolve_jobs, run_process
+from .scheduler import CancelToken, Node, NodeResult, run_graph
+
+STAGING = ".staging"
+
+
+@dataclass
+class Stage:
+    """One step of a build: runs once every stage in ``needs`` has passed."""
+
+    name: str
+    action: Callable[[CancelToken], int | None]
+    needs: list[str] = field(default_factory=list)
+
+
+def command_stage(
+    name: str,
+    args: list[str],
+    cwd: Path,
+    needs: list[str] | None = None,
+    timeout: float | None = None,
+) -> Stage:
+    """A stage running one command, its output printed as a block when it exits."""
+    def action(token: CancelToken) -> int | None:
+        return run_process(
+            args, cwd, header=f"[blue]> {' '.join(args)}[/blue]", token=token, buffered=True, timeout=timeout
+        )
+
+    return Stage(name, action, needs or [])
+
+
+def call_stage(name: str, func: Callable[[], int], needs: list[str] | None = None) -> Stage:
+    """A stage calling a tool method; the commands it runs are killed on cancellation.
+
+    The method runs under a child of the pipeline's token, so its own
+    fail-fast runs stop its commands without cancelling the other stages.
+    """
+    def action(token: CancelToken) -> int | None:
+        child = CancelToken()
+        unregister = token.on_cancel(child.cancel)
+        try:
+            with cancel_scope(child):
+                returncode = func()
+        finally:
+            unregister()
+        return None if token.cancelled and returncode != 0 else returncode
+
+    return Stage(name, action, needs or [])
+
+
+def run_pipeline(
+    stages: list[Stage],
+    publish: Callable[[], int] | None = None,
+    jobs: int = 0,
+    fail_fast: bool = False,
+) -> int:
+    """Run stages concurrently as their needs allow, then publish if all passed.
+
+    At most ``jobs`` stages run at once (0 means one per CPU). A failing
+    stage skips the stages that need it; the others still run, so every
+    failure is reported, unless ``fail_fast`` cancels them. Nothing is
+    published unless every stage passed; the exit code is that of the
+    first failure.
+    """
+    nodes = [Node(stage.name, stage.action, stage.needs) for stage in stages]
+    results = run_graph(nodes, jobs=resolve_jobs(jobs), fail_fast=fail_fast)
+    for result in results:
+        timings.record("stage", result.name, result.duration, result.returncode)
+    print_summary(results)
+
+    failed = [r for r in results if r.returncode not in (0, None)]
+    if failed or any(r.returncode is None for r in results):
+        names = ", ".join(r.name for r in failed) or "cancelled"
+        console.print(f"[red]Build failed: {names}; nothing was published[/red]")
+        return failed[0].returncode if failed else 1
+    return publish() if publish else 0
+
+
+def print_summary(results: list[NodeResult]) -> None:
+    width = max(len(r.name) for r in results)
+    console.print("[dim]Stages:[/dim]")
+    for result in results:
+        status = {0: "[green]passed[/green]", None: "[yellow]cancelled[/yellow]"}.get(
+            result.returncode, "[red]failed[/red]"
+        )
+        duration = f"{result.duration:.2f}s" if result.returncode is not None else "-"
+        console.print(f"  {result.name:<{width}}  {status}  [dim]{duration}[/dim]")
+
+
+def staging_dir(output_dir: Path) -> Path:
+    """An empty directory inside output_dir that stages write their artifacts to."""
+    staging = output_dir / STAGING
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    return staging
+
+
+def publish_staged(output_dir: Path) -> list[str]:
+    """Move staged artifacts into output_dir, replacing older ones, and return their names."""
+    staging = output_dir / STAGING
+    names = sorted(entry.name for entry in staging.iterdir())
+    for name in names:
+        target = output_dir / name
+        if target.is_dir() and not target.is_symlink():
+            shutil.rmtree(target)
+        os.replace(staging / name, target)
+    staging.rmdir()
+    return names
+
+
+def discard_staged(output_dir: Path) -> None:
+    shutil.rmtree(output_dir / STAGING, ignore_errors=True)
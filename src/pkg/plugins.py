@@ -1,9 +1,21 @@
+import hashlib
+import json
+import os
+import sys
 from abc import ABC, abstractmethod
-from importlib.metadata import entry_points
+from importlib import import_module
+from pathlib import Path
 from typing import Any
 
 import click
 
+from . import trace
+from .cache import user_cache_dir
+from .console import console
+
+ENTRY_POINT_GROUP = "pkg.plugins"
+HOOK_ENTRY_POINT_GROUP = "pkg.hooks"
+
 
 class Plugin(ABC):
     @property
@@ -24,29 +36,117 @@ class Plugin(ABC):
         pass
 
 
+def search_paths() -> list[Path]:
+    return [Path(p) for p in sys.path if p and os.path.isdir(p)]
+
+
+def environment_key(paths: list[Path]) -> str:
+    """Fingerprint installed distributions without reading their metadata.
+
+    Installing, upgrading or removing a distribution touches its directory's
+    mtime and rewrites the distribution's RECORD.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f"{path}\0{path.stat().st_mtime_ns}\0".encode())
+        with os.scandir(path) as it:
+            dist_infos = sorted(e.name for e in it if e.name.endswith(".dist-info"))
+        for name in dist_infos:
+            try:
+                st = os.stat(path / name / "RECORD")
+            except OSError:
+                continue
+            digest.update(f"{name}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+
+def scan_entry_points(group: str = ENTRY_POINT_GROUP) -> dict[str, str]:
+    from importlib.metadata import entry_points
+
+    return {ep.name: ep.value for ep in entry_points(group=group)}
+
+
+def load_target(target: str) -> Any:
+    """Resolve an entry point value like ``module:Attr`` without importlib.metadata."""
+    module_name, _, attrs = target.split("[")[0].strip().partition(":")
+    obj = import_module(module_name.strip())
+    for attr in filter(None, attrs.strip().split(".")):
+        obj = getattr(obj, attr)
+    return obj
+
+
+class PluginIndex:
+    """On-disk map of entry point name to target, rebuilt when site-packages change."""
+
+    def __init__(self, path: Path | None = None, group: str = ENTRY_POINT_GROUP):
+        if path is None:
+            prefix = hashlib.sha256(sys.prefix.encode()).hexdigest()[:16]
+            name = "index" if group == ENTRY_POINT_GROUP else f"index-{group}"
+            path = user_cache_dir() / "plugins" / f"{name}-{prefix}.json"
+        self.path = path
+        self.group = group
+
+    def entries(self) -> dict[str, str]:
+        key = environment_key(search_paths())
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            data = {}
+        if data.get("key") == key:
+            return data["plugins"]
+        return self._write(key)
+
+    def rebuild(self) -> dict[str, str]:
+        return self._write(environment_key(search_paths()))
+
+    def _write(self, key: str) -> dict[str, str]:
+        plugins = scan_entry_points(self.group)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"key": key, "plugins": plugins}, indent=2))
+        os.replace(tmp, self.path)
+        return plugins
+
+
 class PluginManager:
-    def __init__(self):
+    def __init__(self, index: PluginIndex | None = None):
         self.plugins: list[Plugin] = []
+        self.index = index or PluginIndex()
+
+    def load_plugin_class(self, name: str, target: str) -> type[Plugin] | None:
+        try:
+            plugin_class = load_target(target)
+        except Exception as e:
+            console.print(f"[yellow]Failed to load plugin {name} ({target}): {e}[/yellow]")
+            return None
+        if not (isinstance(plugin_class, type) and issubclass(plugin_class, Plugin)):
+            console.print(f"[yellow]Plugin {name} ({target}) is not a Plugin subclass[/yellow]")
+            return None
+        return plugin_class
 
     def discover_plugins(self) -> dict[str, type[Plugin]]:
         discovered = {}
-        eps = entry_points(group="pkg.plugins")
-        for ep in eps:
-            try:
-                plugin_class = ep.load()
-                if issubclass(plugin_class, Plugin):
-                    discovered[ep.name] = plugin_class
-            except Exception:
-                pass
+        for name, target in self.index.entries().items():
+            plugin_class = self.load_plugin_class(name, target)
+            if plugin_class is not None:
+                discovered[name] = plugin_class
         return discovered
 
     def load_plugins(self, enabled: list[str], config: Any) -> None:
-        available = self.discover_plugins()
+        if not enabled:
+            return
+
+        available = self.index.entries()
         for name in enabled:
-            if name in available:
-                plugin = available[name]()
-                plugin.on_load(config)
-                self.plugins.append(plugin)
+            if name not in available:
+                console.print(f"[yellow]Plugin not installed: {name}[/yellow]")
+                continue
+            plugin_class = self.load_plugin_class(name, available[name])
+            if plugin_class is None:
+                continue
+            plugin = plugin_class()
+            plugin.on_load(config)
+            self.plugins.append(plugin)
 
     def register_commands(self, cli: click.Group) -> None:
         for plugin in self.plugins:
@@ -54,8 +154,10 @@ class PluginManager:
 
     def on_pre_command(self, command: str) -> None:
         for plugin in self.plugins:
-            plugin.on_pre_command(command)
+            with trace.span(f"{plugin.name}.on_pre_command", "plugin", command=command):
+                plugin.on_pre_command(command)
 
     def on_post_command(self, command: str, exit_code: int) -> None:
         for plugin in self.plugins:
-            plugin.on_post_command(command, exit_code)
+            with trace.span(f"{plugin.name}.on_post_command", "plugin", command=command):
+                plugin.on_post_command(command, exit_code)
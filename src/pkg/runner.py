@@ -1,20 +1,419 @@
+import os
+import select
+import signal
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable
 
-from rich.console import Console
+from . import timings, trace
+from .console import console
+from .scheduler import CancelToken, Node, run_graph
 
-console = Console()
+# Serializes printing of buffered output blocks and prefixed lines
+OUTPUT_LOCK = threading.Lock()
+# Recent output lines kept per task for failure reports
+TAIL_LINES = 40
+# Exit code reported for a process killed by its timeout, as timeout(1) does
+TIMEOUT_EXIT = 124
+# Once a child is killed, output is read this much longer; whatever still
+# holds the pipe after that escaped its process group and is not waited for
+DRAIN_SECONDS = 1.0
+
+_scope = threading.local()
+
+
+@dataclass
+class Task:
+    name: str
+    args: list[str]
+
+
+@dataclass
+class TaskResult:
+    name: str
+    returncode: int | None  # None when cancelled or never started
+    duration: float = 0.0
+    tail: list[str] = field(default_factory=list)  # last lines of captured output
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def resolve_jobs(jobs: int) -> int:
+    """Map a configured job count to a worker count; 0 means one per CPU."""
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+@contextmanager
+def cancel_scope(token: CancelToken):
+    """Let run_command and run_parallel calls in this thread be cancelled by token."""
+    previous = current_token()
+    _scope.token = token
+    try:
+        yield
+    finally:
+        _scope.token = previous
+
+
+def current_token() -> CancelToken | None:
+    return getattr(_scope, "token", None)
 
 
 def run_command(
     args: list[str],
     cwd: Path,
     capture_output: bool = False,
+    on_line: Callable[[str], bool | None] | None = None,
+    timeout: float | None = None,
+    env: dict[str, str] | None = None,
 ) -> int:
-    console.print(f"[blue]> {' '.join(args)}[/blue]")
-    result = subprocess.run(
-        args,
-        cwd=cwd,
-        capture_output=capture_output,
-    )
-    return result.returncode
+    """Run args, streaming output.
+
+    ``on_line`` also sees each line of stdout; returning True terminates the
+    process, whose remaining output is still shown. A process still running
+    after ``timeout`` seconds is terminated and reported as TIMEOUT_EXIT.
+    Inside a cancel_scope, cancelling the token terminates the process too.
+
+    A process that can be stopped this way runs in its own session, so
+    stopping it kills everything it started. Otherwise it stays in pkg's
+    process group, where it can use the terminal, e.g. for ``pkg run``.
+    """
+    label = " ".join(args)
+    console.print(f"[blue]> {label}[/blue]")
+    token = current_token()
+    isolated = timeout is not None or token is not None
+    with trace.span(label, "process", cwd=str(cwd)) as span_args:
+        # Captured output was never surfaced, so it is simply discarded
+        quiet = subprocess.DEVNULL if capture_output else None
+        stdout = subprocess.PIPE if on_line is not None and not capture_output else quiet
+        proc = subprocess.Popen(
+            args, cwd=cwd, stdout=stdout, stderr=quiet, env=env, start_new_session=isolated
+        )
+        stopping = threading.Event()
+
+        def stop() -> None:
+            stopping.set()
+            _kill(proc, group=isolated)
+
+        unregister = token.on_cancel(stop) if token else lambda: None
+        try:
+            with Deadline(timeout, stop) as deadline:
+                if stdout == subprocess.PIPE:
+                    for raw in _read_lines(proc.stdout, stopping):
+                        line = raw.decode(errors="replace")
+                        sys.stdout.write(line)
+                        sys.stdout.flush()
+                        if on_line(line) and proc.poll() is None:
+                            stop()
+                returncode = wait(proc, span_args)
+        except BaseException:
+            stop()
+            proc.wait()
+            raise
+        finally:
+            unregister()
+        if deadline.expired:
+            returncode = TIMEOUT_EXIT
+            console.print(f"[red]Timed out after {timeout:g}s: {label}[/red]")
+        span_args["returncode"] = returncode
+    return returncode
+
+
+def wait(proc: subprocess.Popen, span_args: dict | None = None) -> int:
+    """Wait for proc, recording its own CPU time and peak RSS in span_args."""
+    try:
+        _, status, rusage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        return proc.wait()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if span_args is not None:
+        span_args.update(trace.rusage_args(rusage))
+    return proc.returncode
+
+
+class Deadline:
+    """Calls ``expire`` once ``timeout`` seconds pass before the block exits."""
+
+    def __init__(self, timeout: float | None, expire: Callable[[], None]):
+        self.expired = False
+        self._expire = expire
+        self._timer = threading.Timer(timeout, self._fire) if timeout else None
+
+    def _fire(self) -> None:
+        self.expired = True
+        self._expire()
+
+    def __enter__(self) -> "Deadline":
+        if self._timer is not None:
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+def _section(header: str):
+    """Lines opening and closing a collapsible log group on CI, if supported."""
+    if os.environ.get("GITHUB_ACTIONS") == "true":
+        from rich.text import Text
+
+        return f"::group::{Text.from_markup(header).plain}", "::endgroup::"
+    return None, None
+
+
+def _emit(output, header: str) -> None:
+    """Print a buffered block under its header, folded on CI."""
+    start, end = _section(header)
+    if start:
+        print(start, flush=True)
+    console.print(header)
+    output.seek(0)
+    sys.stdout.flush()
+    for chunk in iter(lambda: output.read(1 << 16), b""):
+        sys.stdout.write(chunk.decode(errors="replace"))
+    sys.stdout.flush()
+    if end:
+        print(end, flush=True)
+
+
+def _read_tail(output, tail: deque) -> None:
+    """Fill tail with the last lines of a temporary output file."""
+    size = output.seek(0, os.SEEK_END)
+    output.seek(max(0, size - TAIL_LINES * 512))
+    tail.extend(output.read().decode(errors="replace").splitlines())
+
+
+def _read_lines(stream, stopping: threading.Event):
+    """Yield a child's output line by line until the pipe closes.
+
+    Once ``stopping`` is set, reading ends within DRAIN_SECONDS even if a
+    process outside the killed group still holds the pipe open. The stream
+    is closed at the end.
+    """
+    fd = stream.fileno()
+    pending = b""
+    give_up = None
+    try:
+        while True:
+            if stopping.is_set():
+                give_up = give_up or time.monotonic() + DRAIN_SECONDS
+                if time.monotonic() >= give_up:
+                    break
+            if not select.select([fd], [], [], 0.1)[0]:
+                continue
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                break
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                yield line + b"\n"
+        if pending:
+            yield pending
+    finally:
+        stream.close()
+
+
+def _stream_prefixed(stream, prefix: str, tail: deque | None, stopping: threading.Event) -> None:
+    """Copy a child's output to stdout line by line, each line under prefix."""
+    for raw in _read_lines(stream, stopping):
+        line = raw.decode(errors="replace").rstrip("\n")
+        if tail is not None:
+            tail.append(line)
+        with OUTPUT_LOCK:
+            sys.stdout.write(f"{prefix}{line}\n")
+            sys.stdout.flush()
+
+
+def _kill(proc: subprocess.Popen, group: bool) -> None:
+    try:
+        if group:
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+    except ProcessLookupError:
+        pass
+
+
+def run_process(
+    args: list[str] | str,
+    cwd: Path,
+    header: str,
+    token: CancelToken | None = None,
+    buffered: bool = False,
+    shell: bool = False,
+    env: dict[str, str] | None = None,
+    prefix: str | None = None,
+    timeout: float | None = None,
+    tail: deque | None = None,
+) -> int | None:
+    """Run one child process, returning None if the token cancelled it.
+
+    Buffered output goes to an unnamed temporary file, so large logs spill to
+    disk instead of accumulating in memory, and is printed as one block under
+    ``header`` when the process exits. With ``prefix`` output is streamed as
+    it arrives instead, each line under the prefix. Captured output also
+    leaves its last lines in ``tail``.
+
+    A child that can be cancelled or time out, or whose output is captured,
+    runs in its own process group, so cancelling it or hitting ``timeout``
+    kills everything it started. A timed out process reports TIMEOUT_EXIT.
+    """
+    if token is not None and token.cancelled:
+        return None
+
+    label = args if isinstance(args, str) else " ".join(args)
+    captured = buffered or prefix is not None
+    isolated = captured or timeout is not None or token is not None
+    with tempfile.TemporaryFile() as output, trace.span(label, "process", cwd=str(cwd)) as span_args:
+        if prefix is not None:
+            with OUTPUT_LOCK:
+                console.print(f"{prefix}{header}")
+        elif not buffered:
+            console.print(header)
+        proc = subprocess.Popen(
+            args,
+            cwd=cwd,
+            env=env,
+            shell=shell,
+            stdout=subprocess.PIPE if prefix is not None else output if buffered else None,
+            stderr=subprocess.STDOUT if captured else None,
+            start_new_session=isolated,
+        )
+
+        killed = threading.Event()
+        stopping = threading.Event()
+
+        def expire() -> None:
+            stopping.set()
+            _kill(proc, group=isolated)
+
+        def kill() -> None:
+            killed.set()
+            expire()
+
+        unregister = token.on_cancel(kill) if token is not None else lambda: None
+        try:
+            with Deadline(timeout, expire) as deadline:
+                if prefix is not None:
+                    _stream_prefixed(proc.stdout, prefix, tail, stopping)
+                returncode = wait(proc, span_args)
+            span_args["returncode"] = returncode
+        except BaseException:
+            kill()
+            proc.wait()
+            raise
+        finally:
+            unregister()
+
+        if killed.is_set():
+            return None
+        if deadline.expired:
+            returncode = TIMEOUT_EXIT
+        if buffered:
+            if tail is not None:
+                _read_tail(output, tail)
+            with OUTPUT_LOCK:
+                _emit(output, header)
+        if deadline.expired:
+            console.print(f"[red]Timed out after {timeout:g}s: {label}[/red]")
+        return returncode
+
+
+def run_parallel(
+    tasks: list[Task],
+    cwd: Path,
+    jobs: int = 1,
+    fail_fast: bool = False,
+    token: CancelToken | None = None,
+    buffered: bool | None = None,
+    kind: str = "task",
+    keep_order: bool = False,
+    prefixed: bool = False,
+    timeout: float | None = None,
+) -> list[TaskResult]:
+    """Run tasks in a bounded worker pool, printing each task's output as one block.
+
+    With a single worker output is streamed as it comes unless ``buffered``
+    is set; ``prefixed`` streams every task's lines as they come, prefixed
+    with the task name, instead of blocks. Either way each task keeps its
+    last TAIL_LINES lines for report_failures. Each task is killed after ``timeout``
+    seconds. With ``fail_fast`` the first failure kills every task still running
+    and skips the ones not yet started; cancelling ``token`` (by default the
+    one of the enclosing cancel_scope) does the same.
+    While timings are recorded, each task is timed as ``kind`` and several
+    workers start the historically slowest tasks first, unless ``keep_order``
+    is set. Results are returned in the order of ``tasks``.
+    """
+    jobs = min(resolve_jobs(jobs), len(tasks)) or 1
+    token = token or current_token()
+    if buffered is None:
+        buffered = jobs > 1
+
+    recorder = timings.current()
+    order = tasks
+    if recorder is not None and jobs > 1 and not keep_order:
+        order = timings.longest_first(tasks, recorder.estimates(kind), key=lambda t: t.name)
+
+    width = max(len(task.name) for task in tasks) if tasks else 0
+    tails = {task.name: deque(maxlen=TAIL_LINES) for task in tasks}
+
+    def prefix(task: Task) -> str | None:
+        if prefixed:
+            return f"{task.name:<{width}} | "
+        # Streamed output is copied through pkg, so its tail is kept too
+        return None if buffered else ""
+
+    def action(task: Task):
+        return lambda token: run_process(
+            task.args,
+            cwd,
+            header=f"[blue]> {' '.join(task.args)}[/blue]",
+            token=token,
+            buffered=buffered and not prefixed,
+            prefix=prefix(task),
+            timeout=timeout,
+            tail=tails[task.name],
+        )
+
+    nodes = [Node(task.name, action(task)) for task in order]
+    results = {r.name: r for r in run_graph(nodes, jobs=jobs, fail_fast=fail_fast, token=token)}
+    for result in results.values():
+        timings.record(kind, result.name, result.duration, result.returncode)
+    return [
+        TaskResult(
+            task.name,
+            results[task.name].returncode,
+            results[task.name].duration,
+            list(tails[task.name]),
+        )
+        for task in tasks
+    ]
+
+
+def report_failures(results: list[TaskResult]) -> None:
+    """Print the last captured lines of every failed task."""
+    for result in results:
+        if result.returncode in (0, None) or not result.tail:
+            continue
+        console.print(f"[red]--- {result.name} (exit {result.returncode}), last {len(result.tail)} lines ---[/red]")
+        console.print("\n".join(result.tail), markup=False, highlight=False)
+
+
+def summarize(results: list[TaskResult]) -> tuple[list[str], list[str], list[str]]:
+    """Split results into passed, failed and skipped task names."""
+    passed = [r.name for r in results if r.returncode == 0]
+    failed = [r.name for r in results if r.returncode not in (0, None)]
+    skipped = [r.name for r in results if r.returncode is None]
+    return passed, failed, skipped
@@ -0,0 +1,140 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+class CancelToken:
+    """Shared cancellation flag; running work registers callbacks to stop itself."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.cancelled = False
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Register callback, returning a function that unregisters it."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _discard(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+@dataclass
+class Node:
+    name: str
+    action: Callable[[CancelToken], int | None]
+    needs: list[str] = field(default_factory=list)
+
+
+@dataclass
+class NodeResult:
+    name: str
+    returncode: int | None  # None when cancelled or skipped
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def toposort(nodes: list[Node]) -> list[Node]:
+    """Order nodes so each comes after its needs; raises ValueError on bad graphs."""
+    by_name: dict[str, Node] = {}
+    for node in nodes:
+        if node.name in by_name:
+            raise ValueError(f"duplicate name: {node.name}")
+        by_name[node.name] = node
+    for node in nodes:
+        for need in node.needs:
+            if need not in by_name:
+                raise ValueError(f"{node.name} needs unknown {need}")
+
+    ordered: list[Node] = []
+    state: dict[str, str] = {}
+
+    def visit(node: Node, path: list[str]) -> None:
+        if state.get(node.name) == "done":
+            return
+        if state.get(node.name) == "visiting":
+            cycle = path[path.index(node.name):] + [node.name]
+            raise ValueError(f"dependency cycle: {' -> '.join(cycle)}")
+        state[node.name] = "visiting"
+        for need in node.needs:
+            visit(by_name[need], path + [node.name])
+        state[node.name] = "done"
+        ordered.append(node)
+
+    for node in nodes:
+        visit(node, [])
+    return ordered
+
+
+def run_graph(
+    nodes: list[Node],
+    jobs: int = 1,
+    fail_fast: bool = True,
+    token: CancelToken | None = None,
+) -> list[NodeResult]:
+    """Run nodes as soon as their needs succeed, at most ``jobs`` at a time.
+
+    A failed node skips everything that needs it. With ``fail_fast`` it also
+    cancels the token, stopping running nodes and skipping the rest. Results
+    are returned in input order.
+    """
+    toposort(nodes)
+    token = token or CancelToken()
+    results: dict[str, NodeResult] = {}
+    pending = list(nodes)
+
+    def timed(node: Node) -> NodeResult:
+        start = time.monotonic()
+        returncode = node.action(token)
+        return NodeResult(node.name, returncode, time.monotonic() - start)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        running = {}
+        try:
+            while pending or running:
+                for node in list(pending):
+                    if token.cancelled or any(
+                        n in results and not results[n].ok for n in node.needs
+                    ):
+                        results[node.name] = NodeResult(node.name, None)
+                        pending.remove(node)
+                    elif len(running) < max(jobs, 1) and all(n in results for n in node.needs):
+                        running[pool.submit(timed, node)] = node
+                        pending.remove(node)
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    result = future.result()
+                    results[node.name] = result
+                    if result.returncode not in (0, None) and fail_fast:
+                        token.cancel()
+        except BaseException:
+            token.cancel()
+            raise
+
+    return [results[node.name] for node in nodes]
@@ -0,0 +1,202 @@
+import json
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from . import timings
+from .cache import project_cache_dir
+from .console import console
+from .runner import Task, run_parallel, summarize
+from .tools.base import BuildTool
+
+SPLIT_MODES = ["duration", "size", "count"]
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse ``K/N`` into (K, N), raising ValueError unless 1 <= K <= N."""
+    try:
+        index, total = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"expected K/N, got {value!r}") from None
+    if not 1 <= index <= total:
+        raise ValueError(f"shard {value} is out of range, K must be between 1 and N")
+    return index, total
+
+
+def unit_size(path: Path | None) -> int:
+    """Bytes in a test file, or in the files directly inside a package directory."""
+    if path is None:
+        return 0
+    try:
+        if path.is_dir():
+            return sum(entry.stat().st_size for entry in path.iterdir() if entry.is_file())
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def unit_weights(
+    tool: BuildTool, units: list[str], split_by: str, durations: dict[str, float] | None = None
+) -> dict[str, float]:
+    """Expected cost of each unit.
+
+    By duration, units use their median time from ``durations``, or from the
+    timings recorded on this machine. Units never timed are estimated from
+    their size, scaled by the seconds per byte of the timed ones. Node IDs in
+    the same file share that file's size.
+    """
+    if split_by == "count":
+        return {unit: 1.0 for unit in units}
+
+    paths = {unit: tool.test_unit_path(unit) for unit in units}
+    shared = Counter(paths.values())
+    sizes = {unit: max(unit_size(paths[unit]), 1) / shared[paths[unit]] for unit in units}
+    if split_by == "size":
+        return sizes
+
+    if durations is None:
+        durations = timings.load_estimates(tool.project_dir, "test")
+    timed = [unit for unit in units if unit in durations]
+    if not timed:
+        return sizes
+    rate = sum(durations[u] for u in timed) / sum(sizes[u] for u in timed)
+    return {unit: durations[unit] if unit in durations else sizes[unit] * rate for unit in units}
+
+
+def split(units: list[str], weights: dict[str, float], count: int) -> list[list[str]]:
+    """Deal units into count shards of about equal weight, heaviest first.
+
+    The split depends only on units and weights, so every machine computes
+    the same one. Units keep their input order within a shard.
+    """
+    loads = [0.0] * count
+    assigned: dict[str, int] = {}
+    for unit in sorted(units, key=lambda u: (-weights[u], u)):
+        shard = min(range(count), key=lambda i: (loads[i], i))
+        assigned[unit] = shard
+        loads[shard] += weights[unit]
+    return [[unit for unit in units if assigned[unit] == shard] for shard in range(count)]
+
+
+def load_durations(path: Path) -> dict[str, float]:
+    """Test durations from a JSON object mapping each test to seconds.
+
+    Raises ValueError when the file is not such an object.
+    """
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        raise ValueError(f"cannot read {path}: {e}") from None
+    if not isinstance(data, dict) or not all(
+        isinstance(v, (int, float)) and not isinstance(v, bool) for v in data.values()
+    ):
+        raise ValueError(f"{path} must map each test to its duration in seconds")
+    return {str(unit): float(seconds) for unit, seconds in data.items()}
+
+
+def plan(
+    tool: BuildTool, count: int, split_by: str, durations: dict[str, float] | None = None
+) -> list[list[str]] | None:
+    """The tool's tests split into count shards, or None if they cannot be listed."""
+    units = tool.test_units()
+    if units is None:
+        console.print(f"[red]Cannot shard: {tool.name} tests could not be listed[/red]")
+        return None
+    return split(units, unit_weights(tool, units, split_by, durations), count)
+
+
+def run_shard(
+    tool: BuildTool,
+    index: int,
+    total: int,
+    split_by: str = "size",
+    durations: dict[str, float] | None = None,
+) -> int:
+    """Run shard ``index`` of ``total`` (1-based).
+
+    Every machine must compute the same split, so weights come from the
+    tests themselves or from ``durations`` shared by all of them, never from
+    one machine's own timings.
+    """
+    shards = plan(tool, total, split_by, durations)
+    if shards is None:
+        return 1
+    units = shards[index - 1]
+    console.print(f"[dim]Shard {index}/{total}: {len(units)} of {sum(map(len, shards))} tests[/dim]")
+    if not units:
+        return 0
+    return tool.run_tests(units)
+
+
+def run_local_shards(tool: BuildTool, total: int, split_by: str = "duration") -> int:
+    """Run all shards at once, each in its own pkg process, and merge the results."""
+    shards = plan(tool, total, split_by)
+    if shards is None:
+        return 1
+
+    shards_dir = project_cache_dir(tool.project_dir) / "shards"
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    # Each run and each shard gets its own directory for units and reports
+    run_dir = Path(tempfile.mkdtemp(prefix="run-", dir=shards_dir))
+    try:
+        return _run_local_shards(tool, shards, run_dir)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _run_local_shards(tool: BuildTool, shards: list[list[str]], run_dir: Path) -> int:
+    total = len(shards)
+    tasks = []
+    for index, units in enumerate(shards, 1):
+        if not units:
+            continue
+        shard_dir = run_dir / f"{index}-of-{total}"
+        shard_dir.mkdir()
+        units_file = shard_dir / "units.txt"
+        units_file.write_text("".join(f"{unit}\n" for unit in units))
+        console.print(f"[dim]Shard {index}/{total}: {len(units)} tests[/dim]")
+        args = [sys.executable, "-m", "pkg.cli", "test", "-j", "1", "--profile", tool.options.profile,
+                "--units-from", str(units_file)]
+        if tool.options.timeout is not None:
+            args += ["--timeout", str(tool.options.timeout)]
+        tasks.append(Task(f"shard {index}/{total}", args))
+    if not tasks:
+        console.print("[dim]No tests found[/dim]")
+        return 0
+
+    results = run_parallel(
+        tasks,
+        cwd=tool.project_dir,
+        jobs=len(tasks),
+        fail_fast=tool.options.fail_fast,
+        buffered=True,
+        kind="shard",
+    )
+    passed, failed, skipped = summarize(results)
+    for result in results:
+        status = {0: "[green]passed[/green]", None: "[yellow]cancelled[/yellow]"}.get(
+            result.returncode, "[red]failed[/red]"
+        )
+        console.print(f"{result.name} {status} in {result.duration:.2f}s")
+    if failed or skipped:
+        console.print(f"[red]{len(failed)} of {len(results)} shards failed[/red]")
+        return 1
+    console.print(f"[green]All {len(passed)} shards passed[/green]")
+    return 0
+
+
+def run_units_file(tool: BuildTool, units_file: Path) -> int:
+    """Run the units listed in a file written by run_local_shards.
+
+    The shard's reports are written next to the file.
+    """
+    units = units_file.read_text().split("\n")
+    tool.options.work_dir = units_file.parent
+    recorder = timings.enable(tool.project_dir)
+    try:
+        return tool.run_tests([unit for unit in units if unit])
+    finally:
+        timings.disable()
+        recorder.flush()
@@ -0,0 +1,277 @@
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+# Samples kept per item; older ones are pruned on write
+MAX_SAMPLES = 50
+# Runs compared against the ones before them for the trend
+RECENT_RUNS = 5
+# Pending samples are folded into the database once the journal grows past this
+MAX_PENDING_BYTES = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS timings (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    returncode INTEGER,
+    started REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS timings_item ON timings (kind, name, id);
+"""
+
+
+@dataclass
+class Sample:
+    kind: str  # command, hook, task, test, shard or stage
+    name: str
+    seconds: float
+    returncode: int | None = None
+    started: float = 0.0
+
+
+@dataclass
+class ItemStats:
+    kind: str
+    name: str
+    runs: int
+    failures: int
+    p50: float
+    p95: float
+    last: float
+    trend: float | None  # recent median relative to the runs before, e.g. 0.1 = 10% slower
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of values."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def timings_path(project_dir: Path) -> Path:
+    from .cache import project_cache_dir
+
+    return project_cache_dir(project_dir) / "timings.sqlite"
+
+
+def journal_path(db_path: Path) -> Path:
+    """Where samples wait, as JSON lines, until the database is next opened."""
+    return db_path.with_name(db_path.stem + ".pending.jsonl")
+
+
+def has_timings(project_dir: Path) -> bool:
+    path = timings_path(project_dir)
+    return path.exists() or journal_path(path).exists()
+
+
+def append_pending(db_path: Path, samples: list[Sample]) -> int:
+    """Append samples to the journal without touching SQLite; returns the journal's size."""
+    import fcntl
+
+    journal = journal_path(db_path)
+    journal.parent.mkdir(parents=True, exist_ok=True)
+    lines = "".join(
+        json.dumps([s.kind, s.name, s.seconds, s.returncode, s.started]) + "\n" for s in samples
+    )
+    with open(journal, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(lines)
+        f.flush()
+        return f.tell()
+
+
+class TimingDB:
+    """Per-project SQLite database of how long things took."""
+
+    def __init__(self, path: Path):
+        import sqlite3
+
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=10)
+        self.conn.executescript(SCHEMA)
+        self._merge_pending()
+
+    def _merge_pending(self) -> None:
+        import fcntl
+
+        try:
+            journal = open(journal_path(self.path), "r+")
+        except FileNotFoundError:
+            return
+        with journal:
+            fcntl.flock(journal, fcntl.LOCK_EX)
+            samples = []
+            for line in journal:
+                try:
+                    samples.append(Sample(*json.loads(line)))
+                except (ValueError, TypeError):
+                    continue
+            if samples:
+                self.add(samples)
+            journal.truncate(0)
+
+    def __enter__(self) -> "TimingDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def add(self, samples: Iterable[Sample]) -> None:
+        samples = list(samples)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO timings (kind, name, seconds, returncode, started) VALUES (?, ?, ?, ?, ?)",
+                [(s.kind, s.name, s.seconds, s.returncode, s.started) for s in samples],
+            )
+            for kind, name in {(s.kind, s.name) for s in samples}:
+                self.conn.execute(
+                    "DELETE FROM timings WHERE kind = ? AND name = ? AND id NOT IN "
+                    "(SELECT id FROM timings WHERE kind = ? AND name = ? ORDER BY id DESC LIMIT ?)",
+                    (kind, name, kind, name, MAX_SAMPLES),
+                )
+
+    def samples(self, kind: str | None = None) -> dict[tuple[str, str], list[Sample]]:
+        """Samples per (kind, name), oldest first."""
+        query = "SELECT kind, name, seconds, returncode, started FROM timings"
+        params: tuple = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        items: dict[tuple[str, str], list[Sample]] = {}
+        for row in self.conn.execute(query + " ORDER BY id", params):
+            items.setdefault((row[0], row[1]), []).append(Sample(*row))
+        return items
+
+    def summaries(self, kind: str | None = None) -> list[ItemStats]:
+        """Statistics per item, slowest (by median) first."""
+        summaries = []
+        for (item_kind, name), samples in self.samples(kind).items():
+            seconds = [s.seconds for s in samples]
+            trend = None
+            if len(seconds) > RECENT_RUNS:
+                before = percentile(seconds[:-RECENT_RUNS], 50)
+                if before > 0:
+                    trend = percentile(seconds[-RECENT_RUNS:], 50) / before - 1
+            summaries.append(ItemStats(
+                kind=item_kind,
+                name=name,
+                runs=len(samples),
+                failures=sum(1 for s in samples if s.returncode not in (0, None)),
+                p50=percentile(seconds, 50),
+                p95=percentile(seconds, 95),
+                last=seconds[-1],
+                trend=trend,
+            ))
+        return sorted(summaries, key=lambda s: (-s.p50, s.kind, s.name))
+
+    def estimates(self, kind: str) -> dict[str, float]:
+        """Expected duration (the median) of each item of a kind."""
+        return {s.name: s.p50 for s in self.summaries(kind)}
+
+    def last_failed(self, kind: str) -> set[str]:
+        """Items of a kind whose latest run failed."""
+        rows = self.conn.execute(
+            "SELECT name, returncode FROM timings WHERE id IN "
+            "(SELECT MAX(id) FROM timings WHERE kind = ? GROUP BY name)",
+            (kind,),
+        )
+        return {name for name, returncode in rows if returncode not in (0, None)}
+
+    def last_started(self, kind: str, name: str) -> float | None:
+        """When the latest run of an item started, as a Unix time."""
+        row = self.conn.execute(
+            "SELECT MAX(started) FROM timings WHERE kind = ? AND name = ?", (kind, name)
+        ).fetchone()
+        return row[0]
+
+    def clear(self) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM timings")
+
+
+def load_estimates(project_dir: Path, kind: str) -> dict[str, float]:
+    """Expected durations for a kind, or nothing when no timings were recorded."""
+    if not has_timings(project_dir):
+        return {}
+    with TimingDB(timings_path(project_dir)) as db:
+        return db.estimates(kind)
+
+
+def longest_first(items: list[T], estimates: dict[str, float], key: Callable[[T], str]) -> list[T]:
+    """Order items by expected duration, longest first.
+
+    Items never timed come first, as they may be the slowest of all.
+    The sort is stable, so ties keep their original order.
+    """
+    return sorted(items, key=lambda item: -estimates.get(key(item), math.inf))
+
+
+class Recorder:
+    """Collects samples during a run and appends them to the journal in one write.
+
+    The journal is folded into SQLite when the database is next read, so a
+    plain command never imports sqlite3.
+    """
+
+    def __init__(self, project_dir: Path):
+        self.project_dir = project_dir
+        self.samples: list[Sample] = []
+        self._lock = threading.Lock()
+        self._estimates: dict[str, dict[str, float]] = {}
+
+    def add(self, sample: Sample) -> None:
+        with self._lock:
+            self.samples.append(sample)
+
+    def estimates(self, kind: str) -> dict[str, float]:
+        with self._lock:
+            if kind not in self._estimates:
+                self._estimates[kind] = load_estimates(self.project_dir, kind)
+            return self._estimates[kind]
+
+    def flush(self) -> None:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        if not samples:
+            return
+        path = timings_path(self.project_dir)
+        if append_pending(path, samples) > MAX_PENDING_BYTES:
+            # Opening the database folds the journal in
+            TimingDB(path).close()
+
+
+_recorder: Recorder | None = None
+
+
+def enable(project_dir: Path) -> Recorder:
+    global _recorder
+    _recorder = Recorder(project_dir)
+    return _recorder
+
+
+def disable() -> None:
+    global _recorder
+    _recorder = None
+
+
+def current() -> Recorder | None:
+    return _recorder
+
+
+def record(kind: str, name: str, seconds: float, returncode: int | None = None) -> None:
+    """Record a sample when recording is enabled; cancelled work (None) is not timed."""
+    if _recorder is None or returncode is None:
+        return
+    _recorder.add(Sample(kind, name, seconds, returncode, time.time() - seconds))
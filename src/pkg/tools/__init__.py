@@ -1,18 +1,18 @@
+from importlib import import_module
+
 from .base import BuildTool
-from .bash import BashTool
-from .bun import BunTool
-from .go import GoTool
-from .uv import UvTool
 
-TOOLS: dict[str, type[BuildTool]] = {
-    "bash": BashTool,
-    "bun": BunTool,
-    "go": GoTool,
-    "uv": UvTool,
+# Tool modules are imported on first use so startup only pays for the one in use
+TOOLS: dict[str, str] = {
+    "bash": "pkg.tools.bash:BashTool",
+    "bun": "pkg.tools.bun:BunTool",
+    "go": "pkg.tools.go:GoTool",
+    "uv": "pkg.tools.uv:UvTool",
 }
 
 
 def get_tool(name: str) -> type[BuildTool]:
     if name not in TOOLS:
         raise ValueError(f"Unknown tool: {name}. Available: {', '.join(TOOLS.keys())}")
-    return TOOLS[name]
+    module_name, class_name = TOOLS[name].split(":")
+    return getattr(import_module(module_name), class_name)
@@ -1,10 +1,162 @@
+import fnmatch
+import os
+import re
+import sys
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ..console import console
+
+if TYPE_CHECKING:
+    from ..runner import Task
+
+# cli imports this module at startup; shutil, subprocess and uuid are
+# imported where they are used.
+
+# Never searched for clean targets
+VCS_DIRS = {".git", ".hg", ".svn"}
+# Targets of a fast clean wait here, on the same filesystem, to be deleted
+TRASH_DIR = ".pkg-trash"
+
+
+@dataclass
+class ToolOptions:
+    jobs: int = 1
+    fail_fast: bool = False
+    fast_clean: bool = False
+    # Test profile: its name, and whether it measures coverage and runs tests in parallel
+    profile: str = "full"
+    coverage: bool = True
+    parallel: bool = False
+    # Seconds before a test or build child is killed, and how concurrent output is shown
+    timeout: float | None = None
+    output: str = "grouped"  # grouped (one block per task) or prefixed (interleaved lines)
+    # Set for one shard of a local sharded run: its reports go here, apart from the others'
+    work_dir: Path | None = None
+
+
+class CleanPatterns:
+    """Compiled clean patterns.
+
+    ``dist`` or ``*.egg-info`` match entries at the top of the project,
+    ``**/__pycache__`` matches at any depth.
+    """
+
+    def __init__(self, patterns: list[str]):
+        anywhere = [p[3:] for p in patterns if p.startswith("**/")]
+        top_level = [p for p in patterns if not p.startswith("**/")] + anywhere
+        self.recursive = bool(anywhere)
+        self._top_level = self._compile(top_level)
+        self._anywhere = self._compile(anywhere)
+
+    @staticmethod
+    def _compile(patterns: list[str]) -> re.Pattern | None:
+        if not patterns:
+            return None
+        return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+    def matches(self, name: str, top_level: bool) -> bool:
+        pattern = self._top_level if top_level else self._anywhere
+        return pattern is not None and pattern.match(name) is not None
+
+
+def find_clean_targets(root: Path, patterns: list[str]) -> list[Path]:
+    """Everything under root matching patterns, in one os.scandir walk.
+
+    Matched directories are not descended into, and the walk stops at the top
+    level when no pattern is recursive.
+    """
+    matcher = CleanPatterns(patterns)
+    targets = []
+    stack = [(str(root), True)]
+    while stack:
+        directory, top_level = stack.pop()
+        try:
+            it = os.scandir(directory)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if matcher.matches(entry.name, top_level):
+                    targets.append(Path(entry.path))
+                elif (
+                    matcher.recursive
+                    and entry.name not in VCS_DIRS
+                    and entry.name != TRASH_DIR
+                    and entry.is_dir(follow_symlinks=False)
+                ):
+                    stack.append((entry.path, False))
+    return sorted(targets)
+
+
+def _remove(path: Path) -> None:
+    import shutil
+
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+def delete_paths(paths: list[Path]) -> None:
+    """Delete files and trees in a thread pool, one task per top-level entry."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    dirs = []
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+        futures = []
+        for path in paths:
+            if path.is_dir() and not path.is_symlink():
+                dirs.append(path)
+                with os.scandir(path) as it:
+                    futures += [pool.submit(_remove, Path(entry.path)) for entry in it]
+            else:
+                futures.append(pool.submit(_remove, path))
+        for future in futures:
+            future.result()
+    for directory in dirs:
+        directory.rmdir()
+
+
+def move_to_trash(project_dir: Path, paths: list[Path]) -> list[Path]:
+    """Rename paths into the project's trash directory; returns those that could not be."""
+    import uuid
+
+    batch = project_dir / TRASH_DIR / uuid.uuid4().hex
+    batch.mkdir(parents=True)
+    stuck = []
+    for index, path in enumerate(paths):
+        try:
+            os.rename(path, batch / f"{index}-{path.name}")
+        except OSError:
+            stuck.append(path)
+    return stuck
+
+
+def purge_trash(project_dir: Path) -> None:
+    """Delete the trash directory from a detached process, without waiting for it."""
+    import subprocess
+
+    subprocess.Popen(
+        [sys.executable, "-c", "import shutil, sys; shutil.rmtree(sys.argv[1], ignore_errors=True)",
+         str(project_dir / TRASH_DIR)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
 
 
 class BuildTool(ABC):
-    def __init__(self, project_dir: Path):
+    clean_patterns: list[str] = []
+    # Whether the installed environment still works after moving it elsewhere
+    relocatable_environment = True
+
+    def __init__(self, project_dir: Path, options: ToolOptions | None = None):
         self.project_dir = project_dir
+        self.options = options or ToolOptions()
 
     @property
     @abstractmethod
@@ -38,3 +190,80 @@ class BuildTool(ABC):
     @abstractmethod
     def uplift(self) -> int:
         ...
+
+    def remove_clean_targets(self) -> int:
+        """Delete everything matching clean_patterns.
+
+        With ``options.fast_clean`` targets are renamed into a trash directory
+        and deleted in the background, so this returns immediately.
+        """
+        targets = find_clean_targets(self.project_dir, self.clean_patterns)
+        if not targets:
+            console.print("[dim]Nothing to clean[/dim]")
+            return 0
+
+        names = ", ".join(str(p.relative_to(self.project_dir)) for p in targets)
+        if self.options.fast_clean:
+            delete_paths(move_to_trash(self.project_dir, targets))
+            purge_trash(self.project_dir)
+            console.print(f"[green]Cleaned: {names}[/green] [dim](deleting in the background)[/dim]")
+        else:
+            delete_paths(targets)
+            console.print(f"[green]Cleaned: {names}[/green]")
+        return 0
+
+    def build_outputs(self) -> list[Path]:
+        """Paths produced by a successful build, restored from the build cache."""
+        return []
+
+    def install_inputs(self) -> list[Path]:
+        """Manifests and lockfiles that determine what ``install`` does.
+
+        Installs are only skipped for tools that list some.
+        """
+        return []
+
+    def install_state(self) -> list[str]:
+        """Other install inputs that are not files, e.g. the interpreter."""
+        return []
+
+    def install_environment(self) -> list[Path]:
+        """Paths an install creates; if any is missing the install runs again."""
+        return []
+
+    def environment_dir(self) -> Path | None:
+        """Directory holding installed dependencies, snapshotted by the environment store."""
+        return None
+
+    def affected_tests(self, changed: list[Path]) -> list["Task"] | None:
+        """Test tasks covering the changed files, for ``pkg watch``.
+
+        Returns None when the change cannot be narrowed down and the whole
+        suite should run, and an empty list when no test is affected.
+        """
+        return None
+
+    def affected_units(self, changed: list[Path]) -> list[str] | None:
+        """Test units, named as by ``test_units``, covering the changed files.
+
+        Defaults to the names of the affected test tasks, for tools that run
+        one task per unit. Returns None when the change cannot be narrowed down.
+        """
+        tasks = self.affected_tests(changed)
+        return None if tasks is None else [task.name for task in tasks]
+
+    def test_units(self) -> list[str] | None:
+        """Independently runnable tests (files, packages or node IDs) to shard.
+
+        Returns None when the tool cannot list its tests.
+        """
+        return None
+
+    def test_unit_path(self, unit: str) -> Path | None:
+        """File or package directory of a test unit, sized when no durations are recorded."""
+        return None
+
+    def run_tests(self, units: list[str]) -> int:
+        """Run only the given test units."""
+        console.print(f"[red]{self.name} cannot run a subset of its tests[/red]")
+        return 1
@@ -1,15 +1,12 @@
 import os
 import shutil
 import stat
-import subprocess
 from pathlib import Path
 
-from rich.console import Console
-
 from .base import BuildTool
-from ..runner import run_command
-
-console = Console()
+from ..runner import Task, report_failures, run_command, run_parallel, summarize
+from ..console import console
+from ..pipeline import call_stage, run_pipeline
 
 BIN_DIR = Path.home() / "bin"
 
@@ -50,11 +47,14 @@ class BashTool(BuildTool):
         return 0
 
     def build(self) -> int:
-        test_result = self.test()
-        if test_result != 0:
-            console.print("[red]Build aborted: tests failed[/red]")
-            return test_result
+        return run_pipeline(
+            [call_stage("test", self.test)],
+            publish=self._install_scripts,
+            jobs=self.options.jobs,
+            fail_fast=self.options.fail_fast,
+        )
 
+    def _install_scripts(self) -> int:
         src_dir = self.project_dir / "src"
         if not src_dir.exists():
             console.print("[red]No src directory found[/red]")
@@ -90,22 +90,44 @@ class BashTool(BuildTool):
             console.print("[dim]No test files found[/dim]")
             return 0
 
-        failed = []
-        passed = []
-        for test_file in test_files:
-            console.print(f"[blue]> bash {test_file.name}[/blue]")
-            result = subprocess.run(
-                ["bash", str(test_file)],
-                cwd=self.project_dir,
-            )
-            if result.returncode != 0:
-                failed.append(test_file.name)
-            else:
-                passed.append(test_file.name)
+        from ..ordering import priorities
+
+        first = priorities(self)
+        if first is None:
+            return self._run_test_files(test_files)
+        units = first.order(self, [f.name for f in test_files])
+        return self._run_test_files([test_dir / unit for unit in units], keep_order=True)
+
+    def run_tests(self, units: list[str]) -> int:
+        return self._run_test_files([self.project_dir / "tests" / unit for unit in units])
+
+    def test_units(self) -> list[str] | None:
+        test_dir = self.project_dir / "tests"
+        return [f.name for f in sorted(test_dir.glob("*_test.sh"))] if test_dir.is_dir() else []
+
+    def test_unit_path(self, unit: str) -> Path | None:
+        return self.project_dir / "tests" / unit
+
+    def _run_test_files(self, test_files: list[Path], keep_order: bool = False) -> int:
+        tasks = [Task(f.name, ["bash", str(f)]) for f in test_files]
+        results = run_parallel(
+            tasks,
+            cwd=self.project_dir,
+            jobs=self.options.jobs,
+            fail_fast=self.options.fail_fast,
+            kind="test",
+            keep_order=keep_order,
+            prefixed=self.options.output == "prefixed",
+            timeout=self.options.timeout,
+        )
+        passed, failed, skipped = summarize(results)
 
         if passed:
             console.print(f"[green]{len(passed)} passed[/green]")
+        if skipped:
+            console.print(f"[yellow]{len(skipped)} skipped[/yellow]")
         if failed:
+            report_failures(results)
             console.print(
                 f"[red]{len(failed)} failed: {', '.join(failed)}[/red]"
             )
@@ -161,6 +183,27 @@ class BashTool(BuildTool):
         self._create_gitignore()
         return 0
 
+    def build_outputs(self) -> list[Path]:
+        src_dir = self.project_dir / "src"
+        return [BIN_DIR / script.name for script in sorted(src_dir.glob("*.sh"))]
+
+    def affected_tests(self, changed: list[Path]) -> list[Task] | None:
+        """Changed tests, plus tests named after or mentioning a changed script."""
+        test_dir = self.project_dir / "tests"
+        test_files = sorted(test_dir.glob("*_test.sh")) if test_dir.is_dir() else []
+
+        selected = set()
+        for path in changed:
+            if path in test_files:
+                selected.add(path)
+            elif path.suffix == ".sh":
+                selected.update(
+                    test for test in test_files
+                    if test.name == f"{path.stem}_test.sh"
+                    or path.name in test.read_text(errors="replace")
+                )
+        return [Task(f.name, ["bash", str(f)]) for f in sorted(selected)]
+
     def _create_gitignore(self) -> None:
         gitignore_content = """*.log
 .env
@@ -1,12 +1,10 @@
-import shutil
+import re
 from pathlib import Path
 
-from rich.console import Console
-
 from .base import BuildTool
 from ..runner import run_command
-
-console = Console()
+from ..console import console
+from ..pipeline import call_stage, command_stage, run_pipeline
 
 CLEAN_PATTERNS = [
     "node_modules",
@@ -19,8 +17,13 @@ CLEAN_PATTERNS = [
     "build",
 ]
 
+# Files bun test picks up
+TEST_FILE_RE = re.compile(r".*[._](test|spec)\.[cm]?[jt]sx?$")
+
 
 class BunTool(BuildTool):
+    clean_patterns = CLEAN_PATTERNS
+
     @property
     def name(self) -> str:
         return "bun"
@@ -35,14 +38,15 @@ class BunTool(BuildTool):
         return 0
 
     def build(self) -> int:
-        test_result = self.test()
-        if test_result != 0:
-            console.print("[red]Build aborted: tests failed[/red]")
-            return test_result
-        return run_command(["bun", "run", "build"], cwd=self.project_dir)
+        # The build script writes wherever it likes, so it can only start once the tests pass
+        return run_pipeline([
+            call_stage("test", self.test),
+            command_stage("build", ["bun", "run", "build"], self.project_dir, needs=["test"],
+                          timeout=self.options.timeout),
+        ], jobs=self.options.jobs, fail_fast=self.options.fail_fast)
 
     def test(self) -> int:
-        return run_command(["bun", "test", "--coverage"], cwd=self.project_dir)
+        return self.run_tests([])
 
     def install(self) -> int:
         return run_command(["bun", "install"], cwd=self.project_dir)
@@ -54,30 +58,47 @@ class BunTool(BuildTool):
         return run_command(cmd, cwd=self.project_dir)
 
     def clean(self) -> int:
-        cleaned = []
-        for pattern in CLEAN_PATTERNS:
-            path = self.project_dir / pattern
-            if path.exists():
-                self._remove_path(path)
-                cleaned.append(pattern)
-
-        if cleaned:
-            console.print(f"[green]Cleaned: {', '.join(cleaned)}[/green]")
-        else:
-            console.print("[dim]Nothing to clean[/dim]")
-
-        return 0
+        return self.remove_clean_targets()
 
     def uplift(self) -> int:
         self._add_dev_dependencies()
         self._create_gitignore()
         return 0
 
-    def _remove_path(self, path: Path) -> None:
-        if path.is_dir():
-            shutil.rmtree(path)
-        else:
-            path.unlink()
+    def run_tests(self, units: list[str]) -> int:
+        args = ["bun", "test"]
+        if self.options.coverage:
+            args.append("--coverage")
+        if self.options.fail_fast:
+            args.append("--bail")
+        # A leading ./ makes bun treat each filter as a path
+        return run_command(
+            [*args, *[f"./{unit}" for unit in units]], cwd=self.project_dir, timeout=self.options.timeout
+        )
+
+    def test_units(self) -> list[str] | None:
+        from ..cache import iter_source_files
+
+        return [
+            path.relative_to(self.project_dir).as_posix()
+            for path in iter_source_files(self.project_dir, [*self.clean_patterns, "**/node_modules"])
+            if TEST_FILE_RE.match(path.name)
+        ]
+
+    def test_unit_path(self, unit: str) -> Path | None:
+        return self.project_dir / unit
+
+    def build_outputs(self) -> list[Path]:
+        return [self.project_dir / name for name in ["dist", "build"]]
+
+    def install_inputs(self) -> list[Path]:
+        return [self.project_dir / name for name in ["package.json", "bun.lockb", "bun.lock"]]
+
+    def install_environment(self) -> list[Path]:
+        return [self.project_dir / "node_modules"]
+
+    def environment_dir(self) -> Path | None:
+        return self.project_dir / "node_modules"
 
     def _add_dev_dependencies(self) -> None:
         package_json_path = self.project_dir / "package.json"
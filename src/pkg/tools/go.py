@@ -1,15 +1,22 @@
-import shutil
+import os
+import re
 import subprocess
 from pathlib import Path
 
-from rich.console import Console
-
 from .base import BuildTool
-from ..runner import run_command
+from .. import timings
+from ..runner import Task, run_command
+from ..console import console
+from ..pipeline import call_stage, command_stage, discard_staged, publish_staged, run_pipeline, staging_dir
 
 COVERAGE_THRESHOLD = 80.0
 
-console = Console()
+MODULE_RE = re.compile(r"^module\s+(\S+)", re.M)
+IMPORT_RE = re.compile(r'^import\s*(?:\((.*?)\)|(?:[\w.]+\s+)?("[^"]+"))', re.M | re.S)
+# Directories the go tool itself ignores when matching ./...
+SKIPPED_DIRS = {"vendor", "testdata", "build"}
+# go test's per-package summary, e.g. "ok  \texample.com/app\t0.012s\tcoverage: 80.0%"
+RESULT_RE = re.compile(r"^(ok|FAIL)\s+(\S+)\s+([\d.]+)s\b")
 
 CLEAN_PATTERNS = [
     "build",
@@ -19,7 +26,18 @@ CLEAN_PATTERNS = [
 ]
 
 
+def module_cache_dir() -> Path:
+    """Where go keeps downloaded modules (``go env GOMODCACHE`` without running go)."""
+    override = os.environ.get("GOMODCACHE")
+    if override:
+        return Path(override)
+    gopath = os.environ.get("GOPATH", "").split(os.pathsep)[0]
+    return (Path(gopath) if gopath else Path.home() / "go") / "pkg" / "mod"
+
+
 class GoTool(BuildTool):
+    clean_patterns = CLEAN_PATTERNS
+
     @property
     def name(self) -> str:
         return "go"
@@ -36,19 +54,11 @@ class GoTool(BuildTool):
         return 0
 
     def build(self) -> int:
-        vet_result = run_command(["go", "vet", "./..."], cwd=self.project_dir)
-        if vet_result != 0:
-            console.print("[red]Build aborted: vet failed[/red]")
-            return vet_result
-
-        test_result = self.test()
-        if test_result != 0:
-            console.print("[red]Build aborted: tests failed[/red]")
-            return test_result
-
-        build_dir = self.project_dir / "build"
-        build_dir.mkdir(exist_ok=True)
+        """Vet, test and compile every entrypoint, up to ``jobs`` at once.
 
+        Binaries are compiled into a staging directory and only moved into
+        build/ once every stage has passed.
+        """
         cmd_dir = self.project_dir / "cmd"
         entrypoints = sorted(
             d for d in cmd_dir.iterdir() if d.is_dir()
@@ -58,19 +68,83 @@ class GoTool(BuildTool):
             console.print("[red]Build aborted: no entrypoints found in cmd/[/red]")
             return 1
 
-        for entry in entrypoints:
-            output = build_dir / entry.name
-            code = run_command(
-                ["go", "build", "-o", str(output), f"./cmd/{entry.name}"],
-                cwd=self.project_dir,
+        build_dir = self.project_dir / "build"
+        staging = staging_dir(build_dir)
+        stages = [
+            command_stage("vet", ["go", "vet", "./..."], self.project_dir, timeout=self.options.timeout),
+            call_stage("test", self.test),
+        ]
+        stages += [
+            command_stage(
+                f"build {entry.name}",
+                ["go", "build", "-o", str(staging / entry.name), f"./cmd/{entry.name}"],
+                self.project_dir,
+                timeout=self.options.timeout,
             )
-            if code != 0:
-                return code
+            for entry in entrypoints
+        ]
 
-        return 0
+        def publish() -> int:
+            console.print(f"[green]Built: {', '.join(publish_staged(build_dir))}[/green]")
+            return 0
+
+        try:
+            return run_pipeline(stages, publish, jobs=self.options.jobs, fail_fast=self.options.fail_fast)
+        finally:
+            discard_staged(build_dir)
 
     def test(self) -> int:
-        return run_command(["go", "test", "-cover", "./..."], cwd=self.project_dir)
+        from ..ordering import priorities
+
+        # Packages are only listed when some should run first
+        first = priorities(self)
+        units = self.test_units() if first else None
+        return self.run_tests(first.order(self, units) if units else ["./..."])
+
+    def run_tests(self, units: list[str]) -> int:
+        """``go test`` the given packages, recording each package's time.
+
+        With ``fail_fast`` the run stops at the first failing package.
+        """
+        def on_line(line: str) -> bool:
+            match = RESULT_RE.match(line)
+            if not match:
+                return False
+            status, package, seconds = match.groups()
+            timings.record("test", package, float(seconds), 0 if status == "ok" else 1)
+            return status == "FAIL" and self.options.fail_fast
+
+        return run_command(
+            [*self._test_args(), *units], cwd=self.project_dir, on_line=on_line, timeout=self.options.timeout
+        )
+
+    def _test_args(self) -> list[str]:
+        args = ["go", "test"]
+        if self.options.coverage:
+            args.append("-cover")
+        if self.options.fail_fast:
+            args.append("-failfast")
+        return args
+
+    def test_units(self) -> list[str] | None:
+        """Packages from ``go list ./...``."""
+        try:
+            result = subprocess.run(
+                ["go", "list", "./..."], cwd=self.project_dir, capture_output=True, text=True
+            )
+        except OSError as e:
+            console.print(f"[red]Cannot list packages: {e}[/red]")
+            return None
+        if result.returncode != 0:
+            console.print(f"[red]go list failed: {result.stderr.strip()}[/red]")
+            return None
+        return result.stdout.split()
+
+    def test_unit_path(self, unit: str) -> Path | None:
+        module_match = MODULE_RE.search(self._read(self.project_dir / "go.mod"))
+        if not module_match or not (unit == module_match.group(1) or unit.startswith(f"{module_match.group(1)}/")):
+            return None
+        return self.project_dir / unit[len(module_match.group(1)):].lstrip("/")
 
     def install(self) -> int:
         return run_command(["go", "mod", "tidy"], cwd=self.project_dir)
@@ -82,35 +156,106 @@ class GoTool(BuildTool):
         return run_command(cmd, cwd=self.project_dir)
 
     def clean(self) -> int:
-        cleaned = []
-        for pattern in CLEAN_PATTERNS:
-            if "*" in pattern:
-                for path in self.project_dir.glob(pattern):
-                    self._remove_path(path)
-                    cleaned.append(str(path.relative_to(self.project_dir)))
-            else:
-                path = self.project_dir / pattern
-                if path.exists():
-                    self._remove_path(path)
-                    cleaned.append(pattern)
-
-        if cleaned:
-            console.print(f"[green]Cleaned: {', '.join(cleaned)}[/green]")
-        else:
-            console.print("[dim]Nothing to clean[/dim]")
-
-        return 0
+        return self.remove_clean_targets()
 
     def uplift(self) -> int:
         self._create_dirs()
         self._create_gitignore()
         return 0
 
-    def _remove_path(self, path: Path) -> None:
-        if path.is_dir():
-            shutil.rmtree(path)
-        else:
-            path.unlink()
+    def build_outputs(self) -> list[Path]:
+        return [self.project_dir / name for name in ["build"]]
+
+    def install_inputs(self) -> list[Path]:
+        return [self.project_dir / name for name in ["go.mod", "go.sum"]]
+
+    def install_state(self) -> list[str]:
+        """Third-party imports; adding or dropping one changes what tidy does."""
+        module_match = MODULE_RE.search(self._read(self.project_dir / "go.mod"))
+        module = module_match.group(1) if module_match else None
+        external = {
+            path
+            for imported in self._package_imports().values()
+            for path in imported
+            if "." in path.split("/")[0] and not (module and (path == module or path.startswith(f"{module}/")))
+        }
+        return [f"import:{path}" for path in sorted(external)]
+
+    def install_environment(self) -> list[Path]:
+        if not self._read(self.project_dir / "go.sum").strip():
+            return []
+        return [module_cache_dir()]
+
+    def affected_tests(self, changed: list[Path]) -> list[Task] | None:
+        """``go test`` for the changed packages and every package importing them."""
+        affected = self._affected_packages(changed)
+        if affected is None:
+            return None
+        if not affected:
+            return []
+        patterns = [self._package_pattern(d) for d in sorted(affected)]
+        return [Task("go test", [*self._test_args(), *patterns])]
+
+    def affected_units(self, changed: list[Path]) -> list[str] | None:
+        """Import paths of the changed packages and every package importing them."""
+        module_match = MODULE_RE.search(self._read(self.project_dir / "go.mod"))
+        affected = self._affected_packages(changed)
+        if affected is None or not module_match:
+            return None
+        return [self._import_path(module_match.group(1), d) for d in sorted(affected)]
+
+    def _affected_packages(self, changed: list[Path]) -> set[Path] | None:
+        """Directories of the changed packages and of every package importing them."""
+        if any(path.name in ("go.mod", "go.sum") for path in changed):
+            return None
+        dirs = {path.parent for path in changed if path.suffix == ".go"}
+        if not dirs:
+            return set()
+
+        module_match = MODULE_RE.search(self._read(self.project_dir / "go.mod"))
+        imports = self._package_imports()
+        affected = {d for d in dirs if d in imports}
+        if module_match:
+            module = module_match.group(1)
+            changed_paths = {self._import_path(module, d) for d in dirs}
+            while True:
+                importers = {
+                    d for d, imported in imports.items()
+                    if d not in affected and imported & changed_paths
+                }
+                if not importers:
+                    break
+                affected |= importers
+                changed_paths |= {self._import_path(module, d) for d in importers}
+        return affected
+
+    def _package_imports(self) -> dict[Path, set[str]]:
+        """Import paths used by each package directory in the module."""
+        imports: dict[Path, set[str]] = {}
+        for root, dirs, files in os.walk(self.project_dir):
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS and not d.startswith((".", "_"))]
+            sources = [f for f in files if f.endswith(".go")]
+            if not sources:
+                continue
+            found = imports.setdefault(Path(root), set())
+            for name in sources:
+                for block, single in IMPORT_RE.findall(self._read(Path(root) / name)):
+                    found.update(re.findall(r'"([^"]+)"', block or single))
+        return imports
+
+    def _import_path(self, module: str, directory: Path) -> str:
+        rel = directory.relative_to(self.project_dir).as_posix()
+        return module if rel == "." else f"{module}/{rel}"
+
+    def _package_pattern(self, directory: Path) -> str:
+        rel = directory.relative_to(self.project_dir).as_posix()
+        return "." if rel == "." else f"./{rel}"
+
+    def _read(self, path: Path) -> str:
+        try:
+            return path.read_text(errors="replace")
+        except OSError:
+            return ""
 
     def _create_dirs(self) -> None:
         for dirname in ["cmd", "pkg", "internal", "scripts"]:
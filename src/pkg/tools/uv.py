@@ -1,18 +1,19 @@
-import shutil
+import os
+import re
+import subprocess
 from pathlib import Path
 
-from rich.console import Console
-
 from .base import BuildTool
-from ..runner import run_command
-
-console = Console()
+from .. import timings
+from ..runner import Task, run_command
+from ..console import console
+from ..pipeline import call_stage, command_stage, discard_staged, publish_staged, run_pipeline, staging_dir
 
 CLEAN_PATTERNS = [
     ".venv",
     "dist",
-    "*.egg-info",
-    "__pycache__",
+    "**/*.egg-info",
+    "**/__pycache__",
     ".pytest_cache",
     ".ruff_cache",
     ".mypy_cache",
@@ -21,8 +22,15 @@ CLEAN_PATTERNS = [
     "build",
 ]
 
+# Changes to these can affect any test
+SUITE_FILES = {"pyproject.toml", "uv.lock", "conftest.py"}
+
 
 class UvTool(BuildTool):
+    clean_patterns = CLEAN_PATTERNS
+    # Scripts and pyvenv.cfg hold absolute paths
+    relocatable_environment = False
+
     @property
     def name(self) -> str:
         return "uv"
@@ -37,13 +45,35 @@ class UvTool(BuildTool):
         return 0
 
     def build(self) -> int:
-        code = run_command(["uv", "build"], cwd=self.project_dir)
-        if code != 0:
-            return code
-        return self.test()
+        """Build the distributions and run the tests at once.
+
+        Distributions go to a staging directory and are only moved into dist/
+        once the tests have passed too.
+        """
+        dist_dir = self.project_dir / "dist"
+        staging = staging_dir(dist_dir)
+        stages = [
+            command_stage(
+                "build", ["uv", "build", "--out-dir", str(staging)], self.project_dir, timeout=self.options.timeout
+            ),
+            call_stage("test", self.test),
+        ]
+
+        def publish() -> int:
+            console.print(f"[green]Built: {', '.join(publish_staged(dist_dir))}[/green]")
+            return 0
+
+        try:
+            return run_pipeline(stages, publish, jobs=self.options.jobs, fail_fast=self.options.fail_fast)
+        finally:
+            discard_staged(dist_dir)
 
     def test(self) -> int:
-        return run_command(["uv", "run", "pytest"], cwd=self.project_dir)
+        return run_command(
+            ["uv", "run", "pytest", *self._pytest_order_args(), *self._pytest_profile_args()],
+            cwd=self.project_dir,
+            timeout=self.options.timeout,
+        )
 
     def install(self) -> int:
         return run_command(["uv", "sync", "--group", "dev"], cwd=self.project_dir)
@@ -55,35 +85,185 @@ class UvTool(BuildTool):
         return run_command(cmd, cwd=self.project_dir)
 
     def clean(self) -> int:
-        cleaned = []
-        for pattern in CLEAN_PATTERNS:
-            if "*" in pattern:
-                for path in self.project_dir.glob(pattern):
-                    self._remove_path(path)
-                    cleaned.append(str(path.relative_to(self.project_dir)))
-            else:
-                path = self.project_dir / pattern
-                if path.exists():
-                    self._remove_path(path)
-                    cleaned.append(pattern)
-
-        if cleaned:
-            console.print(f"[green]Cleaned: {', '.join(cleaned)}[/green]")
-        else:
-            console.print("[dim]Nothing to clean[/dim]")
-
-        return 0
+        return self.remove_clean_targets()
 
     def uplift(self) -> int:
         self._add_dev_dependencies()
         self._create_gitignore()
         return 0
 
-    def _remove_path(self, path: Path) -> None:
-        if path.is_dir():
-            shutil.rmtree(path)
-        else:
-            path.unlink()
+    def run_tests(self, units: list[str]) -> int:
+        """pytest the given node IDs, recording each one's time from a JUnit report.
+
+        A shard of a local sharded run keeps its report and coverage data in
+        its own work_dir, so shards running side by side do not overwrite
+        each other's.
+        """
+        from ..cache import project_cache_dir
+
+        report_dir = self.options.work_dir or project_cache_dir(self.project_dir)
+        report = report_dir / "junit.xml"
+        report.parent.mkdir(parents=True, exist_ok=True)
+        report.unlink(missing_ok=True)
+        args = self._pytest_profile_args()
+        env = None
+        if self.options.coverage and self._uses_coverage():
+            # A subset of the tests cannot meet a whole-suite coverage threshold
+            args.append("--cov-fail-under=0")
+            if self.options.work_dir is not None:
+                env = {**os.environ, "COVERAGE_FILE": str(self.options.work_dir / ".coverage")}
+                args.append("--cov-report=")
+        code = run_command(
+            ["uv", "run", "pytest", *self._pytest_order_args(), f"--junitxml={report}", *args, *units],
+            cwd=self.project_dir,
+            timeout=self.options.timeout,
+            env=env,
+        )
+        self._record_report(report, units)
+        return code
+
+    def test_units(self) -> list[str] | None:
+        """Node IDs from ``pytest --collect-only``."""
+        args = ["uv", "run", "pytest", "--collect-only", "-q"]
+        if self._uses_coverage():
+            args.append("--no-cov")
+        try:
+            result = subprocess.run(args, cwd=self.project_dir, capture_output=True, text=True)
+        except OSError as e:
+            console.print(f"[red]Cannot collect tests: {e}[/red]")
+            return None
+        # 5 means no tests were collected
+        if result.returncode not in (0, 5):
+            console.print("[red]Test collection failed[/red]")
+            console.print(result.stdout + result.stderr, markup=False)
+            return None
+        return [line for line in result.stdout.splitlines() if "::" in line and not line.startswith(" ")]
+
+    def test_unit_path(self, unit: str) -> Path | None:
+        return self.project_dir / unit.split("::")[0]
+
+    def build_outputs(self) -> list[Path]:
+        return [self.project_dir / name for name in ["dist", "build"]]
+
+    def install_inputs(self) -> list[Path]:
+        return [self.project_dir / name for name in ["pyproject.toml", "uv.lock", ".python-version"]]
+
+    def install_state(self) -> list[str]:
+        python = self.project_dir / ".venv" / "bin" / "python"
+        try:
+            target = python.resolve(strict=True)
+            st = target.stat()
+        except OSError:
+            return ["python:missing"]
+        return [f"python:{target}:{st.st_size}:{st.st_mtime_ns}"]
+
+    def install_environment(self) -> list[Path]:
+        venv = self.project_dir / ".venv"
+        return [venv / "pyvenv.cfg", venv / "bin" / "python"]
+
+    def environment_dir(self) -> Path | None:
+        return self.project_dir / ".venv"
+
+    def affected_tests(self, changed: list[Path]) -> list[Task] | None:
+        """Changed test modules, plus modules named after or importing a changed module."""
+        modules = self.affected_units(changed)
+        if not modules:
+            return modules
+        # A few modules cannot meet a whole-suite coverage threshold
+        args = ["--no-cov"] if self._uses_coverage() else []
+        return [Task("pytest", ["uv", "run", "pytest", *args, *modules])]
+
+    def affected_units(self, changed: list[Path]) -> list[str] | None:
+        """Paths of the changed test modules and of those named after or importing a changed module."""
+        if any(path.name in SUITE_FILES for path in changed):
+            return None
+        tests_dir = self.project_dir / "tests"
+        if not tests_dir.is_dir():
+            return None
+
+        test_files = sorted(
+            f for pattern in ("test_*.py", "*_test.py") for f in tests_dir.rglob(pattern)
+        )
+        sources: dict[Path, str] = {}
+        selected = set()
+        for path in changed:
+            if path.suffix != ".py":
+                continue
+            if path in test_files:
+                selected.add(path)
+                continue
+            module = path.parent.name if path.stem == "__init__" else path.stem
+            imports = re.compile(rf"^\s*(from|import)\s+([\w.]*\.)?{re.escape(module)}\b", re.M)
+            for test in test_files:
+                if test.name in (f"test_{module}.py", f"{module}_test.py"):
+                    selected.add(test)
+                    continue
+                if test not in sources:
+                    sources[test] = test.read_text(errors="replace")
+                if imports.search(sources[test]):
+                    selected.add(test)
+
+        return [str(f.relative_to(self.project_dir)) for f in sorted(selected)]
+
+    def _pytest_order_args(self) -> list[str]:
+        """pytest's own last-failed-first and newest-files-first ordering.
+
+        Both options come from pytest's cacheprovider plugin, so they are left
+        out when a project disables it.
+        """
+        args = [] if self._cacheprovider_disabled() else ["--ff", "--nf"]
+        if self.options.fail_fast:
+            args.append("-x")
+        return args
+
+    def _pytest_profile_args(self) -> list[str]:
+        """Turn off pytest-cov, or spread tests over pytest-xdist workers, per the test profile."""
+        args = []
+        if not self.options.coverage and self._uses_coverage():
+            args.append("--no-cov")
+        if self.options.parallel and self._mentions("pytest-xdist"):
+            args += ["-n", "auto"]
+        return args
+
+    def _cacheprovider_disabled(self) -> bool:
+        disabled = "no:cacheprovider"
+        return disabled in os.environ.get("PYTEST_ADDOPTS", "") or self._mentions(
+            disabled, ("pyproject.toml", "pytest.ini", "setup.cfg", "tox.ini")
+        )
+
+    def _uses_coverage(self) -> bool:
+        return self._mentions("--cov", ("pyproject.toml",))
+
+    def _mentions(self, text: str, files: tuple[str, ...] = ("pyproject.toml", "uv.lock")) -> bool:
+        for name in files:
+            try:
+                if text in (self.project_dir / name).read_text():
+                    return True
+            except OSError:
+                continue
+        return False
+
+    def _record_report(self, report: Path, units: list[str]) -> None:
+        """Record JUnit testcase times against the node IDs they came from."""
+        import xml.etree.ElementTree as ElementTree
+
+        try:
+            cases = ElementTree.parse(report).iter("testcase")
+        except (OSError, ElementTree.ParseError):
+            return
+        by_case = {}
+        for unit in units:
+            path, *names = unit.split("::")
+            if not names:
+                continue
+            classname = ".".join([path.removesuffix(".py").replace("/", "."), *names[:-1]])
+            by_case[(classname, names[-1])] = unit
+        for case in cases:
+            unit = by_case.get((case.get("classname"), case.get("name")))
+            if unit is None:
+                continue
+            failed = case.find("failure") is not None or case.find("error") is not None
+            timings.record("test", unit, float(case.get("time") or 0), int(failed))
 
     def _add_dev_dependencies(self) -> None:
         pyproject_path = self.project_dir / "pyproject.toml"
@@ -96,7 +276,7 @@ class UvTool(BuildTool):
 
         dev_config = """
 [dependency-groups]
-dev = ["pytest>=8.0.0", "pytest-mock>=3.12.0", "pytest-cov>=4.1.0"]
+dev = ["pytest>=8.0.0", "pytest-mock>=3.12.0", "pytest-cov>=4.1.0", "pytest-xdist>=3.5.0"]
 
 [tool.pytest.ini_options]
 addopts = "--cov=. --cov-report=term-missing --cov-report=html --cov-fail-under=90"
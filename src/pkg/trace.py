@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+
+class Tracer:
+    """Collects spans as Chrome trace "complete" events (viewable in Perfetto)."""
+
+    def __init__(self):
+        self.events: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._threads: dict[int, int] = {}
+        self._origin = time.perf_counter_ns()
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self._threads:
+                tid = len(self._threads) + 1
+                self._threads[ident] = tid
+                self.events.append({
+                    "name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                    "args": {"name": threading.current_thread().name},
+                })
+            return self._threads[ident]
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args: Any) -> Iterator[dict[str, Any]]:
+        tid = self._tid()
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter_ns()
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (start - self._origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def write(self, path: Path) -> None:
+        import json
+
+        with self._lock:
+            events = [{
+                "name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0,
+                "args": {"name": "pkg"},
+            }] + list(self.events)
+        Path(path).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+
+
+_tracer: Tracer | None = None
+
+
+def enable() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> None:
+    global _tracer
+    _tracer = None
+
+
+@contextmanager
+def span(name: str, cat: str = "pkg", **args: Any) -> Iterator[dict[str, Any]]:
+    """Record a span when tracing is enabled; the yielded dict becomes its args."""
+    if _tracer is None:
+        yield args
+        return
+    with _tracer.span(name, cat, **args) as span_args:
+        yield span_args
+
+
+def rusage_args(rusage) -> dict[str, float]:
+    """Span args for a child's resource usage (ru_maxrss is KiB on Linux)."""
+    return {
+        "cpu_user_s": rusage.ru_utime,
+        "cpu_sys_s": rusage.ru_stime,
+        "max_rss_kb": rusage.ru_maxrss,
+    }
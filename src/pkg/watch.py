@@ -0,0 +1,329 @@
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+from .cache import IGNORED_NAMES
+from .config import CONFIG_FILENAME
+from .console import console
+from .runner import Task, run_parallel, summarize
+from .scheduler import CancelToken
+from .tools.base import BuildTool
+
+DEBOUNCE_SECONDS = 0.2
+POLL_INTERVAL = 0.5
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class IgnoreRules:
+    """Which paths to ignore: VCS data, the tool's clean patterns and .gitignore.
+
+    Supports the common .gitignore forms (globs, anchored paths, trailing
+    slashes); negated patterns are not supported and are skipped.
+    """
+
+    def __init__(self, root: Path, patterns: list[str]):
+        self.root = root
+        self.names: list[str] = list(IGNORED_NAMES)
+        self.anchored: list[str] = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith(("#", "!")):
+                continue
+            pattern = pattern.rstrip("/").removeprefix("**/")
+            if "/" in pattern:
+                self.anchored.append(pattern.lstrip("/"))
+            else:
+                self.names.append(pattern)
+
+    @classmethod
+    def for_project(cls, project_dir: Path, clean_patterns: list[str]) -> "IgnoreRules":
+        try:
+            gitignore = (project_dir / ".gitignore").read_text().splitlines()
+        except OSError:
+            gitignore = []
+        return cls(project_dir, list(clean_patterns) + gitignore)
+
+    def ignored(self, path: Path) -> bool:
+        try:
+            parts = path.relative_to(self.root).parts
+        except ValueError:
+            return True
+        for i, part in enumerate(parts):
+            if any(fnmatch.fnmatch(part, name) for name in self.names):
+                return True
+            prefix = "/".join(parts[:i + 1])
+            if any(fnmatch.fnmatch(prefix, pattern) for pattern in self.anchored):
+                return True
+        return False
+
+    def walk(self, top: Path | None = None) -> Iterator[tuple[str, list[str], list[str]]]:
+        """os.walk from top (default the root), pruning ignored directories and files."""
+        for root, dirs, files in os.walk(top or self.root):
+            dirs[:] = [d for d in dirs if not self.ignored(Path(root) / d)]
+            yield root, dirs, [f for f in files if not self.ignored(Path(root) / f)]
+
+
+class PollingWatcher:
+    """Detects changes by comparing (mtime, size) snapshots of the tree."""
+
+    kind = "polling"
+
+    def __init__(self, rules: IgnoreRules, interval: float = POLL_INTERVAL):
+        self.rules = rules
+        self.interval = interval
+        self.state = self.snapshot()
+
+    def snapshot(self) -> dict[Path, tuple[int, int]]:
+        state = {}
+        for root, _, files in self.rules.walk():
+            for name in files:
+                path = Path(root) / name
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def poll(self, timeout: float | None) -> set[Path]:
+        """Changed paths, waiting up to timeout (forever when None) for some."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = max(0.0, min(delay, deadline - time.monotonic()))
+            time.sleep(delay)
+            current = self.snapshot()
+            changed = {
+                path for path in current.keys() | self.state.keys()
+                if current.get(path) != self.state.get(path)
+            }
+            self.state = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify, with a watch on every directory that is not ignored."""
+
+    kind = "inotify"
+
+    def __init__(self, rules: IgnoreRules):
+        self.rules = rules
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: dict[int, Path] = {}
+        try:
+            self._add_tree(rules.root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch {directory}: {os.strerror(errno)}")
+        self.dirs[wd] = directory
+
+    def _add_tree(self, directory: Path) -> set[Path]:
+        """Watch directory and its subdirectories, returning the files inside."""
+        files = set()
+        for root, _, names in self.rules.walk(directory):
+            self._add_watch(Path(root))
+            files.update(Path(root) / name for name in names)
+        return files
+
+    def poll(self, timeout: float | None) -> set[Path]:
+        """Changed paths, waiting up to timeout (forever when None) for some."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return set()
+            changed = self._read_events()
+            if changed:
+                return changed
+
+    def _read_events(self) -> set[Path]:
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; report the root so everything reruns
+                changed.add(self.rules.root)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if self.rules.ignored(path):
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self._add_tree(path))
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(rules: IgnoreRules, poll: bool = False) -> InotifyWatcher | PollingWatcher:
+    """An inotify watcher where available, polling otherwise."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(rules)
+        except (OSError, AttributeError) as e:
+            console.print(f"[yellow]inotify unavailable ({e}), polling instead[/yellow]")
+    return PollingWatcher(rules)
+
+
+def collect_changes(watcher, debounce: float) -> set[Path]:
+    """Block for the next change, then gather events until quiet for debounce seconds."""
+    changed = set()
+    while not changed:
+        changed = watcher.poll(None)
+    while True:
+        more = watcher.poll(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+def plan_tasks(tool: BuildTool, command: str, changed: set[Path]) -> list[Task]:
+    """What to run for a batch of changes: affected tests, or the whole command."""
+    full = [Task(f"pkg {command}", [sys.executable, "-m", "pkg.cli", command])]
+    if command != "test" or any(p.name == CONFIG_FILENAME or p == tool.project_dir for p in changed):
+        return full
+    tasks = tool.affected_tests(sorted(changed))
+    return full if tasks is None else tasks
+
+
+class WatchRun:
+    """One cancellable run of tasks in a background thread."""
+
+    def __init__(self, tool: BuildTool, tasks: list[Task]):
+        self.tool = tool
+        self.tasks = tasks
+        self.token = CancelToken()
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, name="pkg-watch", daemon=True)
+
+    def start(self) -> "WatchRun":
+        self.thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self.thread.is_alive()
+
+    def cancel(self) -> None:
+        self.token.cancel()
+        self.thread.join()
+
+    def _run(self) -> None:
+        start = time.monotonic()
+        results = run_parallel(
+            self.tasks,
+            cwd=self.tool.project_dir,
+            jobs=self.tool.options.jobs,
+            token=self.token,
+            buffered=True,
+        )
+        if self.token.cancelled:
+            return
+        self.finished = True
+
+        passed, failed, _ = summarize(results)
+        elapsed = time.monotonic() - start
+        if failed:
+            console.print(f"[red]Failed: {', '.join(failed)} ({elapsed:.2f}s)[/red]")
+        else:
+            console.print(f"[green]Passed: {', '.join(passed)} ({elapsed:.2f}s)[/green]")
+        console.print("[dim]Waiting for changes...[/dim]")
+
+
+def watch_project(
+    tool: BuildTool,
+    command: str,
+    debounce: float = DEBOUNCE_SECONDS,
+    poll: bool = False,
+) -> int:
+    """Re-run ``command`` for each batch of changes until interrupted."""
+    project_dir = tool.project_dir
+    rules = IgnoreRules.for_project(project_dir, tool.clean_patterns)
+    watcher = make_watcher(rules, poll)
+    console.print(
+        f"[green]Watching {project_dir} ({watcher.kind}) for pkg {command}; Ctrl-C to stop[/green]"
+    )
+
+    run: WatchRun | None = None
+    pending: set[Path] = set()
+    try:
+        while True:
+            changed = collect_changes(watcher, debounce)
+            if run is not None and run.running:
+                console.print("[yellow]Changes detected, cancelling the current run[/yellow]")
+                run.cancel()
+            if run is not None and run.finished:
+                pending = set()
+            # Changes behind a cancelled run still need testing
+            pending |= changed
+
+            names = sorted(p.relative_to(project_dir).as_posix() for p in changed if p != project_dir)
+            console.print(f"[dim]Changed: {', '.join(names) or 'project'}[/dim]")
+
+            tasks = plan_tasks(tool, command, pending)
+            if not tasks:
+                console.print("[dim]No tests affected[/dim]")
+                pending = set()
+                run = None
+                continue
+            run = WatchRun(tool, tasks).start()
+    except KeyboardInterrupt:
+        if run is not None and run.running:
+            run.cancel()
+        console.print("[dim]Stopped watching[/dim]")
+        return 0
+    finally:
+        watcher.close()
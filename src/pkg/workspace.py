@@ -0,0 +1,200 @@
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import CONFIG_FILENAME, Config, find_project_root
+from .console import console
+from .runner import resolve_jobs, run_process
+from .scheduler import Node, NodeResult, run_graph, toposort
+
+WORKSPACE_COMMANDS = ("build", "test", "install", "clean")
+
+
+@dataclass
+class Member:
+    name: str  # path relative to the workspace root
+    path: Path
+    config: Config
+
+
+def find_workspace_root(start: Path | None = None) -> Path | None:
+    """Nearest directory at or above start whose pkg.toml has a [workspace] table."""
+    current = start or Path.cwd()
+    for directory in [current, *current.parents]:
+        if (directory / CONFIG_FILENAME).exists():
+            if Config.load(directory).workspace is not None:
+                return directory
+    return None
+
+
+def discover_members(root: Path, config: Config) -> list[Member]:
+    members: dict[str, Member] = {}
+    for pattern in config.workspace.members:
+        for path in sorted(root.glob(pattern)):
+            if path == root or not (path / CONFIG_FILENAME).is_file():
+                continue
+            name = path.relative_to(root).as_posix()
+            if name not in members:
+                members[name] = Member(name, path, Config.load(path))
+    return list(members.values())
+
+
+def changed_files(root: Path, since: str) -> list[str] | None:
+    """Paths below root, relative to it, changed on this branch since the git ref.
+
+    Changes are taken from the merge base of since and HEAD, so commits that
+    only landed on since do not count. Uncommitted and untracked files count
+    too, and a moved file counts at both its old and new path. Returns None
+    when git fails, e.g. for an unknown ref.
+    """
+    base = _git(root, "merge-base", since, "HEAD")
+    if base is None:
+        return None
+    diff = _git(root, "diff", "--name-only", "--no-renames", "--relative", base.strip(), "--")
+    untracked = _git(root, "ls-files", "--others", "--exclude-standard")
+    if diff is None or untracked is None:
+        return None
+    lines = diff.splitlines() + untracked.splitlines()
+    return list(dict.fromkeys(line for line in lines if line))
+
+
+def _git(root: Path, *args: str) -> str | None:
+    try:
+        result = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True)
+    except OSError as e:
+        console.print(f"[red]Cannot run git: {e}[/red]")
+        return None
+    if result.returncode != 0:
+        console.print(f"[red]git {' '.join(args)} failed: {result.stderr.strip()}[/red]")
+        return None
+    return result.stdout
+
+
+def owning_member(root: Path, path: str, members: list[Member]) -> Member | None:
+    """The member whose project root find_project_root would pick for path."""
+    project = find_project_root((root / path).parent)
+    return next((m for m in members if m.path == project), None)
+
+
+def affected_members(members: list[Member], changed: set[str]) -> dict[str, str]:
+    """Changed members plus, transitively, members depending on them.
+
+    Maps each affected member's name to why it is affected, in member order.
+    """
+    reasons = {name: "changed" for name in changed}
+    grew = True
+    while grew:
+        grew = False
+        for member in members:
+            if member.name in reasons:
+                continue
+            cause = next((d for d in member.config.depends_on if d in reasons), None)
+            if cause is not None:
+                reasons[member.name] = f"depends on {cause}"
+                grew = True
+    return {m.name: reasons[m.name] for m in members if m.name in reasons}
+
+
+def find_affected(root: Path, since: str) -> tuple[list[Member], dict[str, str]] | None:
+    """Workspace members and the ones affected by changes since a git ref."""
+    members = discover_members(root, Config.load(root))
+    files = changed_files(root, since)
+    if files is None:
+        return None
+    changed = {m.name for m in (owning_member(root, f, members) for f in files) if m is not None}
+    return members, affected_members(members, changed)
+
+
+def member_graph(
+    members: list[Member],
+    command: str,
+    buffered: bool,
+    only: set[str] | None = None,
+) -> list[Node]:
+    """One node per member running ``pkg <command>`` in its directory.
+
+    ``depends_on`` entries are member names, i.e. paths relative to the
+    workspace root. Raises ValueError for unknown members and cycles. With
+    ``only`` just those members run, ordered by the dependencies among them.
+    """
+    known = {member.name for member in members}
+    nodes = []
+    for member in members:
+        unknown = [d for d in member.config.depends_on if d not in known]
+        if unknown:
+            raise ValueError(f"{member.name} needs unknown {unknown[0]}")
+        if only is not None and member.name not in only:
+            continue
+        args = [sys.executable, "-m", "pkg.cli", command]
+
+        def action(token, member=member, args=args):
+            return run_process(
+                args,
+                member.path,
+                header=f"[blue]> {member.name}: pkg {command}[/blue]",
+                token=token,
+                buffered=buffered,
+            )
+
+        needs = [d for d in member.config.depends_on if only is None or d in only]
+        nodes.append(Node(member.name, action, needs))
+    toposort(nodes)
+    return nodes
+
+
+def print_results(members: list[Member], results: list[NodeResult]) -> None:
+    from rich.table import Table
+
+    table = Table(title="Workspace")
+    table.add_column("Member")
+    table.add_column("Tool")
+    table.add_column("Result")
+    table.add_column("Time", justify="right")
+
+    tools = {m.name: m.config.tool for m in members}
+    for result in results:
+        if result.returncode is None:
+            status = "[yellow]skipped[/yellow]"
+        elif result.ok:
+            status = "[green]passed[/green]"
+        else:
+            status = f"[red]failed ({result.returncode})[/red]"
+        duration = f"{result.duration:.2f}s" if result.returncode is not None else "-"
+        table.add_row(result.name, tools[result.name], status, duration)
+    console.print(table)
+
+
+def run_workspace(
+    start: Path,
+    command: str,
+    fail_fast: bool = False,
+    only: set[str] | None = None,
+) -> int:
+    """Run a pkg command in every workspace member (or those in ``only``), dependencies first."""
+    root = find_workspace_root(start)
+    if root is None:
+        console.print(f"[red]No \\[workspace] table found in {CONFIG_FILENAME}[/red]")
+        return 1
+
+    config = Config.load(root)
+    members = discover_members(root, config)
+    if not members:
+        console.print("[dim]No workspace members found[/dim]")
+        return 0
+
+    selected = [m for m in members if only is None or m.name in only]
+    if not selected:
+        console.print("[dim]No affected workspace members[/dim]")
+        return 0
+
+    jobs = min(resolve_jobs(config.workspace.jobs), len(selected))
+    try:
+        nodes = member_graph(members, command, buffered=jobs > 1, only=only)
+    except ValueError as e:
+        console.print(f"[red]Invalid workspace: {e}[/red]")
+        return 1
+
+    results = run_graph(nodes, jobs=jobs, fail_fast=fail_fast)
+    print_results(members, results)
+    return 0 if all(r.ok for r in results) else 1
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path_factory, monkeypatch):
+    cache_dir = tmp_path_factory.mktemp("pkg-cache")
+    monkeypatch.setenv("PKG_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def no_session(monkeypatch):
+    """Tests start outside any CI session, even when the suite itself runs on CI."""
+    from pkg.cache import SESSION_VARS
+
+    for var in SESSION_VARS:
+        monkeypatch.delenv(var, raising=False)
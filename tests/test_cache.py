@@ -0,0 +1,497 @@
+import json
+import os
+import pytest
+from pathlib import Path
+from pkg.cache import (
+    BuildCache,
+    EnvironmentStore,
+    InstallCache,
+    SessionTestCache,
+    clone_tree,
+    fingerprint,
+    iter_source_files,
+    project_cache_dir,
+    session_id,
+    user_cache_dir,
+)
+from pkg.tools.bash import BashTool
+from pkg.tools.bun import BunTool
+from pkg.tools.go import GoTool
+from pkg.tools.uv import UvTool
+
+
+def test_user_cache_dir_override(tmp_path, monkeypatch):
+    monkeypatch.setenv("PKG_CACHE_DIR", str(tmp_path))
+    assert user_cache_dir() == tmp_path
+
+
+def test_user_cache_dir_xdg(tmp_path, monkeypatch):
+    monkeypatch.delenv("PKG_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert user_cache_dir() == tmp_path / "pkg"
+
+
+def test_user_cache_dir_home(monkeypatch):
+    monkeypatch.delenv("PKG_CACHE_DIR")
+    monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+    assert user_cache_dir() == Path.home() / ".cache" / "pkg"
+
+
+def test_project_cache_dir_is_per_project(tmp_path):
+    a = project_cache_dir(tmp_path / "a")
+    b = project_cache_dir(tmp_path / "b")
+    assert a != b
+    assert a.name.startswith("a-")
+
+
+def test_iter_source_files_skips_artifacts(tmp_path):
+    (tmp_path / "main.py").write_text("x")
+    (tmp_path / "dist").mkdir()
+    (tmp_path / "dist" / "out.whl").write_text("x")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("x")
+    (tmp_path / "src" / "__pycache__").mkdir(parents=True)
+    (tmp_path / "src" / "__pycache__" / "a.pyc").write_text("x")
+    (tmp_path / "src" / "dist").mkdir()
+    (tmp_path / "src" / "dist" / "keep.py").write_text("x")
+    files = [p.relative_to(tmp_path).as_posix() for p in iter_source_files(tmp_path, ["dist"])]
+    assert files == ["main.py", "src/dist/keep.py"]
+
+
+def test_fingerprint_stable(tmp_path):
+    (tmp_path / "main.go").write_text("package main")
+    tool = GoTool(tmp_path)
+    assert fingerprint(tmp_path, tool) == fingerprint(tmp_path, tool)
+
+
+def test_fingerprint_changes_with_sources(tmp_path):
+    (tmp_path / "main.go").write_text("package main")
+    tool = GoTool(tmp_path)
+    before = fingerprint(tmp_path, tool)
+    (tmp_path / "main.go").write_text("package other")
+    assert fingerprint(tmp_path, tool) != before
+
+
+def test_fingerprint_changes_with_pkg_toml(tmp_path):
+    tool = GoTool(tmp_path)
+    before = fingerprint(tmp_path, tool)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "go"')
+    assert fingerprint(tmp_path, tool) != before
+
+
+def test_fingerprint_ignores_outputs(tmp_path):
+    tool = GoTool(tmp_path)
+    before = fingerprint(tmp_path, tool)
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "app").write_text("binary")
+    assert fingerprint(tmp_path, tool) == before
+
+
+def test_fingerprint_depends_on_toolchain(tmp_path, mocker):
+    tool = GoTool(tmp_path)
+    mocker.patch("pkg.cache.toolchain_id", return_value="go:1")
+    before = fingerprint(tmp_path, tool)
+    mocker.patch("pkg.cache.toolchain_id", return_value="go:2")
+    assert fingerprint(tmp_path, tool) != before
+
+
+def test_restore_miss(tmp_path):
+    cache = BuildCache(tmp_path, GoTool(tmp_path))
+    assert cache.restore(cache.fingerprint()) is False
+
+
+def test_save_and_restore_outputs(tmp_path):
+    (tmp_path / "main.go").write_text("package main")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "app").write_text("binary")
+    cache = BuildCache(tmp_path, GoTool(tmp_path))
+    key = cache.fingerprint()
+    cache.save(key)
+
+    (tmp_path / "build" / "app").write_text("stale")
+    (tmp_path / "build" / "extra").write_text("stale")
+    assert cache.restore(key) is True
+    assert (tmp_path / "build" / "app").read_text() == "binary"
+    assert not (tmp_path / "build" / "extra").exists()
+
+
+def test_restore_recreates_deleted_outputs(tmp_path):
+    (tmp_path / "dist").mkdir()
+    (tmp_path / "dist" / "pkg.whl").write_text("wheel")
+    cache = BuildCache(tmp_path, UvTool(tmp_path))
+    key = cache.fingerprint()
+    cache.save(key)
+
+    (tmp_path / "dist" / "pkg.whl").unlink()
+    (tmp_path / "dist").rmdir()
+    assert cache.restore(key) is True
+    assert (tmp_path / "dist" / "pkg.whl").read_text() == "wheel"
+
+
+def test_restore_fails_when_store_damaged(tmp_path):
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "app").write_text("binary")
+    cache = BuildCache(tmp_path, GoTool(tmp_path))
+    key = cache.fingerprint()
+    cache.save(key)
+    import shutil
+    shutil.rmtree(cache.store_dir / key / "0")
+    assert cache.restore(key) is False
+
+
+def test_save_prunes_old_entries(tmp_path, mocker):
+    mocker.patch("pkg.cache.MAX_BUILD_ENTRIES", 2)
+    cache = BuildCache(tmp_path, GoTool(tmp_path))
+    for key in ["a", "b", "c"]:
+        cache.save(key)
+    remaining = sorted(d.name for d in cache.store_dir.iterdir())
+    assert len(remaining) == 2
+
+
+def test_wrap_runs_action_once_for_unchanged_tree(tmp_path):
+    (tmp_path / "main.go").write_text("package main")
+    cache = BuildCache(tmp_path, GoTool(tmp_path))
+    calls = []
+
+    def action():
+        calls.append(1)
+        return 0
+
+    assert cache.wrap(action)() == 0
+    assert cache.wrap(action)() == 0
+    assert len(calls) == 1
+
+
+def test_wrap_does_not_record_failed_build(tmp_path):
+    cache = BuildCache(tmp_path, GoTool(tmp_path))
+    calls = []
+
+    def action():
+        calls.append(1)
+        return 1
+
+    assert cache.wrap(action)() == 1
+    assert cache.wrap(action)() == 1
+    assert len(calls) == 2
+
+
+def test_wrap_rebuilds_after_change(tmp_path):
+    (tmp_path / "main.go").write_text("package main")
+    cache = BuildCache(tmp_path, GoTool(tmp_path))
+    calls = []
+
+    def action():
+        calls.append(1)
+        return 0
+
+    cache.wrap(action)()
+    (tmp_path / "main.go").write_text("package main // changed")
+    cache.wrap(action)()
+    assert len(calls) == 2
+
+
+def bun_project(tmp_path):
+    (tmp_path / "package.json").write_text('{"name": "app"}')
+    (tmp_path / "bun.lockb").write_bytes(b"lock")
+    return BunTool(tmp_path)
+
+
+def test_install_cache_skips_unchanged(tmp_path, capsys):
+    tool = bun_project(tmp_path)
+    calls = []
+
+    def install():
+        calls.append(1)
+        (tmp_path / "node_modules").mkdir(exist_ok=True)
+        return 0
+
+    cached = InstallCache(tmp_path, tool).wrap(install)
+    assert cached() == 0
+    assert cached() == 0
+    assert len(calls) == 1
+    assert "skipping install" in capsys.readouterr().out
+
+    (tmp_path / "bun.lockb").write_bytes(b"changed")
+    assert cached() == 0
+    assert len(calls) == 2
+
+
+def test_install_cache_reinstalls_missing_environment(tmp_path):
+    tool = bun_project(tmp_path)
+    calls = []
+
+    def install():
+        calls.append(1)
+        (tmp_path / "node_modules").mkdir(exist_ok=True)
+        return 0
+
+    cached = InstallCache(tmp_path, tool).wrap(install)
+    cached()
+    (tmp_path / "node_modules").rmdir()
+    cached()
+    assert len(calls) == 2
+
+
+def test_install_cache_force_and_failures(tmp_path):
+    tool = bun_project(tmp_path)
+    (tmp_path / "node_modules").mkdir()
+    cache = InstallCache(tmp_path, tool)
+
+    assert cache.wrap(lambda: 1)() == 1
+    assert not cache.path.exists()
+
+    cache.wrap(lambda: 0)()
+    calls = []
+    cache.wrap(lambda: calls.append(1) or 0, force=True)()
+    assert calls == [1]
+
+
+def test_install_cache_records_after_install(tmp_path):
+    tool = bun_project(tmp_path)
+    (tmp_path / "bun.lockb").unlink()
+
+    def install():
+        (tmp_path / "bun.lockb").write_bytes(b"written by install")
+        (tmp_path / "node_modules").mkdir()
+        return 0
+
+    cache = InstallCache(tmp_path, tool)
+    cache.wrap(install)()
+    assert cache.is_current(cache.fingerprint())
+
+
+def test_install_cache_without_inputs_always_runs(tmp_path):
+    action = lambda: 0  # noqa: E731
+    assert InstallCache(tmp_path, BashTool(tmp_path)).wrap(action) is action
+
+
+def test_session_id(monkeypatch):
+    assert session_id() is None
+    monkeypatch.setenv("GITHUB_RUN_ID", "42")
+    assert session_id() == "42"
+    monkeypatch.setenv("PKG_SESSION", "local")
+    assert session_id() == "local"
+
+
+def test_session_test_cache_reuses_passing_run(tmp_path, capsys):
+    (tmp_path / "run.sh").write_text("echo hi\n")
+    tool = BashTool(tmp_path)
+    calls = []
+
+    def test():
+        calls.append(1)
+        return 0
+
+    cached = SessionTestCache(tmp_path, tool, "s1").wrap(test)
+    assert cached() == 0
+    assert cached() == 0
+    assert len(calls) == 1
+    assert "already passed" in capsys.readouterr().out
+
+    # Another profile, another session, changed sources or --no-reuse run again
+    tool.options.coverage = False
+    assert cached() == 0
+    assert len(calls) == 2
+    assert SessionTestCache(tmp_path, tool, "s2").wrap(test)() == 0
+    assert len(calls) == 3
+    (tmp_path / "run.sh").write_text("echo changed\n")
+    assert SessionTestCache(tmp_path, tool, "s2").wrap(test)() == 0
+    assert len(calls) == 4
+    assert SessionTestCache(tmp_path, tool, "s2").wrap(test, reuse=False)() == 0
+    assert len(calls) == 5
+
+
+def test_session_test_cache_never_reuses_failures(tmp_path):
+    tool = BashTool(tmp_path)
+    calls = []
+    cache = SessionTestCache(tmp_path, tool, "s1")
+    failing = cache.wrap(lambda: calls.append(1) or 1)
+    assert failing() == 1
+    assert failing() == 1
+    assert len(calls) == 2
+    assert not cache.path.exists()
+
+
+def test_session_test_cache_new_session_forgets_results(tmp_path):
+    tool = BashTool(tmp_path)
+    first = SessionTestCache(tmp_path, tool, "s1")
+    first.wrap(lambda: 0)()
+    assert first.is_current(first.fingerprint())
+    second = SessionTestCache(tmp_path, tool, "s2")
+    second.wrap(lambda: 0)()
+    assert not first.is_current(first.fingerprint())
+    assert json.loads(second.path.read_text())["session"] == "s2"
+
+
+def bun_install(tmp_path, calls):
+    def install():
+        calls.append(1)
+        modules = tmp_path / "node_modules" / "dep"
+        modules.mkdir(parents=True, exist_ok=True)
+        (modules / "index.js").write_text("module.exports = 1\n" * 100)
+        (tmp_path / "node_modules" / ".bin").mkdir(exist_ok=True)
+        return 0
+    return install
+
+
+def test_clone_tree_links_or_copies(tmp_path):
+    src = tmp_path / "src"
+    (src / "pkg").mkdir(parents=True)
+    (src / "pkg" / "a.py").write_text("a")
+    (src / "link").symlink_to("pkg/a.py")
+    clone_tree(src, tmp_path / "dest")
+    assert (tmp_path / "dest" / "pkg" / "a.py").read_text() == "a"
+    assert (tmp_path / "dest" / "link").is_symlink()
+
+
+def test_clone_tree_falls_back_to_copy(tmp_path, mocker):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a").write_text("a")
+    mocker.patch("fcntl.ioctl", side_effect=OSError(95, "not supported"))
+    clone_tree(src, tmp_path / "dest")
+    assert (tmp_path / "dest" / "a").read_text() == "a"
+    assert (tmp_path / "dest" / "a").stat().st_ino != (src / "a").stat().st_ino
+
+
+def test_environment_store_snapshot_survives_in_place_writes(tmp_path, mocker):
+    mocker.patch("fcntl.ioctl", side_effect=OSError(95, "not supported"))
+    project = tmp_path / "project"
+    project.mkdir()
+    tool = bun_project(project)
+    store = EnvironmentStore(tmp_path / "envs")
+    install = store.wrap(project, tool, bun_install(project, []))
+    install()
+
+    # e.g. a tool patching an installed file without replacing it
+    with open(project / "node_modules" / "dep" / "index.js", "a") as f:
+        f.write("patched\n")
+    [entry] = store.entries()
+    stored = tmp_path / "envs" / entry["key"] / "tree" / "dep" / "index.js"
+    assert "patched" not in stored.read_text()
+
+
+def test_environment_store_forced_install_replaces_snapshot(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    tool = bun_project(project)
+    store = EnvironmentStore(tmp_path / "envs")
+    store.wrap(project, tool, bun_install(project, []))()
+    [entry] = store.entries()
+    stored = tmp_path / "envs" / entry["key"] / "tree" / "dep" / "index.js"
+    stored.write_text("broken\n")
+
+    def reinstall():
+        (project / "node_modules" / "dep" / "index.js").write_text("fixed\n")
+        return 0
+
+    store.wrap(project, tool, reinstall)()
+    assert stored.read_text() == "broken\n"
+    store.wrap(project, tool, reinstall, force=True)()
+    assert stored.read_text() == "fixed\n"
+    assert [p.name for p in (tmp_path / "envs").iterdir() if p.name.startswith(".")] == []
+
+
+def test_environment_store_counts_concurrently(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    stores = [EnvironmentStore(tmp_path / "envs") for _ in range(8)]
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda store: [store._count("hits") for _ in range(10)], stores))
+    assert stores[0].stats() == {"hits": 80}
+
+
+def test_environment_store_restores_after_clean(tmp_path, capsys):
+    project = tmp_path / "project"
+    project.mkdir()
+    tool = bun_project(project)
+    store = EnvironmentStore(tmp_path / "envs")
+    calls = []
+    install = store.wrap(project, tool, bun_install(project, calls))
+
+    assert install() == 0
+    assert store.stats() == {"misses": 1}
+    [entry] = store.entries()
+    assert entry["tool"] == "bun"
+    assert entry["size"] > 0
+
+    tool.clean()
+    assert install() == 0
+    assert calls == [1]
+    assert (project / "node_modules" / "dep" / "index.js").exists()
+    assert "Restored node_modules" in capsys.readouterr().out
+    assert store.stats() == {"misses": 1, "hits": 1}
+
+    (project / "bun.lockb").write_bytes(b"new lock")
+    install()
+    assert calls == [1, 1]
+    assert len(store.entries()) == 2
+
+
+def test_environment_store_force_and_failures(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    tool = bun_project(project)
+    store = EnvironmentStore(tmp_path / "envs")
+
+    assert store.wrap(project, tool, lambda: 1)() == 1
+    assert store.entries() == []
+
+    calls = []
+    store.wrap(project, tool, bun_install(project, calls))()
+    store.wrap(project, tool, bun_install(project, calls), force=True)()
+    assert calls == [1, 1]
+
+
+def test_environment_store_discards_broken_snapshot(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "pyproject.toml").write_text("[project]\nname = 'app'\n")
+    tool = UvTool(project)
+    store = EnvironmentStore(tmp_path / "envs")
+    key = store.key(project, tool)
+
+    venv = project / ".venv"
+    (venv / "bin").mkdir(parents=True)
+    (venv / "pyvenv.cfg").write_text("home = /nowhere\n")
+    (venv / "bin" / "python").symlink_to(tmp_path / "gone-python")
+    store.save(key, tool)
+
+    assert not store.restore(key, tool)
+    assert not venv.exists()
+    assert store.entries() == []
+
+
+def test_environment_store_key(tmp_path):
+    store = EnvironmentStore(tmp_path / "envs")
+    a, b = tmp_path / "a", tmp_path / "b"
+    for project in (a, b):
+        project.mkdir()
+        (project / "package.json").write_text("{}")
+        (project / "pyproject.toml").write_text("[project]\n")
+
+    # node_modules can move between checkouts, a venv cannot
+    assert store.key(a, BunTool(a)) == store.key(b, BunTool(b))
+    assert store.key(a, UvTool(a)) != store.key(b, UvTool(b))
+
+
+def test_environment_store_evicts_least_recently_used(tmp_path):
+    store = EnvironmentStore(tmp_path / "envs")
+    for i, key in enumerate(["old", "mid", "new"]):
+        entry = store.root / key
+        entry.mkdir(parents=True)
+        (entry / "meta.json").write_text(json.dumps({"tool": "bun", "env": "x", "size": 100}))
+        os.utime(entry / "meta.json", (1000 + i, 1000 + i))
+
+    assert store.evict(250) == ["old"]
+    assert store.evict(50, keep="new") == ["mid"]
+    assert [e["key"] for e in store.entries()] == ["new"]
+    assert store.stats() == {"evictions": 2}
+
+    store.clear()
+    assert store.entries() == []
+
+
+def test_environment_store_not_used_without_environment(tmp_path):
+    action = lambda: 0  # noqa: E731
+    assert EnvironmentStore(tmp_path).wrap(tmp_path, GoTool(tmp_path), action) is action
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from click.testing import CliRunner
 from pkg.cli import main, PkgContext, run_with_hooks
@@ -61,6 +63,7 @@ pre = ["false"]
 def test_build_command(runner, tmp_path, mocker):
     mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
     mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    mocker.patch("pkg.pipeline.run_process", return_value=0)
     (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"')
     result = runner.invoke(main, ["build"])
     assert result.exit_code == 0
@@ -82,6 +85,23 @@ def test_install_command(runner, tmp_path, mocker):
     assert result.exit_code == 0
 
 
+def test_install_command_force(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    run = mocker.patch("pkg.tools.bun.run_command", return_value=0)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bun"')
+    (tmp_path / "package.json").write_text("{}")
+    (tmp_path / "node_modules").mkdir()
+
+    runner.invoke(main, ["install"])
+    result = runner.invoke(main, ["install"])
+    assert "skipping install" in result.output
+    assert run.call_count == 1
+
+    result = runner.invoke(main, ["install", "--force"])
+    assert result.exit_code == 0
+    assert run.call_count == 2
+
+
 def test_clean_command(runner, tmp_path, mocker):
     mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
     (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"')
@@ -153,3 +173,394 @@ def test_init_tool_failure_exits(runner, tmp_path, mocker, monkeypatch):
     mocker.patch("pkg.tools.uv.run_command", return_value=1)
     result = runner.invoke(main, ["init", "fail-project", "--tool", "uv"])
     assert result.exit_code != 0
+
+
+def test_build_command_uses_cache(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    mocker.patch("pkg.pipeline.run_process", return_value=0)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"')
+    assert runner.invoke(main, ["build"]).exit_code == 0
+    calls = mock_run.call_count
+    result = runner.invoke(main, ["build"])
+    assert result.exit_code == 0
+    assert "up to date" in result.output
+    assert mock_run.call_count == calls
+
+
+def test_build_command_no_cache(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    mocker.patch("pkg.pipeline.run_process", return_value=0)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"')
+    runner.invoke(main, ["build"])
+    calls = mock_run.call_count
+    result = runner.invoke(main, ["build", "--no-cache"])
+    assert result.exit_code == 0
+    assert mock_run.call_count == calls * 2
+
+
+def test_pkg_context_passes_jobs_to_tool(tmp_path, monkeypatch):
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"\njobs = 4')
+    monkeypatch.chdir(tmp_path)
+    ctx = PkgContext()
+    assert ctx.tool.options.jobs == 4
+
+
+def test_test_command_jobs_and_fail_fast(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"')
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "a_test.sh").write_text("exit 1\n")
+    (tmp_path / "tests" / "b_test.sh").write_text("exit 0\n")
+    result = runner.invoke(main, ["test", "--jobs", "1", "--fail-fast"])
+    assert result.exit_code == 1
+    assert "1 skipped" in result.output
+
+
+def test_test_command_timeout_and_prefixed_output(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"')
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "slow_test.sh").write_text("echo started\nsleep 5\n")
+    (tmp_path / "tests" / "ok_test.sh").write_text("echo fine\n")
+    result = runner.invoke(main, ["test", "-j", "2", "--timeout", "0.3", "--output", "prefixed"])
+    assert result.exit_code == 1
+    assert "slow_test.sh | started" in result.output
+    assert "ok_test.sh   | fine" in result.output
+    assert "slow_test.sh (exit 124)" in result.output
+    assert "1 failed: slow_test.sh" in result.output
+
+
+# Modules `pkg --version` must not import; startup time itself is tracked by benchmarks/run.py
+DEFERRED_MODULES = (
+    "rich", "sqlite3", "importlib.metadata", "tomllib",
+    "pkg.tools.uv", "pkg.tools.bun", "pkg.tools.go", "pkg.tools.bash",
+    "pkg.plugins", "pkg.init_hooks", "pkg.hooks", "pkg.runner", "pkg.timings", "pkg.cache",
+)
+
+STARTUP_PROBE = """
+import sys
+from pkg.cli import main
+try:
+    main(["--version"])
+except SystemExit:
+    pass
+print(",".join(m for m in sys.argv[1:] if m in sys.modules), file=sys.stderr)
+"""
+
+
+def test_version_imports_no_heavy_modules():
+    import subprocess
+    import sys
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE, *DEFERRED_MODULES], capture_output=True, text=True, check=True
+    )
+    assert result.stderr.strip() == ""
+
+
+def test_command_records_timings_without_sqlite(tmp_path, isolated_cache):
+    import subprocess
+    import sys
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"\n')
+    probe = STARTUP_PROBE.replace('["--version"]', '["clean"]')
+    result = subprocess.run(
+        [sys.executable, "-c", probe, "sqlite3"], cwd=tmp_path, capture_output=True, text=True, check=True
+    )
+    assert result.stderr.strip() == ""
+    assert list(isolated_cache.rglob("timings.pending.jsonl"))
+
+
+def test_invalid_config_reports_error(runner, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pkg.toml").write_text('[hooks.build]\npre = [{ name = "lint" }]\n')
+    result = runner.invoke(main, ["build"])
+    assert result.exit_code == 1
+    assert "Invalid pkg.toml: [hooks.build] pre: hook 'lint' has no cmd" in result.output
+    assert "Traceback" not in result.output
+
+
+def test_pkg_context_is_lazy(tmp_path, monkeypatch, mocker):
+    monkeypatch.chdir(tmp_path)
+    mock_root = mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    ctx = PkgContext()
+    mock_root.assert_not_called()
+    assert ctx.project_dir == tmp_path
+    assert ctx.project_dir == tmp_path
+    mock_root.assert_called_once()
+
+
+def test_help_does_not_load_project(runner, mocker):
+    mock_root = mocker.patch("pkg.cli.find_project_root")
+    result = runner.invoke(main, ["--help"])
+    assert result.exit_code == 0
+    mock_root.assert_not_called()
+
+
+def test_plugins_command(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    mocker.patch("pkg.plugins.scan_entry_points", return_value={"a": "x:A", "b": "y:B"})
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"\n[plugins]\nenabled = ["a"]')
+    result = runner.invoke(main, ["plugins", "--rebuild-index"])
+    assert result.exit_code == 0
+    assert "Rebuilt plugin index" in result.output
+    assert "a (x:A) enabled" in result.output
+    assert "b (y:B) disabled" in result.output
+
+
+def test_plugins_command_none_installed(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    mocker.patch("pkg.plugins.scan_entry_points", return_value={})
+    result = runner.invoke(main, ["plugins"])
+    assert result.exit_code == 0
+    assert "No plugins installed" in result.output
+
+
+def test_config_command_explain(runner, tmp_path, monkeypatch):
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "go"\n[hooks.build]\npre = ["lint"]')
+    monkeypatch.chdir(tmp_path)
+    first = runner.invoke(main, ["config", "--explain"])
+    assert first.exit_code == 0
+    assert "Config: fresh (no cache entry)" in first.output
+    assert "tool = go" in first.output
+    assert "hooks.build: pre=['lint']" in first.output
+
+    second = runner.invoke(main, ["config", "--explain"])
+    assert "Config: cached (cache hit)" in second.output
+
+
+def test_env_store_command(runner, isolated_cache):
+    entry = isolated_cache / "envs" / "abc123"
+    entry.mkdir(parents=True)
+    (entry / "meta.json").write_text('{"tool": "bun", "env": "/p/node_modules", "size": 2097152}')
+    (isolated_cache / "envs" / "stats.json").write_text('{"hits": 3, "misses": 1}')
+
+    result = runner.invoke(main, ["env-store"])
+    assert result.exit_code == 0
+    assert "1 environments, 2.0 MiB" in result.output
+    assert "abc123 bun /p/node_modules" in result.output
+    assert "hit rate 75%" in result.output
+
+    result = runner.invoke(main, ["env-store", "--clear"])
+    assert result.exit_code == 0
+    assert not entry.exists()
+    assert "hit rate n/a" in runner.invoke(main, ["env-store"]).output
+
+
+def test_clean_command_fast(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    purge = mocker.patch("pkg.tools.base.purge_trash")
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"')
+    (tmp_path / "dist").mkdir()
+    result = runner.invoke(main, ["clean", "--fast"])
+    assert result.exit_code == 0
+    assert not (tmp_path / "dist").exists()
+    purge.assert_called_once_with(tmp_path)
+
+
+def test_stats_command(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"')
+    result = runner.invoke(main, ["stats"])
+    assert "No timings recorded yet" in result.output
+
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "a_test.sh").write_text("exit 0\n")
+    (tmp_path / "tests" / "[b]_test.sh").write_text("exit 1\n")
+    for _ in range(7):
+        runner.invoke(main, ["test"])
+
+    result = runner.invoke(main, ["stats"])
+    assert result.exit_code == 0
+    assert "Slowest of" in result.output
+    kinds = {line.split()[0] for line in result.output.splitlines() if line.strip()}
+    assert {"command", "test"} <= kinds
+    assert "process" not in kinds
+    assert "[b]_test.sh (7 failed)" in result.output
+    assert "%" in result.output
+
+    export = tmp_path / "durations.json"
+    result = runner.invoke(main, ["stats", "--export", str(export)])
+    assert result.exit_code == 0
+    assert set(json.loads(export.read_text())) == {"a_test.sh", "[b]_test.sh"}
+
+    result = runner.invoke(main, ["stats", "--kind", "test", "--limit", "1"])
+    kinds = {line.split()[0] for line in result.output.splitlines() if line.strip()}
+    assert "test" in kinds and "command" not in kinds
+    assert result.output.count("_test.sh") == 1
+
+    result = runner.invoke(main, ["stats", "--kind", "hook"])
+    assert "No timings recorded yet" in result.output
+
+    result = runner.invoke(main, ["stats", "--clear"])
+    assert "Cleared" in result.output
+
+
+def test_test_command_shard(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"')
+    run_shard = mocker.patch("pkg.sharding.run_shard", return_value=0)
+    result = runner.invoke(main, ["test", "--shard", "2/3", "--split-by", "count"])
+    assert result.exit_code == 0
+    assert run_shard.call_args.args[1:] == (2, 3, "count", None)
+
+    # Every machine must split alike, so --shard never uses local timings
+    result = runner.invoke(main, ["test", "--shard", "2/3"])
+    assert run_shard.call_args.args[1:] == (2, 3, "size", None)
+    result = runner.invoke(main, ["test", "--shard", "2/3", "--split-by", "duration"])
+    assert result.exit_code == 2
+    assert "--durations" in result.output
+    durations = tmp_path / "durations.json"
+    durations.write_text('{"a_test.sh": 1.5}')
+    result = runner.invoke(main, ["test", "--shard", "2/3", "--durations", str(durations)])
+    assert result.exit_code == 0
+    assert run_shard.call_args.args[1:] == (2, 3, "duration", {"a_test.sh": 1.5})
+    durations.write_text("[]")
+    result = runner.invoke(main, ["test", "--shard", "2/3", "--durations", str(durations)])
+    assert result.exit_code == 2
+    result = runner.invoke(main, ["test", "--durations", str(durations)])
+    assert result.exit_code == 2
+
+    run_local = mocker.patch("pkg.sharding.run_local_shards", return_value=1)
+    result = runner.invoke(main, ["test", "--shards", "4"])
+    assert result.exit_code == 1
+    assert run_local.call_args.args[1:] == (4, "duration")
+
+    result = runner.invoke(main, ["test", "--shard", "4/3"])
+    assert result.exit_code == 2
+    assert "out of range" in result.output
+
+    result = runner.invoke(main, ["test", "--shard", "1/2", "--shards", "2"])
+    assert result.exit_code == 2
+    assert "cannot be used together" in result.output
+
+
+def test_test_command_units_from(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"\n[hooks.test]\npre = ["exit 1"]\n')
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "a_test.sh").write_text("exit 0\n")
+    (tmp_path / "units.txt").write_text("a_test.sh\n")
+    result = runner.invoke(main, ["test", "--units-from", str(tmp_path / "units.txt")])
+    assert result.exit_code == 0
+    assert "1 passed" in result.output
+
+
+def test_test_command_ff(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"')
+    (tmp_path / "tests").mkdir()
+    for name in ["a", "b", "c"]:
+        (tmp_path / "tests" / f"{name}_test.sh").write_text("exit 0\n" if name != "b" else "exit 1\n")
+
+    result = runner.invoke(main, ["test", "--ff"])
+    assert result.exit_code == 1
+    assert "1 passed" in result.output
+    assert "1 skipped" in result.output
+
+    # The failure from the last run now goes first
+    result = runner.invoke(main, ["test", "--ff"])
+    assert "previously failed" in result.output
+    assert "1 skipped" not in result.output and "2 skipped" in result.output
+
+
+def test_test_command_profiles(runner, tmp_path, mocker):
+    from pkg.tools.bash import BashTool
+
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"\ntest_profile = "fast"\n')
+    seen = []
+    mocker.patch.object(BashTool, "test", lambda self: seen.append(self.options) or 0)
+
+    assert runner.invoke(main, ["test"]).exit_code == 0
+    assert (seen[-1].profile, seen[-1].coverage, seen[-1].parallel, seen[-1].jobs) == ("fast", False, True, 0)
+
+    assert runner.invoke(main, ["test", "--profile", "fast", "-j", "3"]).exit_code == 0
+    assert seen[-1].jobs == 3
+
+    assert runner.invoke(main, ["test", "--profile", "full"]).exit_code == 0
+    assert (seen[-1].coverage, seen[-1].parallel, seen[-1].jobs) == (True, False, 1)
+
+    result = runner.invoke(main, ["test", "--profile", "nope"])
+    assert result.exit_code == 2
+    assert "Unknown test profile" in result.output
+
+
+def test_build_then_test_reuses_passing_tests_in_session(runner, tmp_path, mocker, monkeypatch):
+    monkeypatch.setenv("PKG_SESSION", "ci-1")
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    mocker.patch("pkg.pipeline.run_process", return_value=0)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"')
+    assert runner.invoke(main, ["build"]).exit_code == 0
+    assert mock_run.call_count == 1
+
+    result = runner.invoke(main, ["test"])
+    assert result.exit_code == 0
+    assert "already passed" in result.output
+    assert mock_run.call_count == 1
+
+    assert runner.invoke(main, ["test", "--no-reuse"]).exit_code == 0
+    assert mock_run.call_count == 2
+
+
+def test_test_without_session_always_runs(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"')
+    assert runner.invoke(main, ["test"]).exit_code == 0
+    assert runner.invoke(main, ["test"]).exit_code == 0
+    assert mock_run.call_count == 2
+
+
+def test_hooks_share_the_session(runner, tmp_path, mocker):
+    import json
+
+    from pkg.cache import project_cache_dir
+
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    mocker.patch("pkg.pipeline.run_process", return_value=0)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"\n[hooks.build]\npost = ["echo $PKG_SESSION > session"]')
+    assert runner.invoke(main, ["build"]).exit_code == 0
+    session = (tmp_path / "session").read_text().strip()
+    assert session.startswith("pkg-")
+    recorded = json.loads((project_cache_dir(tmp_path) / "test-session.json").read_text())
+    assert recorded["session"] == session
+
+
+def test_hooks_command_status(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text("""
+[pkg]
+tool = "bash"
+
+[hooks.build]
+pre = [
+    "echo hi",
+    { name = "codegen", cmd = "mkdir -p gen && touch gen/a.py", inputs = ["schema.json"], outputs = ["gen/*.py"] },
+]
+""")
+    (tmp_path / "schema.json").write_text("{}")
+    result = runner.invoke(main, ["hooks"])
+    assert result.exit_code == 0
+    assert "build pre: echo hi" in result.output
+    assert "build pre: codegen  mkdir -p gen" in result.output
+
+    result = runner.invoke(main, ["hooks", "--status"])
+    assert "echo hi  always runs" in result.output
+    assert "codegen  stale (never succeeded)" in result.output
+
+    from pkg.config import Config
+    from pkg.hooks import run_pre_hooks
+
+    run_pre_hooks(Config.load(tmp_path).get_hooks("build"), "build", tmp_path)
+    result = runner.invoke(main, ["hooks", "--status"])
+    assert "codegen  up to date" in result.output
+
+
+def test_hooks_command_without_hooks(runner, tmp_path, mocker):
+    mocker.patch("pkg.cli.find_project_root", return_value=tmp_path)
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"')
+    result = runner.invoke(main, ["hooks"])
+    assert "No hooks configured" in result.output
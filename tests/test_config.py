@@ -1,6 +1,16 @@
 import pytest
 from pathlib import Path
-from pkg.config import Config, HookConfig, find_project_root
+from pkg.config import (
+    Config,
+    ConfigCache,
+    ConfigError,
+    Hook,
+    HookConfig,
+    Profile,
+    WorkspaceConfig,
+    consulted_dirs,
+    find_project_root,
+)
 
 
 def test_hook_config_defaults():
@@ -66,3 +76,235 @@ def test_find_project_root_fallback(tmp_path):
     subdir = tmp_path / "empty"
     subdir.mkdir()
     assert find_project_root(subdir) == subdir
+
+
+def test_config_load_jobs(tmp_path):
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"\njobs = 8\n')
+    assert Config.load(tmp_path).jobs == 8
+
+
+def test_config_jobs_default(tmp_path):
+    assert Config.load(tmp_path).jobs == 1
+
+
+def test_consulted_dirs_stops_at_root(tmp_path):
+    (tmp_path / "pkg.toml").touch()
+    subdir = tmp_path / "a" / "b"
+    subdir.mkdir(parents=True)
+    assert consulted_dirs(subdir, tmp_path) == [subdir, tmp_path / "a", tmp_path]
+
+
+def test_consulted_dirs_root_not_ancestor(tmp_path):
+    assert consulted_dirs(tmp_path / "a", tmp_path / "b") is None
+
+
+def test_consulted_dirs_fallback_walks_to_filesystem_root(tmp_path):
+    dirs = consulted_dirs(tmp_path, tmp_path)
+    assert dirs[0] == tmp_path
+    assert dirs[-1].parent == dirs[-1].parent.parent
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "project"
+    subdir = root / "src" / "deep"
+    subdir.mkdir(parents=True)
+    (root / "pkg.toml").write_text('[pkg]\ntool = "go"\n')
+    return root, subdir
+
+
+def test_config_cache_miss_then_hit(tmp_path, project):
+    root, subdir = project
+    cache = ConfigCache(tmp_path / "cache.json")
+    first = cache.resolve(subdir)
+    assert first.cached is False
+    assert first.reason == "no cache entry"
+    assert first.project_dir == root
+    assert first.config.tool == "go"
+
+    second = cache.resolve(subdir)
+    assert second.cached is True
+    assert second.project_dir == root
+    assert second.config.tool == "go"
+
+
+def test_config_cache_hit_skips_root_search(tmp_path, project, mocker):
+    root, subdir = project
+    cache = ConfigCache(tmp_path / "cache.json")
+    cache.resolve(subdir)
+    find_root = mocker.Mock()
+    cache.resolve(subdir, find_root)
+    find_root.assert_not_called()
+
+
+def test_config_cache_invalidated_by_edit(tmp_path, project):
+    root, subdir = project
+    cache = ConfigCache(tmp_path / "cache.json")
+    cache.resolve(subdir)
+    (root / "pkg.toml").write_text('[pkg]\ntool = "bash"\njobs = 3\n')
+    resolved = cache.resolve(subdir)
+    assert resolved.cached is False
+    assert resolved.reason == f"{root / 'pkg.toml'} changed"
+    assert resolved.config.tool == "bash"
+
+
+def test_config_cache_invalidated_by_nearer_root(tmp_path, project):
+    root, subdir = project
+    cache = ConfigCache(tmp_path / "cache.json")
+    cache.resolve(subdir)
+    (root / "src" / "pkg.toml").write_text('[pkg]\ntool = "bun"\n')
+    resolved = cache.resolve(subdir)
+    assert resolved.cached is False
+    assert resolved.project_dir == root / "src"
+    assert resolved.config.tool == "bun"
+
+
+def test_config_cache_survives_artifacts_in_root(tmp_path, project):
+    root, subdir = project
+    cache = ConfigCache(tmp_path / "cache.json")
+    cache.resolve(root)
+    (root / "dist").mkdir()
+    assert cache.resolve(root).cached is True
+
+
+def test_config_cache_root_outside_cwd_not_cached(tmp_path, project):
+    root, _ = project
+    cache = ConfigCache(tmp_path / "cache.json")
+    resolved = cache.resolve(tmp_path / "elsewhere", lambda cwd: root)
+    assert resolved.reason == "root outside cwd"
+    assert resolved.config.tool == "go"
+    assert cache.resolve(tmp_path / "elsewhere", lambda cwd: root).cached is False
+
+
+def test_config_cache_without_pkg_toml(tmp_path):
+    (tmp_path / "pyproject.toml").touch()
+    cache = ConfigCache(tmp_path / "cache" / "cache.json")
+    resolved = cache.resolve(tmp_path)
+    assert resolved.config == Config()
+    assert cache.resolve(tmp_path).cached is True
+
+
+def test_config_cache_evicts_oldest(tmp_path, project, mocker):
+    mocker.patch("pkg.config.MAX_CONFIG_CACHE_ENTRIES", 1)
+    root, subdir = project
+    cache = ConfigCache(tmp_path / "cache.json")
+    cache.resolve(subdir)
+    cache.resolve(root)
+    assert cache.resolve(root).cached is True
+    assert cache.resolve(subdir).cached is False
+
+
+def test_config_cache_ignores_corrupt_file(tmp_path, project):
+    root, _ = project
+    (tmp_path / "cache.json").write_text("not json")
+    assert ConfigCache(tmp_path / "cache.json").resolve(root).config.tool == "go"
+
+
+def test_config_cache_default_path(isolated_cache):
+    assert ConfigCache().path == isolated_cache / "config-cache.json"
+
+
+def test_config_load_hook_tables(tmp_path):
+    (tmp_path / "pkg.toml").write_text("""
+[pkg]
+hook_jobs = 4
+
+[hooks.build]
+pre = [
+    "echo start",
+    { name = "lint", cmd = "ruff check", parallel = true },
+    { name = "types", cmd = "mypy .", parallel = true, needs = ["lint"], timeout = 60 },
+]
+""")
+    cfg = Config.load(tmp_path)
+    assert cfg.hook_jobs == 4
+    pre = cfg.get_hooks("build").pre
+    assert pre[0] == "echo start"
+    assert pre[1] == Hook(cmd="ruff check", name="lint", parallel=True)
+    assert pre[2] == Hook(cmd="mypy .", name="types", needs=["lint"], parallel=True, timeout=60)
+
+
+def test_config_load_argv_and_python_hooks(tmp_path):
+    (tmp_path / "pkg.toml").write_text("""
+[hooks.build]
+pre = [
+    ["ruff", "check", "."],
+    "py:tools.checks:lint",
+    { name = "fmt", cmd = ["ruff", "format", "--check"] },
+]
+""")
+    pre = Config.load(tmp_path).get_hooks("build").pre
+    assert pre[0] == ["ruff", "check", "."]
+    assert pre[1] == "py:tools.checks:lint"
+    assert pre[2] == Hook(cmd=["ruff", "format", "--check"], name="fmt")
+    assert pre[2].label == "ruff format --check"
+    assert not pre[2].is_python
+    assert Hook(cmd=pre[1]).is_python
+
+
+@pytest.mark.parametrize("table,message", [
+    ('{ name = "lint" }', "hook 'lint' has no cmd"),
+    ('{ name = "lint", cmd = 3 }', "hook 'lint': cmd must be a string"),
+    ('{ name = "lint", cmd = "ruff", needs = "types" }', "hook 'lint': needs must be a list of strings"),
+    ('{ name = "lint", cmd = "ruff", parallel = "yes" }', "hook 'lint': parallel must be true or false"),
+    ('{ name = "lint", cmd = "ruff", timeout = "1m" }', "hook 'lint': timeout must be a positive number"),
+    ('{ name = "lint", cmd = "ruff", outputs = [1] }', "hook 'lint': outputs must be a list of strings"),
+    ("42", "hook 42 must be a command string"),
+    ('""', "hook '' must be a command string"),
+    ("[]", "hook [] must be a command string"),
+    ("[1, 2]", "hook [1, 2] must be a command string"),
+])
+def test_config_load_rejects_invalid_hook_table(tmp_path, table, message):
+    (tmp_path / "pkg.toml").write_text(f"[hooks.build]\npre = [{table}]\n")
+    with pytest.raises(ConfigError, match=r"^\[hooks.build\] pre: ") as exc:
+        Config.load(tmp_path)
+    assert message in str(exc.value)
+
+
+def test_config_load_rejects_hooks_that_are_not_a_list(tmp_path):
+    (tmp_path / "pkg.toml").write_text('[hooks.build]\npre = "make"\n')
+    with pytest.raises(ConfigError, match=r"\[hooks.build\] pre: hooks must be a list"):
+        Config.load(tmp_path)
+
+
+def test_config_load_workspace(tmp_path):
+    (tmp_path / "pkg.toml").write_text("""
+[pkg]
+depends_on = ["libs/core"]
+
+[workspace]
+members = ["libs/*"]
+jobs = 2
+""")
+    cfg = Config.load(tmp_path)
+    assert cfg.depends_on == ["libs/core"]
+    assert cfg.workspace == WorkspaceConfig(members=["libs/*"], jobs=2)
+
+
+def test_config_without_workspace(tmp_path):
+    assert Config.load(tmp_path).workspace is None
+
+
+def test_config_test_profiles(tmp_path):
+    cfg = Config()
+    assert cfg.test_profile == "full"
+    assert cfg.get_profile("full") == Profile(coverage=True, parallel=False)
+    assert cfg.get_profile("fast") == Profile(coverage=False, parallel=True)
+
+    (tmp_path / "pkg.toml").write_text("""
+[pkg]
+test_profile = "fast"
+
+[profiles.fast]
+parallel = false
+
+[profiles.ci]
+coverage = true
+parallel = true
+""")
+    cfg = Config.load(tmp_path)
+    assert cfg.test_profile == "fast"
+    assert cfg.get_profile("fast") == Profile(coverage=False, parallel=False)
+    assert cfg.get_profile("ci") == Profile(coverage=True, parallel=True)
+    with pytest.raises(ValueError, match="Unknown test profile: nope"):
+        cfg.get_profile("nope")
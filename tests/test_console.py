@@ -0,0 +1,15 @@
+from rich.console import Console
+
+from pkg.console import LazyConsole
+
+
+def test_lazy_console_defers_construction():
+    console = LazyConsole()
+    assert console._console is None
+
+
+def test_lazy_console_forwards_to_rich(capsys):
+    console = LazyConsole()
+    console.print("hello")
+    assert isinstance(console._console, Console)
+    assert "hello" in capsys.readouterr().out
@@ -0,0 +1,246 @@
+import os
+import socket
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+from click.testing import CliRunner
+from pkg.cli import main
+from pkg.daemon import (
+    Daemon,
+    connect,
+    exit_code,
+    peer_uid,
+    recv_request,
+    request_control,
+    run_client,
+    same_user,
+    send_message,
+    socket_path,
+)
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "pkg.toml").write_text('[pkg]\ntool = "uv"\n')
+    return project
+
+
+@pytest.fixture
+def daemon_socket(tmp_path):
+    path = tmp_path / "d.sock"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "pkg.cli", "daemon", "--socket", str(path)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while (probe := connect(path)) is None:
+        assert time.monotonic() < deadline, "daemon did not start"
+        time.sleep(0.02)
+    probe.close()
+    yield path
+    if proc.poll() is None:
+        proc.terminate()
+    proc.wait(timeout=10)
+
+
+def test_socket_path(monkeypatch, isolated_cache):
+    monkeypatch.delenv("PKG_DAEMON_SOCKET", raising=False)
+    assert socket_path() == isolated_cache / "daemon" / "daemon.sock"
+    monkeypatch.setenv("PKG_DAEMON_SOCKET", "/tmp/custom.sock")
+    assert str(socket_path()) == "/tmp/custom.sock"
+
+
+def test_daemon_socket_is_private(daemon_socket):
+    assert stat.S_IMODE(daemon_socket.stat().st_mode) == 0o600
+
+
+def test_default_socket_directory_is_private(isolated_cache, monkeypatch):
+    monkeypatch.delenv("PKG_DAEMON_SOCKET", raising=False)
+    (isolated_cache / "daemon").mkdir(mode=0o755, parents=True)
+    Daemon()._make_directory()
+    assert stat.S_IMODE((isolated_cache / "daemon").stat().st_mode) == 0o700
+
+
+def test_peer_uid_is_own_user():
+    left, right = socket.socketpair()
+    with left, right:
+        assert peer_uid(left) in (None, os.getuid())
+        assert same_user(left)
+
+
+def test_connect_ignores_daemon_of_another_user(daemon_socket, mocker, capsys):
+    mocker.patch("pkg.daemon.peer_uid", return_value=os.getuid() + 1)
+    assert connect(daemon_socket) is None
+    assert "served by another user" in capsys.readouterr().err
+
+
+def test_serve_refuses_other_users(tmp_path, mocker, capsys):
+    daemon = Daemon(tmp_path / "d.sock")
+    mocker.patch.object(daemon, "_preload")
+    mocker.patch("pkg.daemon.signal.signal")
+    mocker.patch("pkg.daemon.peer_uid", return_value=os.getuid() + 1)
+    handle = mocker.patch.object(daemon, "handle", return_value=False)
+    conn = mocker.MagicMock()
+    mocker.patch("socket.socket.accept", side_effect=[(conn, None), KeyboardInterrupt])
+    assert daemon.serve() == 0
+    handle.assert_not_called()
+    assert f"Refused connection from uid {os.getuid() + 1}" in capsys.readouterr().out
+
+
+def test_request_passes_file_descriptors():
+    client, server = socket.socketpair()
+    read_fd, write_fd = os.pipe()
+    with client, server:
+        send_message(client, {"argv": ["build"], "padding": "x" * 200_000}, [write_fd])
+        os.close(write_fd)
+        request, fds = recv_request(server)
+
+    assert request["argv"] == ["build"]
+    assert len(fds) == 1
+    os.write(fds[0], b"hello")
+    os.close(fds[0])
+    assert os.read(read_fd, 5) == b"hello"
+    os.close(read_fd)
+
+
+def test_incomplete_request():
+    client, server = socket.socketpair()
+    with client, server:
+        client.sendall(b'{"argv": ')
+        client.shutdown(socket.SHUT_WR)
+        with pytest.raises(ValueError):
+            recv_request(server)
+
+
+def test_exit_code(capsys):
+    assert exit_code(None) == 0
+    assert exit_code(3) == 3
+    assert exit_code("boom") == 1
+    assert "boom" in capsys.readouterr().err
+
+
+def test_context_for_reuses_until_config_changes(project):
+    daemon = Daemon(project / "unused.sock")
+
+    first = daemon.context_for(project)
+    assert first.config.tool == "uv"
+    assert "plugin_manager" in vars(first)
+    assert daemon.context_for(project) is first
+
+    (project / "pkg.toml").write_text('[pkg]\ntool = "bun"\n')
+    stat = (project / "pkg.toml").stat()
+    os.utime(project / "pkg.toml", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    reloaded = daemon.context_for(project)
+    assert reloaded is not first
+    assert reloaded.tool.name == "bun"
+
+
+def test_context_for_bad_config(project, capsys):
+    (project / "pkg.toml").write_text('[pkg]\ntool = "nope"\n')
+    assert Daemon(project / "unused.sock").context_for(project) is None
+    assert "Not warming" in capsys.readouterr().out
+
+
+def test_context_for_evicts_oldest(tmp_path, mocker):
+    mocker.patch("pkg.daemon.MAX_WARM_CONTEXTS", 2)
+    daemon = Daemon(tmp_path / "unused.sock")
+    dirs = []
+    for name in "abc":
+        d = tmp_path / name
+        d.mkdir()
+        (d / "pkg.toml").write_text('[pkg]\ntool = "uv"\n')
+        daemon.context_for(d)
+        dirs.append(d)
+    assert list(daemon.contexts) == dirs[1:]
+
+
+def test_run_client_without_daemon(tmp_path):
+    assert run_client(["--version"], tmp_path / "missing.sock") is None
+    assert request_control("status", tmp_path / "missing.sock") is None
+
+
+def test_client_runs_commands_in_daemon(daemon_socket, project, monkeypatch, capfd):
+    monkeypatch.chdir(project)
+
+    assert run_client(["config"], daemon_socket) == 0
+    assert "tool = uv" in capfd.readouterr().out
+
+    (project / "pkg.toml").write_text('[pkg]\ntool = "bun"\n')
+    stat = (project / "pkg.toml").stat()
+    os.utime(project / "pkg.toml", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert run_client(["config"], daemon_socket) == 0
+    assert "tool = bun" in capfd.readouterr().out
+
+    assert run_client(["no-such-command"], daemon_socket) == 2
+    assert "No such command" in capfd.readouterr().err
+
+
+def test_client_forwards_environment(daemon_socket, project, monkeypatch, capfd):
+    (project / "pkg.toml").write_text(
+        '[pkg]\ntool = "uv"\n\n[hooks.clean]\npre = ["echo value=$PKG_TEST_VALUE"]\n'
+    )
+    monkeypatch.chdir(project)
+    monkeypatch.setenv("PKG_TEST_VALUE", "forwarded")
+    assert run_client(["clean"], daemon_socket) == 0
+    assert "value=forwarded" in capfd.readouterr().out
+
+
+def test_daemon_status_and_stop(daemon_socket, project, monkeypatch, capfd):
+    runner = CliRunner()
+    monkeypatch.chdir(project)
+    run_client(["config"], daemon_socket)
+
+    result = runner.invoke(main, ["daemon", "--status", "--socket", str(daemon_socket)])
+    assert result.exit_code == 0
+    assert "running" in result.output
+    assert str(project) in result.output
+
+    result = runner.invoke(main, ["daemon", "--stop", "--socket", str(daemon_socket)])
+    assert result.exit_code == 0
+    assert "Stopped" in result.output
+
+    deadline = time.monotonic() + 10
+    while daemon_socket.exists():
+        assert time.monotonic() < deadline, "daemon did not stop"
+        time.sleep(0.02)
+
+
+def test_daemon_refuses_second_instance(daemon_socket):
+    assert Daemon(daemon_socket).serve() == 1
+
+
+def test_daemon_command_not_running(tmp_path):
+    result = CliRunner().invoke(main, ["daemon", "--status", "--socket", str(tmp_path / "x.sock")])
+    assert result.exit_code == 1
+    assert "not running" in result.output
+
+
+def test_handle_control_messages(tmp_path):
+    daemon = Daemon(tmp_path / "unused.sock")
+    daemon.contexts[tmp_path] = object()
+
+    client, server = socket.socketpair()
+    with client, server:
+        send_message(client, {"control": "status"})
+        assert daemon.handle(server) is True
+        assert str(tmp_path) in client.recv(4096).decode()
+
+    client, server = socket.socketpair()
+    with client, server:
+        send_message(client, {"control": "stop"})
+        assert daemon.handle(server) is False
+        assert b"stopping" in client.recv(4096)
+
+
+def test_handle_rejects_request_without_stdio(tmp_path, capsys):
+    client, server = socket.socketpair()
+    with client, server:
+        send_message(client, {"argv": ["build"], "cwd": str(tmp_path), "env": {}})
+        assert Daemon(tmp_path / "unused.sock").handle(server) is True
+    assert "expected stdin, stdout and stderr" in capsys.readouterr().out
@@ -1,7 +1,9 @@
+import time
+
 import pytest
 from pathlib import Path
 from pkg.hooks import run_hooks, run_pre_hooks, run_post_hooks
-from pkg.config import HookConfig
+from pkg.config import Config, Hook, HookConfig
 
 
 def test_run_hooks_empty_returns_true(tmp_path):
@@ -34,3 +36,228 @@ def test_run_pre_hooks(tmp_path):
 def test_run_post_hooks(tmp_path):
     hc = HookConfig(pre=["false"], post=["true"])
     assert run_post_hooks(hc, "build", tmp_path) is True
+
+
+def test_run_hooks_reports_timings(tmp_path, capsys):
+    assert run_hooks(["true"], "pre", "build", tmp_path) is True
+    assert "pre hooks: true" in capsys.readouterr().out
+
+
+def test_run_hooks_stops_sequence_on_failure(tmp_path):
+    marker = tmp_path / "ran"
+    result = run_hooks(["false", f"touch {marker}"], "pre", "build", tmp_path)
+    assert result is False
+    assert not marker.exists()
+
+
+def test_run_hooks_duplicate_commands(tmp_path):
+    log = tmp_path / "log"
+    assert run_hooks([f"echo x >> {log}", f"echo x >> {log}"], "pre", "build", tmp_path)
+    assert log.read_text() == "x\nx\n"
+
+
+def test_run_hooks_parallel_group(tmp_path):
+    hooks = [
+        Hook(name="a", cmd="sleep 0.3", parallel=True),
+        Hook(name="b", cmd="sleep 0.3", parallel=True),
+        Hook(name="c", cmd="sleep 0.3", parallel=True),
+    ]
+    start = time.monotonic()
+    assert run_hooks(hooks, "pre", "build", tmp_path, jobs=3) is True
+    assert time.monotonic() - start < 0.8
+
+
+def test_run_hooks_needs_orders_execution(tmp_path):
+    log = tmp_path / "log"
+    hooks = [
+        Hook(name="second", cmd=f"echo second >> {log}", needs=["first"], parallel=True),
+        Hook(name="first", cmd=f"sleep 0.1; echo first >> {log}", parallel=True),
+    ]
+    assert run_hooks(hooks, "pre", "build", tmp_path, jobs=2) is True
+    assert log.read_text() == "first\nsecond\n"
+
+
+def test_run_hooks_sequential_entry_waits_for_parallel_group(tmp_path):
+    log = tmp_path / "log"
+    hooks = [
+        Hook(name="lint", cmd=f"sleep 0.1; echo lint >> {log}", parallel=True),
+        Hook(name="types", cmd=f"echo types >> {log}", parallel=True),
+        f"echo done >> {log}",
+    ]
+    assert run_hooks(hooks, "pre", "build", tmp_path, jobs=2) is True
+    assert log.read_text().splitlines()[-1] == "done"
+
+
+def test_run_hooks_parallel_failure_cancels_rest(tmp_path, capsys):
+    hooks = [
+        Hook(name="slow", cmd="sleep 5", parallel=True),
+        Hook(name="bad", cmd="sleep 0.1; exit 1", parallel=True),
+        "echo never",
+    ]
+    start = time.monotonic()
+    assert run_hooks(hooks, "pre", "build", tmp_path, jobs=2) is False
+    assert time.monotonic() - start < 3
+    out = capsys.readouterr().out
+    assert "Hook failed: bad" in out
+    assert "Cancelled pre hooks: slow, echo never" in out
+
+
+def test_run_hooks_invalid_graph(tmp_path, capsys):
+    hooks = [Hook(name="a", cmd="true", needs=["missing"], parallel=True)]
+    assert run_hooks(hooks, "pre", "build", tmp_path) is False
+    assert "Invalid pre hooks for build" in capsys.readouterr().out
+
+
+def test_run_hooks_timeout_fails_hook(tmp_path, capsys):
+    start = time.monotonic()
+    assert run_hooks([Hook(cmd="sleep 5", timeout=0.2)], "pre", "build", tmp_path) is False
+    assert time.monotonic() - start < 3
+    assert "Timed out after 0.2s" in capsys.readouterr().out
+
+
+def test_run_hooks_timeout_kills_serial_hook_group(tmp_path):
+    marker = tmp_path / "late"
+    start = time.monotonic()
+    hook = Hook(cmd=f"(sleep 1 && touch {marker}) & sleep 5", timeout=0.2)
+    assert run_hooks([hook], "pre", "build", tmp_path) is False
+    assert time.monotonic() - start < 1
+    time.sleep(1.2)
+    assert not marker.exists()
+
+
+@pytest.fixture
+def write_module(tmp_path, monkeypatch):
+    """Write a hook module into the project; sys.path and sys.modules are restored afterwards."""
+    import sys
+
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    names = []
+
+    def write(name, source):
+        names.append(name)
+        (tmp_path / f"{name}.py").write_text(source)
+
+    yield write
+    for name in names:
+        sys.modules.pop(name, None)
+
+
+def test_run_hooks_python_hook_runs_in_process(tmp_path, write_module, mocker):
+    write_module("hooks_inproc", (
+        "seen = []\n"
+        "def check(ctx):\n"
+        "    seen.append((ctx.command, ctx.phase, ctx.project_dir, ctx.config, ctx.env['PKG_PHASE']))\n"
+    ))
+    popen = mocker.patch("subprocess.Popen")
+    config = Config()
+    assert run_hooks(["py:hooks_inproc:check"], "pre", "build", tmp_path, config=config) is True
+    popen.assert_not_called()
+
+    import hooks_inproc
+    assert hooks_inproc.seen == [("build", "pre", tmp_path, config, "pre")]
+
+
+def test_run_hooks_python_hook_results(tmp_path, write_module, capsys):
+    write_module("hooks_results", (
+        "def ok(ctx):\n    return True\n"
+        "def refuse(ctx):\n    return False\n"
+        "def code(ctx):\n    return 3\n"
+        "def boom(ctx):\n    raise RuntimeError('nope')\n"
+        "def other(ctx):\n    return 'done'\n"
+    ))
+    assert run_hooks(["py:hooks_results:ok"], "pre", "build", tmp_path) is True
+    assert run_hooks(["py:hooks_results:refuse"], "pre", "build", tmp_path) is False
+    assert run_hooks(["py:hooks_results:code"], "pre", "build", tmp_path) is False
+    assert run_hooks(["py:hooks_results:boom"], "pre", "build", tmp_path) is False
+    assert "raised RuntimeError: nope" in capsys.readouterr().out
+    assert run_hooks(["py:hooks_results:other"], "pre", "build", tmp_path) is False
+    assert "returned str, expected None, a bool or an int" in capsys.readouterr().out
+    assert run_hooks(["py:hooks_results:missing"], "pre", "build", tmp_path) is False
+    assert "Cannot load hook hooks_results:missing" in capsys.readouterr().out
+
+
+def test_run_hooks_python_hook_from_entry_point(tmp_path, write_module, mocker, capsys):
+    write_module("hooks_entry", "def lint(ctx):\n    print('linting', ctx.command)\n")
+    mocker.patch("pkg.plugins.scan_entry_points", return_value={"lint": "hooks_entry:lint"})
+    assert run_hooks(["py:lint"], "pre", "test", tmp_path) is True
+    assert "linting test" in capsys.readouterr().out
+    assert run_hooks(["py:unknown"], "pre", "test", tmp_path) is False
+    assert "no pkg.hooks entry point named unknown" in capsys.readouterr().out
+
+
+def test_run_hooks_python_hook_skipped_after_failure(tmp_path, write_module):
+    import sys
+
+    write_module("hooks_skipped", "def mark(ctx):\n    pass\n")
+    hooks = [Hook(name="bad", cmd="false"), Hook(name="py", cmd="py:hooks_skipped:mark")]
+    assert run_hooks(hooks, "pre", "build", tmp_path) is False
+    assert "hooks_skipped" not in sys.modules
+
+
+def test_run_hooks_argv_list_skips_shell(tmp_path, capsys):
+    marker = tmp_path / "a file; rm -rf x"
+    assert run_hooks([["touch", str(marker)]], "pre", "build", tmp_path) is True
+    assert marker.exists()
+    hooks = [Hook(name="argv", cmd=["sh", "-c", "exit 4"])]
+    assert run_hooks(hooks, "pre", "build", tmp_path) is False
+    assert "Hook failed: argv" in capsys.readouterr().out
+
+
+def codegen_hook(tmp_path):
+    (tmp_path / "schema").mkdir()
+    (tmp_path / "schema" / "api.json").write_text("{}")
+    log = tmp_path / "runs"
+    return Hook(
+        name="codegen",
+        cmd=f"echo run >> {log} && mkdir -p gen && touch gen/api.py",
+        inputs=["schema/**/*.json"],
+        outputs=["gen/*.py"],
+    ), log
+
+
+def test_run_hooks_skips_up_to_date_hook(tmp_path, capsys):
+    hook, log = codegen_hook(tmp_path)
+    assert run_hooks([hook], "pre", "build", tmp_path) is True
+    assert run_hooks([hook], "pre", "build", tmp_path) is True
+    assert log.read_text() == "run\n"
+    assert "Skipping pre hook codegen: up to date" in capsys.readouterr().out
+
+
+def test_run_hooks_reruns_hook_when_inputs_change_or_outputs_vanish(tmp_path):
+    hook, log = codegen_hook(tmp_path)
+    run_hooks([hook], "pre", "build", tmp_path)
+
+    (tmp_path / "schema" / "api.json").write_text('{"v": 2}')
+    run_hooks([hook], "pre", "build", tmp_path)
+    assert log.read_text() == "run\nrun\n"
+
+    (tmp_path / "gen" / "api.py").unlink()
+    run_hooks([hook], "pre", "build", tmp_path)
+    assert log.read_text() == "run\nrun\nrun\n"
+
+    (tmp_path / "schema" / "new.json").write_text("{}")
+    run_hooks([hook], "pre", "build", tmp_path)
+    assert log.read_text() == "run\nrun\nrun\nrun\n"
+
+
+def test_run_hooks_failed_cached_hook_runs_again(tmp_path):
+    (tmp_path / "in.txt").write_text("x")
+    log = tmp_path / "runs"
+    hook = Hook(name="flaky", cmd=f"echo run >> {log}; exit 1", inputs=["in.txt"])
+    assert run_hooks([hook], "pre", "build", tmp_path) is False
+    assert run_hooks([hook], "pre", "build", tmp_path) is False
+    assert log.read_text() == "run\nrun\n"
+
+
+def test_hook_cache_status(tmp_path):
+    from pkg.hooks import HookCache
+
+    hook, _ = codegen_hook(tmp_path)
+    cache = HookCache(tmp_path)
+    assert cache.status("build pre: codegen", hook) == "never succeeded"
+    run_hooks([hook], "pre", "build", tmp_path)
+    assert cache.status("build pre: codegen", hook) is None
+    (tmp_path / "schema" / "api.json").write_text("changed")
+    assert cache.status("build pre: codegen", hook) == "inputs changed"
+    (tmp_path / "gen" / "api.py").unlink()
+    assert cache.status("build pre: codegen", hook) == "outputs missing"
@@ -0,0 +1,109 @@
+import os
+import time
+
+from pkg.ordering import Priorities, priorities
+from pkg.timings import Sample, TimingDB, timings_path
+from pkg.tools.bash import BashTool
+from pkg.tools.go import GoTool
+from pkg.tools.uv import UvTool
+
+
+def record_run(project_dir, started, failed=()):
+    with TimingDB(timings_path(project_dir)) as db:
+        db.add([Sample("command", "test", 1.0, 0, started)])
+        db.add(Sample("test", name, 0.1, 1, started) for name in failed)
+
+
+def touch(path, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(path.name)
+    os.utime(path, (mtime, mtime))
+
+
+def test_priorities_need_history(tmp_path):
+    tool = BashTool(tmp_path)
+    assert priorities(tool) is None
+
+    touch(tmp_path / "tests" / "a_test.sh", time.time() - 100)
+    record_run(tmp_path, time.time() - 50)
+    assert priorities(tool) is None
+
+
+def test_order_failed_then_changed(tmp_path):
+    old, run = time.time() - 100, time.time() - 50
+    for name in "abcde":
+        touch(tmp_path / "tests" / f"{name}_test.sh", old)
+    (tmp_path / "tests" / "d_test.sh").write_text("bash src/tool.sh\n")
+    os.utime(tmp_path / "tests" / "d_test.sh", (old, old))
+    touch(tmp_path / "tests" / "c_test.sh", time.time())
+    touch(tmp_path / "src" / "tool.sh", time.time())
+    record_run(tmp_path, run, failed=["e_test.sh", "c_test.sh"])
+    with TimingDB(timings_path(tmp_path)) as db:
+        db.add([Sample("test", "a_test.sh", 0.1, 0, run)])
+
+    tool = BashTool(tmp_path)
+    first = priorities(tool)
+    assert first.failed == {"c_test.sh", "e_test.sh"}
+    assert sorted(p.name for p in first.changed) == ["c_test.sh", "tool.sh"]
+    assert first.order(tool, tool.test_units()) == [
+        "c_test.sh", "e_test.sh", "d_test.sh", "a_test.sh", "b_test.sh",
+    ]
+
+
+def test_order_go_package_directories(tmp_path):
+    (tmp_path / "go.mod").write_text("module example.com/app\n")
+    tool = GoTool(tmp_path)
+    units = ["example.com/app", "example.com/app/a", "example.com/app/b"]
+    first = Priorities(changed=[tmp_path / "b" / "b.go"])
+    assert first.order(tool, units) == ["example.com/app/b", "example.com/app", "example.com/app/a"]
+    assert Priorities().order(tool, units) == units
+
+
+def test_order_go_importers_of_changed_packages(tmp_path):
+    (tmp_path / "go.mod").write_text("module example.com/app\n")
+    for rel, source in {
+        "a/a.go": "package a\n",
+        "b/b.go": 'package b\n\nimport "example.com/app/c"\n',
+        "c/c.go": "package c\n",
+    }.items():
+        (tmp_path / rel).parent.mkdir(exist_ok=True)
+        (tmp_path / rel).write_text(source)
+    tool = GoTool(tmp_path)
+    units = ["example.com/app/a", "example.com/app/b", "example.com/app/c"]
+    first = Priorities(changed=[tmp_path / "c" / "c.go"])
+    assert first.order(tool, units) == ["example.com/app/b", "example.com/app/c", "example.com/app/a"]
+
+
+def test_order_node_ids_of_affected_modules(tmp_path):
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_a.py").write_text("")
+    (tmp_path / "tests" / "test_b.py").write_text("from pkg.util import parse\n")
+    tool = UvTool(tmp_path)
+    units = ["tests/test_a.py::test_one", "tests/test_b.py::test_one", "tests/test_b.py::test_two"]
+    first = Priorities(changed=[tmp_path / "src" / "pkg" / "util.py"])
+    assert first.order(tool, units) == [*units[1:], units[0]]
+
+
+def test_bash_test_runs_failed_first(tmp_path):
+    log = tmp_path / "order.log"
+    for name in "abc":
+        touch(tmp_path / "tests" / f"{name}_test.sh", time.time() - 100)
+        (tmp_path / "tests" / f"{name}_test.sh").write_text(f"echo {name} >> {log}\n")
+    record_run(tmp_path, time.time(), failed=["c_test.sh"])
+
+    assert BashTool(tmp_path).test() == 0
+    assert log.read_text().split() == ["c", "a", "b"]
+
+
+def test_go_test_lists_packages_only_when_prioritized(tmp_path, mocker):
+    tool = GoTool(tmp_path)
+    run_tests = mocker.patch.object(tool, "run_tests", return_value=0)
+    test_units = mocker.patch.object(tool, "test_units", return_value=["example.com/a", "example.com/b"])
+
+    tool.test()
+    run_tests.assert_called_with(["./..."])
+    test_units.assert_not_called()
+
+    record_run(tmp_path, time.time(), failed=["example.com/b"])
+    tool.test()
+    run_tests.assert_called_with(["example.com/b", "example.com/a"])
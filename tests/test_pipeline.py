@@ -0,0 +1,124 @@
+import time
+
+from pkg import pipeline
+from pkg.pipeline import (
+    Stage,
+    call_stage,
+    command_stage,
+    discard_staged,
+    publish_staged,
+    run_pipeline,
+    staging_dir,
+)
+from pkg.runner import run_command
+
+
+def test_run_pipeline_runs_independent_stages_concurrently(tmp_path):
+    stages = [command_stage(name, ["sleep", "0.3"], tmp_path) for name in ["a", "b", "c"]]
+    start = time.monotonic()
+    assert run_pipeline(stages, jobs=3) == 0
+    assert time.monotonic() - start < 0.8
+
+
+def test_run_pipeline_limits_concurrent_stages(tmp_path, mocker):
+    graph = mocker.spy(pipeline, "run_graph")
+    stages = [command_stage(name, ["true"], tmp_path) for name in ["a", "b", "c"]]
+    assert run_pipeline(stages, jobs=2) == 0
+    assert graph.call_args.kwargs["jobs"] == 2
+    mocker.patch("os.cpu_count", return_value=6)
+    run_pipeline(stages)
+    assert graph.call_args.kwargs["jobs"] == 6
+
+
+def test_run_pipeline_respects_needs(tmp_path):
+    log = tmp_path / "log"
+    stages = [
+        command_stage("second", ["sh", "-c", f"echo second >> {log}"], tmp_path, needs=["first"]),
+        command_stage("first", ["sh", "-c", f"sleep 0.1; echo first >> {log}"], tmp_path),
+    ]
+    assert run_pipeline(stages) == 0
+    assert log.read_text() == "first\nsecond\n"
+
+
+def test_run_pipeline_publishes_only_when_all_pass(tmp_path):
+    published = []
+
+    def publish():
+        published.append(True)
+        return 0
+
+    assert run_pipeline([command_stage("ok", ["true"], tmp_path)], publish) == 0
+    assert published == [True]
+
+    stages = [command_stage("ok", ["true"], tmp_path), command_stage("bad", ["sh", "-c", "exit 3"], tmp_path)]
+    assert run_pipeline(stages, publish) == 3
+    assert published == [True]
+
+
+def test_run_pipeline_cancels_siblings_on_failure(tmp_path, capsys):
+    stages = [
+        command_stage("slow", ["sleep", "5"], tmp_path),
+        command_stage("bad", ["sh", "-c", "sleep 0.1; exit 1"], tmp_path),
+        command_stage("after", ["true"], tmp_path, needs=["slow"]),
+    ]
+    start = time.monotonic()
+    assert run_pipeline(stages, jobs=3, fail_fast=True) == 1
+    assert time.monotonic() - start < 3
+    out = capsys.readouterr().out
+    assert "Stages:" in out
+    assert "slow   cancelled" in out
+    assert "bad    failed" in out
+    assert "after  cancelled" in out
+    assert "Build failed: bad; nothing was published" in out
+
+
+def test_run_pipeline_runs_every_stage_without_fail_fast(tmp_path, capsys):
+    published = []
+    stages = [
+        command_stage("bad", ["sh", "-c", "exit 3"], tmp_path),
+        command_stage("other", ["sh", "-c", "sleep 0.2; exit 2"], tmp_path),
+        command_stage("ok", ["true"], tmp_path),
+        command_stage("after", ["true"], tmp_path, needs=["bad"]),
+    ]
+    assert run_pipeline(stages, lambda: published.append(True) or 0, jobs=2) == 3
+    out = capsys.readouterr().out
+    assert "ok     passed" in out
+    assert "after  cancelled" in out
+    assert "Build failed: bad, other; nothing was published" in out
+    assert published == []
+
+
+def test_call_stage_kills_commands_on_cancel(tmp_path):
+    stages = [
+        call_stage("tool", lambda: run_command(["sleep", "5"], tmp_path)),
+        Stage("bad", lambda token: 2),
+    ]
+    start = time.monotonic()
+    assert run_pipeline(stages, jobs=2, fail_fast=True) == 2
+    assert time.monotonic() - start < 3
+
+
+def test_call_stage_returns_result(tmp_path):
+    stage = call_stage("tool", lambda: 0)
+    assert run_pipeline([stage]) == 0
+
+
+def test_staging_publish(tmp_path):
+    out = tmp_path / "dist"
+    (out / "old").mkdir(parents=True)
+    (out / "keep.txt").write_text("kept")
+    staging = staging_dir(out)
+    (staging / "app.whl").write_text("new")
+    (staging / "old").mkdir()
+    (staging / "old" / "file").write_text("replaced")
+    assert publish_staged(out) == ["app.whl", "old"]
+    assert sorted(p.name for p in out.iterdir()) == ["app.whl", "keep.txt", "old"]
+    assert (out / "old" / "file").read_text() == "replaced"
+
+
+def test_staging_dir_starts_empty_and_is_discarded(tmp_path):
+    out = tmp_path / "build"
+    (staging_dir(out) / "stale").write_text("x")
+    assert list(staging_dir(out).iterdir()) == []
+    discard_staged(out)
+    assert list(out.iterdir()) == []
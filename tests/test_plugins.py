@@ -1,6 +1,6 @@
 import pytest
 import click
-from pkg.plugins import Plugin, PluginManager
+from pkg.plugins import Plugin, PluginIndex, PluginManager, environment_key, load_target
 
 
 class MockPlugin(Plugin):
@@ -75,3 +75,125 @@ def test_plugin_manager_discover_returns_dict():
     pm = PluginManager()
     result = pm.discover_plugins()
     assert isinstance(result, dict)
+
+
+class NotAPlugin:
+    pass
+
+
+def test_load_target():
+    assert load_target("tests.test_plugins:MockPlugin") is MockPlugin
+
+
+def test_load_target_nested_attribute_and_extras():
+    assert load_target("pkg.plugins:Plugin.on_load [extra]") is Plugin.on_load
+
+
+def test_environment_key_changes_with_dist_info(tmp_path):
+    before = environment_key([tmp_path])
+    (tmp_path / "foo-1.0.dist-info").mkdir()
+    (tmp_path / "foo-1.0.dist-info" / "RECORD").write_text("foo.py,,")
+    assert environment_key([tmp_path]) != before
+
+
+def test_plugin_index_caches_scan(tmp_path, mocker):
+    scan = mocker.patch("pkg.plugins.scan_entry_points", return_value={"mock": "x:Y"})
+    (tmp_path / "cache").mkdir()
+    mocker.patch("pkg.plugins.search_paths", return_value=[tmp_path])
+    index = PluginIndex(tmp_path / "cache" / "index.json")
+    assert index.entries() == {"mock": "x:Y"}
+    assert index.entries() == {"mock": "x:Y"}
+    scan.assert_called_once()
+
+
+def test_plugin_index_per_group(mocker):
+    scan = mocker.patch("pkg.plugins.scan_entry_points", return_value={"lint": "x:lint"})
+    plugins = PluginIndex()
+    hooks = PluginIndex(group="pkg.hooks")
+    assert hooks.path != plugins.path
+    assert hooks.entries() == {"lint": "x:lint"}
+    scan.assert_called_once_with("pkg.hooks")
+
+
+def test_plugin_index_invalidates_on_install(tmp_path, mocker):
+    scan = mocker.patch("pkg.plugins.scan_entry_points", return_value={})
+    site = tmp_path / "site"
+    site.mkdir()
+    mocker.patch("pkg.plugins.search_paths", return_value=[site])
+    index = PluginIndex(tmp_path / "index.json")
+    index.entries()
+    (site / "foo-1.0.dist-info").mkdir()
+    (site / "foo-1.0.dist-info" / "RECORD").write_text("")
+    index.entries()
+    assert scan.call_count == 2
+
+
+def test_plugin_index_rebuild(tmp_path, mocker):
+    scan = mocker.patch("pkg.plugins.scan_entry_points", return_value={})
+    mocker.patch("pkg.plugins.search_paths", return_value=[tmp_path])
+    index = PluginIndex(tmp_path / "cache" / "index.json")
+    index.entries()
+    index.rebuild()
+    assert scan.call_count == 2
+
+
+def test_plugin_index_default_path(isolated_cache):
+    assert PluginIndex().path.parent == isolated_cache / "plugins"
+
+
+def _manager(tmp_path, mocker, entries):
+    mocker.patch("pkg.plugins.scan_entry_points", return_value=entries)
+    mocker.patch("pkg.plugins.search_paths", return_value=[tmp_path])
+    return PluginManager(PluginIndex(tmp_path / "cache" / "index.json"))
+
+
+def test_load_plugins_skips_index_when_none_enabled(mocker):
+    pm = PluginManager()
+    entries = mocker.patch.object(pm.index, "entries")
+    pm.load_plugins([], None)
+    entries.assert_not_called()
+
+
+def test_load_plugins_imports_only_enabled(tmp_path, mocker):
+    pm = _manager(tmp_path, mocker, {
+        "mock": "tests.test_plugins:MockPlugin",
+        "broken": "does.not.exist:Plugin",
+    })
+    pm.load_plugins(["mock"], {"cfg": 1})
+    assert len(pm.plugins) == 1
+    assert pm.plugins[0].loaded
+
+
+def test_load_plugins_reports_errors(tmp_path, mocker, capsys):
+    pm = _manager(tmp_path, mocker, {
+        "broken": "does.not.exist:Plugin",
+        "wrong": "tests.test_plugins:NotAPlugin",
+    })
+    pm.load_plugins(["broken", "wrong", "missing"], None)
+    out = capsys.readouterr().out
+    assert pm.plugins == []
+    assert "Failed to load plugin broken" in out
+    assert "not a Plugin subclass" in out
+    assert "Plugin not installed: missing" in out
+
+
+def test_discover_plugins_from_index(tmp_path, mocker):
+    pm = _manager(tmp_path, mocker, {
+        "mock": "tests.test_plugins:MockPlugin",
+        "broken": "does.not.exist:Plugin",
+    })
+    assert pm.discover_plugins() == {"mock": MockPlugin}
+
+
+def test_plugin_hooks_are_traced(mocker):
+    from pkg import trace
+    tracer = trace.enable()
+    try:
+        pm = PluginManager()
+        pm.plugins.append(MockPlugin())
+        pm.on_pre_command("build")
+        pm.on_post_command("build", 0)
+    finally:
+        trace.disable()
+    names = [e["name"] for e in tracer.events if e["ph"] == "X"]
+    assert names == ["mock.on_pre_command", "mock.on_post_command"]
@@ -1,5 +1,18 @@
 import pytest
-from pkg.runner import run_command
+from pkg import runner
+from pkg.scheduler import CancelToken
+from pkg.runner import (
+    TIMEOUT_EXIT,
+    Task,
+    TaskResult,
+    cancel_scope,
+    report_failures,
+    resolve_jobs,
+    run_command,
+    run_parallel,
+    run_process,
+    summarize,
+)
 
 
 def test_run_command_success(tmp_path):
@@ -15,3 +28,224 @@ def test_run_command_failure(tmp_path):
 def test_run_command_with_args(tmp_path):
     result = run_command(["echo", "hello"], tmp_path)
     assert result == 0
+
+
+def test_resolve_jobs():
+    assert resolve_jobs(4) == 4
+    assert resolve_jobs(0) >= 1
+
+
+def test_run_parallel_serial(tmp_path):
+    tasks = [Task("a", ["true"]), Task("b", ["false"])]
+    results = run_parallel(tasks, tmp_path)
+    assert [r.returncode for r in results] == [0, 1]
+
+
+def test_run_parallel_preserves_task_order(tmp_path):
+    tasks = [
+        Task("slow", ["sh", "-c", "sleep 0.2"]),
+        Task("fast", ["true"]),
+    ]
+    results = run_parallel(tasks, tmp_path, jobs=2)
+    assert [r.name for r in results] == ["slow", "fast"]
+    assert all(r.ok for r in results)
+
+
+def test_run_parallel_runs_concurrently(tmp_path):
+    import time
+    tasks = [Task(str(i), ["sh", "-c", "sleep 0.3"]) for i in range(4)]
+    start = time.monotonic()
+    run_parallel(tasks, tmp_path, jobs=4)
+    assert time.monotonic() - start < 1.0
+
+
+def test_run_parallel_buffers_output_per_task(tmp_path, capsys):
+    tasks = [
+        Task("a", ["sh", "-c", "echo a1; sleep 0.1; echo a2"]),
+        Task("b", ["sh", "-c", "echo b1; sleep 0.1; echo b2"]),
+    ]
+    run_parallel(tasks, tmp_path, jobs=2)
+    out = capsys.readouterr().out
+    assert "a1\na2\n" in out
+    assert "b1\nb2\n" in out
+
+
+def test_run_parallel_fail_fast_skips_remaining(tmp_path):
+    tasks = [Task("bad", ["false"])] + [Task(str(i), ["true"]) for i in range(3)]
+    results = run_parallel(tasks, tmp_path, jobs=1, fail_fast=True)
+    passed, failed, skipped = summarize(results)
+    assert failed == ["bad"]
+    assert skipped == ["0", "1", "2"]
+
+
+def test_run_parallel_fail_fast_kills_running(tmp_path):
+    import time
+    tasks = [
+        Task("slow", ["sh", "-c", "sleep 5"]),
+        Task("bad", ["sh", "-c", "sleep 0.1; exit 1"]),
+    ]
+    start = time.monotonic()
+    results = run_parallel(tasks, tmp_path, jobs=2, fail_fast=True)
+    assert time.monotonic() - start < 3
+    assert results[0].returncode is None
+    assert results[1].returncode == 1
+
+
+def test_summarize():
+    results = [TaskResult("a", 0), TaskResult("b", 2), TaskResult("c", None)]
+    assert summarize(results) == (["a"], ["b"], ["c"])
+
+
+def test_run_command_on_line(tmp_path, capfd):
+    lines = []
+    result = run_command(["printf", "one\\ntwo\\n"], tmp_path, on_line=lines.append)
+    assert result == 0
+    assert lines == ["one\n", "two\n"]
+    assert "one\ntwo\n" in capfd.readouterr().out
+
+
+def test_run_command_on_line_can_stop(tmp_path):
+    lines = []
+
+    def on_line(line):
+        lines.append(line)
+        return line.startswith("stop")
+
+    result = run_command(["sh", "-c", "echo stop; sleep 10; echo late"], tmp_path, on_line=on_line)
+    assert result != 0
+    assert lines == ["stop\n"]
+
+
+def test_run_command_timeout(tmp_path, capsys):
+    import time
+    start = time.monotonic()
+    assert run_command(["sleep", "5"], tmp_path, timeout=0.2) == TIMEOUT_EXIT
+    assert time.monotonic() - start < 3
+    assert "Timed out after 0.2s: sleep 5" in capsys.readouterr().out
+
+
+def test_run_command_timeout_kills_process_group(tmp_path, capfd):
+    import time
+    marker = tmp_path / "late"
+    start = time.monotonic()
+    args = ["sh", "-c", f"(sleep 1 && touch {marker}) & sleep 5; echo done"]
+    assert run_command(args, tmp_path, on_line=lambda line: False, timeout=0.2) == TIMEOUT_EXIT
+    assert time.monotonic() - start < 1
+    time.sleep(1.2)
+    assert not marker.exists()
+    assert "\ndone\n" not in capfd.readouterr().out
+
+
+def test_run_command_stops_reading_after_kill(tmp_path):
+    import time
+    start = time.monotonic()
+    # setsid puts the sleep outside the killed group, still holding stdout
+    args = ["sh", "-c", "setsid sleep 5 & sleep 5"]
+    assert run_command(args, tmp_path, on_line=lambda line: False, timeout=0.2) == TIMEOUT_EXIT
+    assert time.monotonic() - start < 3
+
+
+def test_run_command_cancel_kills_process_group(tmp_path):
+    import threading
+    import time
+    marker = tmp_path / "late"
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    start = time.monotonic()
+    with cancel_scope(token):
+        assert run_command(["sh", "-c", f"(sleep 1 && touch {marker}) & sleep 5"], tmp_path) != 0
+    assert time.monotonic() - start < 1
+    time.sleep(1.2)
+    assert not marker.exists()
+
+
+def test_run_command_without_timeout_stays_in_session(tmp_path, mocker):
+    popen = mocker.spy(runner.subprocess, "Popen")
+    run_command(["true"], tmp_path)
+    assert popen.call_args.kwargs["start_new_session"] is False
+    run_command(["true"], tmp_path, timeout=5)
+    assert popen.call_args.kwargs["start_new_session"] is True
+
+
+def test_run_process_timeout_kills_process_group(tmp_path):
+    import time
+    marker = tmp_path / "late"
+    start = time.monotonic()
+    result = run_process(
+        f"sleep 1 && touch {marker} & sleep 5", tmp_path, header="", buffered=True, shell=True, timeout=0.2
+    )
+    assert result == TIMEOUT_EXIT
+    assert time.monotonic() - start < 3
+    time.sleep(1.2)
+    assert not marker.exists()
+
+
+def test_run_process_cancel_kills_unbuffered_process_group(tmp_path):
+    import threading
+    import time
+    marker = tmp_path / "late"
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    start = time.monotonic()
+    result = run_process(f"(sleep 1 && touch {marker}) & sleep 5", tmp_path, header="", shell=True, token=token)
+    assert result is None
+    assert time.monotonic() - start < 1
+    time.sleep(1.2)
+    assert not marker.exists()
+
+
+def test_run_parallel_prefixed_output(tmp_path, capsys):
+    tasks = [
+        Task("a", ["sh", "-c", "echo one; sleep 0.1; echo two"]),
+        Task("bb", ["sh", "-c", "echo three"]),
+    ]
+    results = run_parallel(tasks, tmp_path, jobs=2, prefixed=True)
+    out = capsys.readouterr().out
+    assert "a  | one\n" in out
+    assert "a  | two\n" in out
+    assert "bb | three\n" in out
+    assert results[0].tail == ["one", "two"]
+
+
+def test_run_parallel_keeps_tail_of_buffered_output(tmp_path):
+    tasks = [
+        Task("long", ["sh", "-c", "seq 1 100; exit 3"]),
+        Task("ok", ["true"]),
+    ]
+    results = run_parallel(tasks, tmp_path, jobs=2)
+    assert results[0].returncode == 3
+    assert results[0].tail == [str(i) for i in range(61, 101)]
+    assert results[1].tail == []
+
+
+def test_run_parallel_keeps_tail_of_streamed_output(tmp_path, capfd):
+    results = run_parallel([Task("long", ["sh", "-c", "seq 1 100; exit 3"])], tmp_path)
+    assert results[0].tail == [str(i) for i in range(61, 101)]
+    assert "\n1\n2\n" in capfd.readouterr().out
+
+
+def test_run_parallel_timeout(tmp_path):
+    tasks = [Task("slow", ["sleep", "5"]), Task("fast", ["true"])]
+    results = run_parallel(tasks, tmp_path, jobs=2, timeout=0.2)
+    assert [r.returncode for r in results] == [TIMEOUT_EXIT, 0]
+
+
+def test_run_parallel_groups_output_on_github_actions(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")
+    run_parallel([Task("a", ["echo", "hi"]), Task("b", ["true"])], tmp_path, jobs=2)
+    out = capsys.readouterr().out
+    assert "::group::> echo hi\n" in out
+    assert "hi\n::endgroup::" in out
+
+
+def test_report_failures(capsys):
+    report_failures([
+        TaskResult("a", 0, tail=["fine"]),
+        TaskResult("b", 1, tail=["boom", "[not markup]"]),
+        TaskResult("c", None, tail=["cancelled"]),
+    ])
+    out = capsys.readouterr().out
+    assert "b (exit 1), last 2 lines" in out
+    assert "boom\n[not markup]" in out
+    assert "fine" not in out
+    assert "cancelled" not in out
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+from pkg.scheduler import CancelToken, Node, NodeResult, run_graph, toposort
+
+
+def _ok(token):
+    return 0
+
+
+def _fail(token):
+    return 1
+
+
+def test_cancel_token_runs_callbacks_once():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append(1))
+    token.cancel()
+    token.cancel()
+    assert calls == [1]
+    assert token.cancelled
+
+
+def test_cancel_token_unregister():
+    token = CancelToken()
+    calls = []
+    unregister = token.on_cancel(lambda: calls.append(1))
+    unregister()
+    token.cancel()
+    assert calls == []
+
+
+def test_cancel_token_late_registration_runs_immediately():
+    token = CancelToken()
+    token.cancel()
+    calls = []
+    token.on_cancel(lambda: calls.append(1))()
+    assert calls == [1]
+
+
+def test_node_result_ok():
+    assert NodeResult("a", 0).ok
+    assert not NodeResult("a", None).ok
+
+
+def test_toposort_orders_needs_first():
+    nodes = [Node("c", _ok, ["b"]), Node("b", _ok, ["a"]), Node("a", _ok)]
+    assert [n.name for n in toposort(nodes)] == ["a", "b", "c"]
+
+
+def test_toposort_unknown_need():
+    with pytest.raises(ValueError, match="needs unknown"):
+        toposort([Node("a", _ok, ["missing"])])
+
+
+def test_toposort_duplicate():
+    with pytest.raises(ValueError, match="duplicate"):
+        toposort([Node("a", _ok), Node("a", _ok)])
+
+
+def test_toposort_cycle():
+    with pytest.raises(ValueError, match="cycle: a -> b -> a"):
+        toposort([Node("a", _ok, ["b"]), Node("b", _ok, ["a"])])
+
+
+def test_run_graph_respects_needs():
+    order = []
+
+    def record(name):
+        def action(token):
+            order.append(name)
+            return 0
+        return action
+
+    nodes = [Node("b", record("b"), ["a"]), Node("a", record("a"))]
+    results = run_graph(nodes, jobs=4)
+    assert order == ["a", "b"]
+    assert [r.name for r in results] == ["b", "a"]
+
+
+def test_run_graph_runs_independent_nodes_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def action(token):
+        barrier.wait()
+        return 0
+
+    results = run_graph([Node(str(i), action) for i in range(3)], jobs=3)
+    assert all(r.ok for r in results)
+
+
+def test_run_graph_limits_workers():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def action(token):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+        return 0
+
+    run_graph([Node(str(i), action) for i in range(6)], jobs=2)
+    assert max(peak) <= 2
+
+
+def test_run_graph_skips_dependents_of_failure():
+    nodes = [Node("a", _fail), Node("b", _ok, ["a"]), Node("c", _ok)]
+    results = run_graph(nodes, jobs=1, fail_fast=False)
+    assert [r.returncode for r in results] == [1, None, 0]
+
+
+def test_run_graph_fail_fast_cancels_running():
+    def slow(token):
+        stopped = threading.Event()
+        token.on_cancel(stopped.set)
+        return None if stopped.wait(5) else 0
+
+    def failing(token):
+        time.sleep(0.05)
+        return 1
+
+    start = time.monotonic()
+    results = run_graph([Node("slow", slow), Node("bad", failing), Node("later", _ok, ["bad"])], jobs=2)
+    assert time.monotonic() - start < 2
+    assert [r.returncode for r in results] == [None, 1, None]
+
+
+def test_run_graph_records_duration():
+    def action(token):
+        time.sleep(0.05)
+        return 0
+
+    (result,) = run_graph([Node("a", action)])
+    assert result.duration >= 0.05
+
+
+def test_run_graph_exception_cancels_token():
+    token = CancelToken()
+
+    def boom(t):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run_graph([Node("a", boom)], token=token)
+    assert token.cancelled
@@ -0,0 +1,186 @@
+from pathlib import Path
+
+import pytest
+from pkg.sharding import (
+    load_durations,
+    parse_shard,
+    run_local_shards,
+    run_shard,
+    run_units_file,
+    split,
+    unit_size,
+    unit_weights,
+)
+from pkg.timings import Sample, TimingDB, timings_path
+from pkg.tools.bash import BashTool
+from pkg.tools.base import ToolOptions
+from pkg.tools.uv import UvTool
+
+
+def make_tests(tmp_path, tests):
+    (tmp_path / "tests").mkdir(exist_ok=True)
+    for name, body in tests.items():
+        (tmp_path / "tests" / name).write_text(body)
+    return BashTool(tmp_path)
+
+
+def test_parse_shard():
+    assert parse_shard("2/3") == (2, 3)
+    for value in ["0/3", "4/3", "3", "a/b", "1/2/3"]:
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_unit_size(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a_test.go").write_text("x" * 10)
+    (tmp_path / "pkg" / "b.go").write_text("x" * 5)
+    assert unit_size(tmp_path / "pkg") == 15
+    assert unit_size(tmp_path / "pkg" / "b.go") == 5
+    assert unit_size(tmp_path / "missing") == 0
+    assert unit_size(None) == 0
+
+
+def test_split_balances_heaviest_first():
+    weights = {"a": 8.0, "b": 5.0, "c": 4.0, "d": 3.0, "e": 1.0}
+    shards = split(list(weights), weights, 2)
+    assert shards == [["a", "d"], ["b", "c", "e"]]
+    assert split(["a"], {"a": 1.0}, 3) == [["a"], [], []]
+
+
+def test_unit_weights_by_size_and_count(tmp_path):
+    tool = make_tests(tmp_path, {"big_test.sh": "x" * 300, "small_test.sh": "x" * 100})
+    units = tool.test_units()
+    assert unit_weights(tool, units, "count") == {"big_test.sh": 1.0, "small_test.sh": 1.0}
+    assert unit_weights(tool, units, "size") == {"big_test.sh": 300, "small_test.sh": 100}
+    assert unit_weights(tool, units, "duration") == {"big_test.sh": 300, "small_test.sh": 100}
+
+
+def test_unit_weights_by_size_ignore_local_timings(tmp_path):
+    tool = make_tests(tmp_path, {"a_test.sh": "x" * 100, "b_test.sh": "x" * 100})
+    with TimingDB(timings_path(tmp_path)) as db:
+        db.add([Sample("test", "a_test.sh", 9.0, 0)])
+    assert unit_weights(tool, tool.test_units(), "size") == {"a_test.sh": 100, "b_test.sh": 100}
+
+
+def test_unit_weights_prefers_durations(tmp_path):
+    tool = make_tests(tmp_path, {"a_test.sh": "x" * 100, "b_test.sh": "x" * 100, "c_test.sh": "x" * 50})
+    with TimingDB(timings_path(tmp_path)) as db:
+        db.add([Sample("test", "a_test.sh", 4.0, 0), Sample("test", "b_test.sh", 2.0, 0)])
+    weights = unit_weights(tool, tool.test_units(), "duration")
+    # c is sized like the others, at 3s per 100 bytes
+    assert weights == {"a_test.sh": 4.0, "b_test.sh": 2.0, "c_test.sh": pytest.approx(1.5)}
+
+    # Shared durations replace this machine's own
+    weights = unit_weights(tool, tool.test_units(), "duration", {"a_test.sh": 1.0, "b_test.sh": 1.0})
+    assert weights == {"a_test.sh": 1.0, "b_test.sh": 1.0, "c_test.sh": pytest.approx(0.5)}
+
+
+def test_load_durations(tmp_path):
+    path = tmp_path / "durations.json"
+    path.write_text('{"a_test.sh": 2, "b_test.sh": 0.5}')
+    assert load_durations(path) == {"a_test.sh": 2.0, "b_test.sh": 0.5}
+    for body in ["[1, 2]", '{"a": "slow"}', '{"a": true}', "{"]:
+        path.write_text(body)
+        with pytest.raises(ValueError):
+            load_durations(path)
+    with pytest.raises(ValueError):
+        load_durations(tmp_path / "missing.json")
+
+
+def test_unit_weights_share_file_size(tmp_path):
+    tool = UvTool(tmp_path)
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_a.py").write_text("x" * 100)
+    units = ["tests/test_a.py::test_one", "tests/test_a.py::test_two"]
+    assert unit_weights(tool, units, "duration") == {units[0]: 50, units[1]: 50}
+
+
+def test_run_shard(tmp_path, capsys):
+    tool = make_tests(tmp_path, {f"{n}_test.sh": "exit 0\n" for n in "abc"})
+    assert run_shard(tool, 1, 2, "count") == 0
+    out = capsys.readouterr().out
+    assert "Shard 1/2: 2 of 3 tests" in out
+    assert "2 passed" in out
+
+    assert run_shard(tool, 4, 4, "count") == 0
+    assert "Shard 4/4: 0 of 3 tests" in capsys.readouterr().out
+
+
+def test_run_shard_without_test_listing(tmp_path, mocker, capsys):
+    tool = BashTool(tmp_path)
+    mocker.patch.object(tool, "test_units", return_value=None)
+    assert run_shard(tool, 1, 2) == 1
+    assert run_local_shards(tool, 2) == 1
+    assert "Cannot shard" in capsys.readouterr().out
+
+
+def test_run_local_shards_merges_results(tmp_path, capsys):
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"\n')
+    tool = make_tests(tmp_path, {"ok_test.sh": "exit 0\n", "bad_test.sh": "exit 3\n", "x_test.sh": "exit 0\n"})
+
+    assert run_local_shards(tool, 3, "count") == 1
+    out = capsys.readouterr().out
+    assert "shard 1/3 failed" in out
+    assert "shard 2/3 passed" in out
+    assert "1 of 3 shards failed" in out
+
+    with TimingDB(timings_path(tmp_path)) as db:
+        assert set(db.estimates("test")) == {"ok_test.sh", "bad_test.sh", "x_test.sh"}
+
+    (tmp_path / "tests" / "bad_test.sh").unlink()
+    assert run_local_shards(tool, 3, "count") == 0
+    assert "All 2 shards passed" in capsys.readouterr().out
+
+
+def test_run_local_shards_without_tests(tmp_path, capsys):
+    assert run_local_shards(BashTool(tmp_path, ToolOptions()), 2) == 0
+    assert "No tests found" in capsys.readouterr().out
+
+
+def test_run_units_file_records_timings(tmp_path):
+    tool = make_tests(tmp_path, {"a_test.sh": "exit 0\n", "b_test.sh": "exit 0\n"})
+    units_file = tmp_path / "units.txt"
+    units_file.write_text("a_test.sh\n")
+    assert run_units_file(tool, units_file) == 0
+    with TimingDB(timings_path(tmp_path)) as db:
+        assert set(db.estimates("test")) == {"a_test.sh"}
+
+
+def test_run_local_shards_use_own_directories(tmp_path, mocker):
+    tool = make_tests(tmp_path, {"a_test.sh": "exit 0\n", "b_test.sh": "exit 0\n"})
+    seen = []
+
+    def fake_run(tasks, **kwargs):
+        files = [Path(t.args[t.args.index("--units-from") + 1]) for t in tasks]
+        assert all(f.exists() for f in files)
+        seen.append(files)
+        return []
+
+    mocker.patch("pkg.sharding.run_parallel", side_effect=fake_run)
+    run_local_shards(tool, 2, "count")
+    run_local_shards(tool, 2, "count")
+    (first, second), (third, _) = seen
+    assert first.parent != second.parent
+    assert first.parent.parent != third.parent.parent
+    assert not first.exists() and not third.exists()
+
+
+def test_run_units_file_sets_work_dir(tmp_path, mocker):
+    tool = make_tests(tmp_path, {"a_test.sh": "exit 0\n"})
+    run_tests = mocker.patch.object(tool, "run_tests", return_value=0)
+    units_file = tmp_path / "shard" / "units.txt"
+    units_file.parent.mkdir()
+    units_file.write_text("a_test.sh\n")
+    assert run_units_file(tool, units_file) == 0
+    run_tests.assert_called_once_with(["a_test.sh"])
+    assert tool.options.work_dir == units_file.parent
+
+
+def test_run_local_shards_passes_profile(tmp_path, mocker):
+    tool = make_tests(tmp_path, {"a_test.sh": "exit 0\n"})
+    tool.options.profile = "fast"
+    run = mocker.patch("pkg.sharding.run_parallel", return_value=[])
+    assert run_local_shards(tool, 1) == 0
+    [task] = run.call_args.args[0]
+    assert task.args[task.args.index("--profile") + 1] == "fast"
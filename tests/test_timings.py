@@ -0,0 +1,146 @@
+import pytest
+from pkg import runner, timings
+from pkg.hooks import run_hooks
+from pkg.runner import Task, run_command, run_parallel
+from pkg.timings import (
+    Sample,
+    TimingDB,
+    has_timings,
+    journal_path,
+    load_estimates,
+    longest_first,
+    percentile,
+    timings_path,
+)
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = timings.enable(tmp_path)
+    yield recorder
+    timings.disable()
+
+
+def test_percentile():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 5.0
+    assert percentile([7.0], 95) == 7.0
+
+
+def test_db_summaries_and_trend(tmp_path):
+    with TimingDB(tmp_path / "t.sqlite") as db:
+        db.add(Sample("test", "slow", s, 0) for s in [1.0] * 6 + [2.0] * 5)
+        db.add([Sample("test", "fast", 0.1, 0), Sample("test", "fast", 0.2, 1)])
+        db.add([Sample("command", "build", 3.0, 0)])
+
+        slow, fast = db.summaries("test")
+        assert (slow.name, slow.runs, slow.p50, slow.p95, slow.last) == ("slow", 11, 1.0, 2.0, 2.0)
+        assert slow.trend == pytest.approx(1.0)
+        assert (fast.runs, fast.failures, fast.trend) == (2, 1, None)
+        assert [s.name for s in db.summaries()] == ["build", "slow", "fast"]
+        assert db.estimates("test") == {"slow": 1.0, "fast": 0.1}
+
+        db.clear()
+        assert db.summaries() == []
+
+
+def test_db_prunes_old_samples(tmp_path, mocker):
+    mocker.patch("pkg.timings.MAX_SAMPLES", 3)
+    with TimingDB(tmp_path / "t.sqlite") as db:
+        db.add(Sample("test", "a", float(s), 0) for s in range(5))
+        db.add([Sample("test", "b", 1.0, 0)])
+        assert [s.seconds for s in db.samples()[("test", "a")]] == [2.0, 3.0, 4.0]
+
+
+def test_longest_first():
+    estimates = {"a": 1.0, "b": 5.0, "c": 1.0}
+    assert longest_first(["a", "new", "c", "b"], estimates, key=str) == ["new", "b", "a", "c"]
+
+
+def test_load_estimates(tmp_path):
+    assert load_estimates(tmp_path, "test") == {}
+    with TimingDB(timings_path(tmp_path)) as db:
+        db.add([Sample("test", "a", 2.0, 0)])
+    assert load_estimates(tmp_path, "test") == {"a": 2.0}
+
+
+def test_record_is_noop_when_disabled(tmp_path):
+    timings.disable()
+    timings.record("test", "a", 1.0, 0)
+    assert not timings_path(tmp_path).exists()
+
+
+def test_recorder_collects_and_flushes(tmp_path, recorder):
+    assert run_command(["true"], cwd=tmp_path) == 0
+    run_parallel([Task("ok", ["true"]), Task("bad", ["false"])], cwd=tmp_path, kind="test")
+    run_hooks(["true"], "pre", "build", tmp_path)
+    timings.record("command", "skipped", 1.0, None)
+
+    recorder.flush()
+    assert recorder.samples == []
+    with TimingDB(timings_path(tmp_path)) as db:
+        items = {(s.kind, s.name): s for s in db.summaries()}
+    assert not any(kind == "process" for kind, _ in items)
+    assert items[("test", "bad")].failures == 1
+    assert ("test", "ok") in items
+    assert ("hook", "build pre: true") in items
+    assert ("command", "skipped") not in items
+
+
+def test_flush_defers_database_writes(tmp_path, recorder):
+    timings.record("command", "build", 1.0, 0)
+    recorder.flush()
+    db_path = timings_path(tmp_path)
+    assert not db_path.exists()
+    assert journal_path(db_path).exists()
+    assert has_timings(tmp_path)
+
+    with TimingDB(db_path) as db:
+        assert [s.seconds for s in db.samples()[("command", "build")]] == [1.0]
+    assert journal_path(db_path).read_text() == ""
+    with TimingDB(db_path) as db:
+        assert len(db.samples()[("command", "build")]) == 1
+
+
+def test_flush_folds_large_journal(tmp_path, recorder, monkeypatch):
+    monkeypatch.setattr(timings, "MAX_PENDING_BYTES", 10)
+    timings.record("command", "build", 1.0, 0)
+    recorder.flush()
+    assert timings_path(tmp_path).exists()
+    assert journal_path(timings_path(tmp_path)).read_text() == ""
+
+
+def test_torn_journal_lines_are_skipped(tmp_path):
+    db_path = tmp_path / "t.sqlite"
+    journal_path(db_path).write_text('["test", "a", 1.0, 0, 5.0]\n["test", "b"\n')
+    with TimingDB(db_path) as db:
+        assert list(db.samples()) == [("test", "a")]
+
+
+def test_run_parallel_starts_slowest_first(tmp_path, recorder, mocker):
+    with TimingDB(timings_path(tmp_path)) as db:
+        db.add([Sample("test", "quick", 0.1, 0), Sample("test", "slow", 9.0, 0)])
+    graph = mocker.spy(runner, "run_graph")
+    tasks = [Task(name, ["true"]) for name in ["quick", "new", "slow"]]
+
+    results = run_parallel(tasks, cwd=tmp_path, jobs=2, kind="test")
+    assert [n.name for n in graph.call_args.args[0]] == ["new", "slow", "quick"]
+    assert [r.name for r in results] == ["quick", "new", "slow"]
+    assert all(r.ok and r.duration > 0 for r in results)
+
+    # A single worker keeps the given order
+    run_parallel(tasks, cwd=tmp_path, jobs=1, kind="test")
+    assert [n.name for n in graph.call_args.args[0]] == ["quick", "new", "slow"]
+
+
+def test_db_last_failed_and_started(tmp_path):
+    with TimingDB(tmp_path / "t.sqlite") as db:
+        assert db.last_started("command", "test") is None
+        db.add([
+            Sample("test", "fixed", 1.0, 1, 10.0), Sample("test", "fixed", 1.0, 0, 20.0),
+            Sample("test", "broken", 1.0, 0, 10.0), Sample("test", "broken", 1.0, 2, 20.0),
+            Sample("command", "test", 5.0, 1, 30.0), Sample("command", "test", 5.0, 0, 40.0),
+        ])
+        assert db.last_failed("test") == {"broken"}
+        assert db.last_started("command", "test") == 40.0
@@ -0,0 +1,80 @@
+import time
+
+from pkg.tools.base import (
+    TRASH_DIR,
+    CleanPatterns,
+    ToolOptions,
+    delete_paths,
+    find_clean_targets,
+    move_to_trash,
+)
+from pkg.tools.uv import UvTool
+
+
+def make_tree(root, paths):
+    for rel in paths:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+
+
+def test_clean_patterns_matcher():
+    patterns = CleanPatterns(["dist", "*.egg-info", "**/__pycache__"])
+    assert patterns.recursive
+    assert patterns.matches("dist", top_level=True)
+    assert not patterns.matches("dist", top_level=False)
+    assert patterns.matches("app.egg-info", top_level=True)
+    assert patterns.matches("__pycache__", top_level=False)
+    assert patterns.matches("__pycache__", top_level=True)
+    assert not CleanPatterns([]).matches("dist", top_level=True)
+
+
+def test_find_clean_targets_recursive_and_pruned(tmp_path):
+    make_tree(tmp_path, [
+        "dist/app.whl",
+        "src/app/__pycache__/mod.pyc",
+        "src/app/__pycache__/__pycache__/nested.pyc",
+        "src/app/main.py",
+        "src/dist/keep.txt",
+        ".git/objects/__pycache__/x",
+    ])
+    targets = find_clean_targets(tmp_path, ["dist", "**/__pycache__"])
+    assert targets == [tmp_path / "dist", tmp_path / "src" / "app" / "__pycache__"]
+
+
+def test_find_clean_targets_top_level_only(tmp_path):
+    make_tree(tmp_path, ["build/out", "sub/build/out"])
+    assert find_clean_targets(tmp_path, ["build"]) == [tmp_path / "build"]
+
+
+def test_delete_paths(tmp_path):
+    make_tree(tmp_path, ["tree/a/b/c.txt", "tree/d.txt", "file.txt", "target/x"])
+    (tmp_path / "link").symlink_to(tmp_path / "target")
+    delete_paths([tmp_path / "tree", tmp_path / "file.txt", tmp_path / "link"])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["target"]
+
+
+def test_move_to_trash_reports_stuck_paths(tmp_path, mocker):
+    make_tree(tmp_path, ["a/x", "b/x"])
+    assert move_to_trash(tmp_path, [tmp_path / "a"]) == []
+    assert not (tmp_path / "a").exists()
+    [batch] = (tmp_path / TRASH_DIR).iterdir()
+    assert (batch / "0-a" / "x").exists()
+
+    mocker.patch("pkg.tools.base.os.rename", side_effect=OSError(18, "cross-device"))
+    assert move_to_trash(tmp_path, [tmp_path / "b"]) == [tmp_path / "b"]
+
+
+def test_fast_clean_deletes_in_background(tmp_path, capsys):
+    make_tree(tmp_path, [".venv/lib/site.py", "src/pkg/__pycache__/a.pyc"])
+    tool = UvTool(tmp_path, ToolOptions(fast_clean=True))
+
+    assert tool.clean() == 0
+    assert not (tmp_path / ".venv").exists()
+    assert not (tmp_path / "src" / "pkg" / "__pycache__").exists()
+    assert "deleting in the background" in capsys.readouterr().out
+
+    deadline = time.monotonic() + 10
+    while (tmp_path / TRASH_DIR).exists():
+        assert time.monotonic() < deadline, "trash was not purged"
+        time.sleep(0.05)
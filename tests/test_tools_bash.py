@@ -3,6 +3,7 @@ from pathlib import Path
 from unittest.mock import patch
 
 from pkg.tools.bash import BashTool, BIN_DIR
+from pkg.tools.base import ToolOptions
 
 
 def test_bash_tool_name(tmp_path):
@@ -126,6 +127,23 @@ def test_bash_tool_build_aborts_on_test_failure(tmp_path, mocker):
     assert result == 1
 
 
+def test_bash_tool_build_fail_fast_reports_failed_test_stage(tmp_path, mocker, capsys):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "tool.sh").write_text("echo tool\n")
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "a_test.sh").write_text("exit 1\n")
+    (tmp_path / "tests" / "b_test.sh").write_text("sleep 5\n")
+    fake_bin = tmp_path / "fake_bin"
+    mocker.patch("pkg.tools.bash.BIN_DIR", fake_bin)
+
+    tool = BashTool(tmp_path, ToolOptions(jobs=2, fail_fast=True))
+    assert tool.build() == 1
+    out = capsys.readouterr().out
+    assert "test  failed" in out
+    assert "Build failed: test; nothing was published" in out
+    assert not fake_bin.exists()
+
+
 def test_bash_tool_build_no_src_dir(tmp_path, mocker):
     tool = BashTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=0)
@@ -252,3 +270,71 @@ def test_bash_tool_uplift_idempotent(tmp_path):
     tool.uplift()
     tool.uplift()
     assert (tmp_path / ".gitignore").read_text() == "existing"
+
+
+def test_bash_tool_build_outputs(tmp_path, mocker):
+    fake_bin = tmp_path / "fake_bin"
+    mocker.patch("pkg.tools.bash.BIN_DIR", fake_bin)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.sh").write_text("")
+    tool = BashTool(tmp_path)
+    assert tool.build_outputs() == [fake_bin / "a.sh"]
+
+
+def _write_tests(test_dir, count, body="exit 0"):
+    test_dir.mkdir(exist_ok=True)
+    for i in range(count):
+        t = test_dir / f"t{i}_test.sh"
+        t.write_text(f"#!/usr/bin/env bash\n{body}\n")
+
+
+def test_bash_tool_test_parallel(tmp_path):
+    _write_tests(tmp_path / "tests", 4, "sleep 0.2")
+    tool = BashTool(tmp_path, ToolOptions(jobs=4))
+    assert tool.test() == 0
+
+
+def test_bash_tool_test_parallel_failure(tmp_path):
+    _write_tests(tmp_path / "tests", 3)
+    (tmp_path / "tests" / "z_test.sh").write_text("exit 1\n")
+    tool = BashTool(tmp_path, ToolOptions(jobs=2))
+    assert tool.test() == 1
+
+
+def test_bash_tool_test_fail_fast(tmp_path, capsys):
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "a_test.sh").write_text("exit 1\n")
+    (tmp_path / "tests" / "b_test.sh").write_text("exit 0\n")
+    tool = BashTool(tmp_path, ToolOptions(fail_fast=True))
+    assert tool.test() == 1
+    assert "1 skipped" in capsys.readouterr().out
+
+
+def test_bash_affected_tests(tmp_path):
+    (tmp_path / "src").mkdir()
+    tests = tmp_path / "tests"
+    tests.mkdir()
+    (tests / "hello_test.sh").write_text("bash src/hello.sh\n")
+    (tests / "util_test.sh").write_text("bash src/other.sh\n")
+    (tests / "uses_util_test.sh").write_text("source src/util.sh\n")
+    tool = BashTool(tmp_path)
+
+    tasks = tool.affected_tests([tmp_path / "src" / "util.sh"])
+    assert [t.name for t in tasks] == ["uses_util_test.sh", "util_test.sh"]
+
+    tasks = tool.affected_tests([tests / "hello_test.sh"])
+    assert tasks[0].args == ["bash", str(tests / "hello_test.sh")]
+
+    assert tool.affected_tests([tmp_path / "README.md"]) == []
+
+
+def test_bash_tool_test_units(tmp_path):
+    tool = BashTool(tmp_path)
+    assert tool.test_units() == []
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "b_test.sh").write_text("exit 0\n")
+    (tmp_path / "tests" / "a_test.sh").write_text("exit 1\n")
+    assert tool.test_units() == ["a_test.sh", "b_test.sh"]
+    assert tool.test_unit_path("a_test.sh") == tmp_path / "tests" / "a_test.sh"
+    assert tool.run_tests(["b_test.sh"]) == 0
+    assert tool.run_tests(["a_test.sh", "b_test.sh"]) == 1
@@ -66,15 +66,16 @@ def test_bun_tool_create_gitignore_skips_existing(tmp_path):
 def test_build_runs_tests_first(tmp_path, mocker):
     tool = BunTool(tmp_path)
     mock_test = mocker.patch.object(tool, "test", return_value=0)
-    mocker.patch("pkg.tools.bun.run_command", return_value=0)
-    tool.build()
+    mock_run = mocker.patch("pkg.pipeline.run_process", return_value=0)
+    assert tool.build() == 0
     mock_test.assert_called_once()
+    assert mock_run.call_args.args[0] == ["bun", "run", "build"]
 
 
 def test_build_aborts_on_test_failure(tmp_path, mocker):
     tool = BunTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=1)
-    mock_run = mocker.patch("pkg.tools.bun.run_command")
+    mock_run = mocker.patch("pkg.pipeline.run_process")
     result = tool.build()
     assert result == 1
     mock_run.assert_not_called()
@@ -85,7 +86,7 @@ def test_bun_tool_test(tmp_path, mocker):
     mock_run = mocker.patch("pkg.tools.bun.run_command", return_value=0)
     result = tool.test()
     assert result == 0
-    mock_run.assert_called_once_with(["bun", "test", "--coverage"], cwd=tmp_path)
+    mock_run.assert_called_once_with(["bun", "test", "--coverage"], cwd=tmp_path, timeout=None)
 
 
 def test_bun_tool_install(tmp_path, mocker):
@@ -181,3 +182,35 @@ def test_bun_tool_uplift_idempotent(tmp_path):
     tool.uplift()
     tool.uplift()
     assert (tmp_path / ".gitignore").read_text() == "existing"
+
+
+def test_bun_tool_test_units(tmp_path, mocker):
+    tool = BunTool(tmp_path)
+    for rel in ["src/a.test.ts", "src/b_spec.jsx", "src/c.ts", "node_modules/dep/x.test.js", "d.spec.mjs",
+                "packages/web/node_modules/dep/y.test.js"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("")
+    assert tool.test_units() == ["d.spec.mjs", "src/a.test.ts", "src/b_spec.jsx"]
+    assert tool.test_unit_path("src/a.test.ts") == tmp_path / "src" / "a.test.ts"
+
+    mock_run = mocker.patch("pkg.tools.bun.run_command", return_value=0)
+    assert tool.run_tests(["src/a.test.ts"]) == 0
+    mock_run.assert_called_once_with(["bun", "test", "--coverage", "./src/a.test.ts"], cwd=tmp_path, timeout=None)
+
+
+def test_bun_tool_test_fail_fast(tmp_path, mocker):
+    from pkg.tools.base import ToolOptions
+
+    tool = BunTool(tmp_path, ToolOptions(fail_fast=True))
+    mock_run = mocker.patch("pkg.tools.bun.run_command", return_value=1)
+    assert tool.test() == 1
+    mock_run.assert_called_once_with(["bun", "test", "--coverage", "--bail"], cwd=tmp_path, timeout=None)
+
+
+def test_bun_tool_test_without_coverage(tmp_path, mocker):
+    from pkg.tools.base import ToolOptions
+
+    tool = BunTool(tmp_path, ToolOptions(coverage=False))
+    mock_run = mocker.patch("pkg.tools.bun.run_command", return_value=0)
+    assert tool.test() == 0
+    mock_run.assert_called_once_with(["bun", "test"], cwd=tmp_path, timeout=None)
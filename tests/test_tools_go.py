@@ -1,5 +1,8 @@
 import pytest
 from pathlib import Path
+from pkg import pipeline
+from pkg.runner import Task
+from pkg.tools.base import ToolOptions
 from pkg.tools.go import GoTool, CLEAN_PATTERNS
 
 
@@ -107,106 +110,145 @@ def test_go_tool_create_main_go_skips_existing(tmp_path):
     assert (entry_dir / "main.go").read_text() == "existing"
 
 
-def test_build_runs_vet_then_tests(tmp_path, mocker):
+def _fake_stages(codes=None):
+    """A run_process double: go build writes its binary, codes maps a command to its exit code."""
+    codes = codes or {}
+
+    def run(args, cwd, **kwargs):
+        if args[:2] == ["go", "build"]:
+            Path(args[3]).write_text("binary")
+        return codes.get(" ".join(args[:2]) if args[1] == "vet" else args[-1], 0)
+
+    return run
+
+
+@pytest.fixture
+def mock_stages(mocker):
+    return mocker.patch("pkg.pipeline.run_process", side_effect=_fake_stages())
+
+
+def test_build_runs_vet_and_tests(tmp_path, mocker, mock_stages):
     (tmp_path / "cmd" / "myapp").mkdir(parents=True)
     tool = GoTool(tmp_path)
     mock_test = mocker.patch.object(tool, "test", return_value=0)
-    mock_run = mocker.patch("pkg.tools.go.run_command", return_value=0)
-    tool.build()
-    mock_run.assert_any_call(["go", "vet", "./..."], cwd=tmp_path)
+    assert tool.build() == 0
+    assert mock_stages.call_args_list[0].args[0] == ["go", "vet", "./..."]
     mock_test.assert_called_once()
 
 
-def test_build_creates_build_dir(tmp_path, mocker):
+def test_build_creates_build_dir(tmp_path, mocker, mock_stages):
     (tmp_path / "cmd" / "myapp").mkdir(parents=True)
     tool = GoTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=0)
-    mocker.patch("pkg.tools.go.run_command", return_value=0)
     tool.build()
     assert (tmp_path / "build").is_dir()
+    assert not (tmp_path / "build" / ".staging").exists()
 
 
-def test_build_single_entrypoint(tmp_path, mocker):
+def test_build_single_entrypoint(tmp_path, mocker, mock_stages):
     (tmp_path / "cmd" / "myapp").mkdir(parents=True)
     tool = GoTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=0)
-    mock_run = mocker.patch("pkg.tools.go.run_command", return_value=0)
     tool.build()
-    expected_output = str(tmp_path / "build" / "myapp")
-    calls = mock_run.call_args_list
-    assert calls[0] == mocker.call(["go", "vet", "./..."], cwd=tmp_path)
-    assert calls[1] == mocker.call(
-        ["go", "build", "-o", expected_output, "./cmd/myapp"],
-        cwd=tmp_path,
-    )
+    staged = str(tmp_path / "build" / ".staging" / "myapp")
+    assert mock_stages.call_args_list[1].args[0] == ["go", "build", "-o", staged, "./cmd/myapp"]
+    assert (tmp_path / "build" / "myapp").read_text() == "binary"
 
 
-def test_build_multiple_entrypoints(tmp_path, mocker):
+def test_build_multiple_entrypoints(tmp_path, mocker, mock_stages, capsys):
     (tmp_path / "cmd" / "api").mkdir(parents=True)
     (tmp_path / "cmd" / "worker").mkdir(parents=True)
-    tool = GoTool(tmp_path)
+    tool = GoTool(tmp_path, ToolOptions(timeout=30))
     mocker.patch.object(tool, "test", return_value=0)
-    mock_run = mocker.patch("pkg.tools.go.run_command", return_value=0)
     result = tool.build()
     assert result == 0
-    calls = mock_run.call_args_list
-    assert calls[0] == mocker.call(["go", "vet", "./..."], cwd=tmp_path)
-    assert calls[1] == mocker.call(
-        ["go", "build", "-o", str(tmp_path / "build" / "api"), "./cmd/api"],
-        cwd=tmp_path,
-    )
-    assert calls[2] == mocker.call(
-        ["go", "build", "-o", str(tmp_path / "build" / "worker"), "./cmd/worker"],
-        cwd=tmp_path,
-    )
+    assert sorted(p.name for p in (tmp_path / "build").iterdir()) == ["api", "worker"]
+    assert all(call.kwargs["timeout"] == 30 for call in mock_stages.call_args_list)
+    out = capsys.readouterr().out
+    assert "build worker" in out
+    assert "Built: api, worker" in out
+
+
+def test_build_limits_stages_to_jobs(tmp_path, mocker, mock_stages):
+    (tmp_path / "cmd" / "api").mkdir(parents=True)
+    graph = mocker.spy(pipeline, "run_graph")
+    tool = GoTool(tmp_path, ToolOptions(jobs=2))
+    mocker.patch.object(tool, "test", return_value=0)
+    assert tool.build() == 0
+    assert graph.call_args.kwargs["jobs"] == 2
 
 
 def test_build_fails_with_no_entrypoints(tmp_path, mocker):
     (tmp_path / "cmd").mkdir()
     tool = GoTool(tmp_path)
-    mocker.patch.object(tool, "test", return_value=0)
-    mocker.patch("pkg.tools.go.run_command", return_value=0)
+    mock_test = mocker.patch.object(tool, "test", return_value=0)
     result = tool.build()
     assert result == 1
+    mock_test.assert_not_called()
 
 
 def test_build_fails_without_cmd_dir(tmp_path, mocker):
     tool = GoTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=0)
-    mocker.patch("pkg.tools.go.run_command", return_value=0)
     result = tool.build()
     assert result == 1
 
 
-def test_build_stops_on_first_entrypoint_failure(tmp_path, mocker):
+def test_build_reports_failed_entrypoints(tmp_path, mocker, capsys):
     (tmp_path / "cmd" / "api").mkdir(parents=True)
     (tmp_path / "cmd" / "worker").mkdir(parents=True)
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "api").write_text("previous")
     tool = GoTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=0)
-    # vet succeeds, first build fails
-    mock_run = mocker.patch("pkg.tools.go.run_command", side_effect=[0, 1])
-    result = tool.build()
-    assert result == 1
-    assert mock_run.call_count == 2
+    mocker.patch("pkg.pipeline.run_process", side_effect=_fake_stages({"./cmd/api": 2}))
+    assert tool.build() == 2
+    assert "Build failed: build api; nothing was published" in capsys.readouterr().out
+    assert sorted(p.name for p in (tmp_path / "build").iterdir()) == ["api"]
+    assert (tmp_path / "build" / "api").read_text() == "previous"
+
+
+def test_build_collects_all_entrypoint_failures(tmp_path, mocker, capsys):
+    for name in ["api", "cli", "worker"]:
+        (tmp_path / "cmd" / name).mkdir(parents=True)
+    tool = GoTool(tmp_path, ToolOptions(jobs=1))
+    mocker.patch.object(tool, "test", return_value=0)
+    codes = {"./cmd/api": 2, "./cmd/worker": 1}
+    mocker.patch("pkg.pipeline.run_process", side_effect=_fake_stages(codes))
+    assert tool.build() == 2
+    out = capsys.readouterr().out
+    assert "build cli     passed" in out
+    assert "Build failed: build api, build worker; nothing was published" in out
+    assert not (tmp_path / "build" / "cli").exists()
+
+
+def test_build_fail_fast_cancels_remaining_entrypoints(tmp_path, mocker, capsys):
+    (tmp_path / "cmd" / "api").mkdir(parents=True)
+    (tmp_path / "cmd" / "worker").mkdir(parents=True)
+    tool = GoTool(tmp_path, ToolOptions(jobs=1, fail_fast=True))
+    mocker.patch.object(tool, "test", return_value=0)
+    mocker.patch("pkg.pipeline.run_process", side_effect=_fake_stages({"./cmd/api": 1}))
+    assert tool.build() == 1
+    out = capsys.readouterr().out
+    assert "build worker  cancelled" in out
+    assert "Build failed: build api; nothing was published" in out
 
 
-def test_build_aborts_on_vet_failure(tmp_path, mocker):
+def test_build_fails_on_vet_failure(tmp_path, mocker):
     (tmp_path / "cmd" / "myapp").mkdir(parents=True)
     tool = GoTool(tmp_path)
-    mock_test = mocker.patch.object(tool, "test", return_value=0)
-    mocker.patch("pkg.tools.go.run_command", return_value=1)
-    result = tool.build()
-    assert result == 1
-    mock_test.assert_not_called()
+    mocker.patch.object(tool, "test", return_value=0)
+    mocker.patch("pkg.pipeline.run_process", side_effect=_fake_stages({"go vet": 1}))
+    assert tool.build() == 1
+    assert not (tmp_path / "build" / "myapp").exists()
 
 
-def test_build_aborts_on_test_failure(tmp_path, mocker):
+def test_build_fails_on_test_failure(tmp_path, mocker, mock_stages):
+    (tmp_path / "cmd" / "myapp").mkdir(parents=True)
     tool = GoTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=1)
-    # vet passes, but tests fail
-    mocker.patch("pkg.tools.go.run_command", return_value=0)
-    result = tool.build()
-    assert result == 1
+    assert tool.build() == 1
+    assert not (tmp_path / "build" / "myapp").exists()
 
 
 def test_go_tool_test(tmp_path, mocker):
@@ -214,7 +256,7 @@ def test_go_tool_test(tmp_path, mocker):
     mock_run = mocker.patch("pkg.tools.go.run_command", return_value=0)
     result = tool.test()
     assert result == 0
-    mock_run.assert_called_once_with(["go", "test", "-cover", "./..."], cwd=tmp_path)
+    mock_run.assert_called_once_with(["go", "test", "-cover", "./..."], cwd=tmp_path, on_line=mocker.ANY, timeout=None)
 
 
 def test_go_tool_install(tmp_path, mocker):
@@ -286,3 +328,134 @@ def test_go_tool_uplift_idempotent(tmp_path):
     tool.uplift()
     tool.uplift()
     assert (tmp_path / ".gitignore").read_text() == "existing"
+
+
+def write_go_module(root):
+    (root / "go.mod").write_text("module example.com/app\n\ngo 1.22\n")
+    for rel, source in {
+        "cmd/app/main.go": 'package main\n\nimport (\n\t"fmt"\n\t"example.com/app/internal/server"\n)\n',
+        "internal/server/server.go": 'package server\n\nimport "example.com/app/pkg/util"\n',
+        "pkg/util/util.go": 'package util\n\nimport "strings"\n',
+        "pkg/other/other.go": "package other\n",
+    }.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+
+
+def test_go_affected_tests_includes_importers(tmp_path):
+    write_go_module(tmp_path)
+    tool = GoTool(tmp_path)
+
+    tasks = tool.affected_tests([tmp_path / "pkg" / "util" / "util.go"])
+    assert tasks == [Task("go test", [
+        "go", "test", "-cover", "./cmd/app", "./internal/server", "./pkg/util",
+    ])]
+
+    tasks = tool.affected_tests([tmp_path / "pkg" / "other" / "other_test.go"])
+    assert tasks[0].args[3:] == ["./pkg/other"]
+
+
+def test_go_affected_tests_follow_test_options(tmp_path):
+    write_go_module(tmp_path)
+    tool = GoTool(tmp_path, ToolOptions(coverage=False, fail_fast=True))
+    tasks = tool.affected_tests([tmp_path / "pkg" / "other" / "other.go"])
+    assert tasks == [Task("go test", ["go", "test", "-failfast", "./pkg/other"])]
+
+
+def test_go_affected_tests_module_files_run_everything(tmp_path):
+    write_go_module(tmp_path)
+    tool = GoTool(tmp_path)
+    assert tool.affected_tests([tmp_path / "go.sum"]) is None
+    assert tool.affected_tests([tmp_path / "README.md"]) == []
+
+
+def test_go_install_state_lists_external_imports(tmp_path):
+    write_go_module(tmp_path)
+    (tmp_path / "pkg" / "util" / "util.go").write_text(
+        'package util\n\nimport (\n\t"strings"\n\t"github.com/google/uuid"\n)\n'
+    )
+    tool = GoTool(tmp_path)
+    assert tool.install_inputs() == [tmp_path / "go.mod", tmp_path / "go.sum"]
+    assert tool.install_state() == ["import:github.com/google/uuid"]
+
+
+def test_go_install_environment(tmp_path, monkeypatch):
+    from pkg.tools.go import module_cache_dir
+
+    tool = GoTool(tmp_path)
+    assert tool.install_environment() == []
+
+    (tmp_path / "go.sum").write_text("github.com/google/uuid v1.6.0 h1:x\n")
+    monkeypatch.setenv("GOMODCACHE", str(tmp_path / "modcache"))
+    assert tool.install_environment() == [tmp_path / "modcache"]
+
+    monkeypatch.delenv("GOMODCACHE")
+    monkeypatch.setenv("GOPATH", str(tmp_path / "gopath"))
+    assert module_cache_dir() == tmp_path / "gopath" / "pkg" / "mod"
+    monkeypatch.delenv("GOPATH")
+    assert module_cache_dir() == Path.home() / "go" / "pkg" / "mod"
+
+
+def test_go_tool_run_tests_records_packages(tmp_path, mocker):
+    from pkg import timings
+
+    tool = GoTool(tmp_path)
+
+    def fake_run(args, cwd, on_line, timeout):
+        for line in ["ok  \texample.com/app/a\t0.250s\tcoverage: 80.0% of statements\n",
+                     "FAIL\texample.com/app/b\t1.500s\n",
+                     "ok  \texample.com/app/c\t(cached)\n"]:
+            on_line(line)
+        return 1
+
+    mock_run = mocker.patch("pkg.tools.go.run_command", side_effect=fake_run)
+    recorder = timings.enable(tmp_path)
+    try:
+        assert tool.run_tests(["example.com/app/a", "example.com/app/b"]) == 1
+    finally:
+        timings.disable()
+    assert mock_run.call_args.args[0] == ["go", "test", "-cover", "example.com/app/a", "example.com/app/b"]
+    assert [(s.name, s.seconds, s.returncode) for s in recorder.samples] == [
+        ("example.com/app/a", 0.25, 0), ("example.com/app/b", 1.5, 1),
+    ]
+
+
+def test_go_tool_test_units(tmp_path, mocker):
+    import subprocess
+
+    tool = GoTool(tmp_path)
+    (tmp_path / "go.mod").write_text("module example.com/app\n")
+    run = mocker.patch("pkg.tools.go.subprocess.run", return_value=subprocess.CompletedProcess(
+        [], 0, stdout="example.com/app\nexample.com/app/pkg/util\n", stderr=""))
+    assert tool.test_units() == ["example.com/app", "example.com/app/pkg/util"]
+    assert run.call_args.args[0] == ["go", "list", "./..."]
+    assert tool.test_unit_path("example.com/app") == tmp_path
+    assert tool.test_unit_path("example.com/app/pkg/util") == tmp_path / "pkg" / "util"
+    assert tool.test_unit_path("example.com/other") is None
+
+    run.return_value = subprocess.CompletedProcess([], 1, stdout="", stderr="no go.mod")
+    assert tool.test_units() is None
+    run.side_effect = FileNotFoundError("go")
+    assert tool.test_units() is None
+
+
+def test_go_tool_fail_fast_stops_at_failing_package(tmp_path, mocker):
+    tool = GoTool(tmp_path, ToolOptions(fail_fast=True))
+    stops = []
+
+    def fake_run(args, cwd, on_line, timeout):
+        stops.extend(on_line(line) for line in ["ok  \ta\t0.1s\n", "FAIL\tb\t0.2s\n", "--- FAIL: TestX\n"])
+        return 1
+
+    mock_run = mocker.patch("pkg.tools.go.run_command", side_effect=fake_run)
+    assert tool.run_tests(["./..."]) == 1
+    assert mock_run.call_args.args[0] == ["go", "test", "-cover", "-failfast", "./..."]
+    assert stops == [False, True, False]
+
+
+def test_go_tool_test_without_coverage(tmp_path, mocker):
+    tool = GoTool(tmp_path, ToolOptions(coverage=False))
+    mock_run = mocker.patch("pkg.tools.go.run_command", return_value=0)
+    assert tool.test() == 0
+    assert mock_run.call_args.args[0] == ["go", "test", "./..."]
@@ -15,3 +15,8 @@ def test_get_tool_unknown():
 
 def test_tools_registry():
     assert "uv" in TOOLS
+
+
+def test_get_tool_all_registered():
+    for name in TOOLS:
+        assert get_tool(name)(None).name == name
@@ -15,7 +15,7 @@ def test_uv_tool_project_dir(tmp_path):
 
 def test_clean_patterns_exist():
     assert ".venv" in CLEAN_PATTERNS
-    assert "__pycache__" in CLEAN_PATTERNS
+    assert "**/__pycache__" in CLEAN_PATTERNS
     assert "dist" in CLEAN_PATTERNS
 
 
@@ -45,21 +45,32 @@ def test_uv_tool_create_gitignore(tmp_path):
     assert "__pycache__/" in content
 
 
-def test_build_runs_tests_first(tmp_path, mocker):
+def fake_uv_build(args, cwd, **kwargs):
+    out_dir = Path(args[args.index("--out-dir") + 1])
+    (out_dir / "app-0.1.0-py3-none-any.whl").write_text("wheel")
+    return 0
+
+
+def test_build_runs_tests_alongside_and_publishes(tmp_path, mocker):
     tool = UvTool(tmp_path)
     mock_test = mocker.patch.object(tool, "test", return_value=0)
-    mocker.patch("pkg.tools.uv.run_command", return_value=0)
-    tool.build()
+    mocker.patch("pkg.pipeline.run_process", side_effect=fake_uv_build)
+    (tmp_path / "dist").mkdir()
+    (tmp_path / "dist" / "app-0.1.0-py3-none-any.whl").write_text("old")
+    assert tool.build() == 0
     mock_test.assert_called_once()
+    assert (tmp_path / "dist" / "app-0.1.0-py3-none-any.whl").read_text() == "wheel"
+    assert sorted(p.name for p in (tmp_path / "dist").iterdir()) == ["app-0.1.0-py3-none-any.whl"]
 
 
-def test_build_aborts_on_test_failure(tmp_path, mocker):
+def test_build_publishes_nothing_on_test_failure(tmp_path, mocker):
     tool = UvTool(tmp_path)
     mocker.patch.object(tool, "test", return_value=1)
-    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    mock_run = mocker.patch("pkg.pipeline.run_process", side_effect=fake_uv_build)
     result = tool.build()
     assert result == 1
     mock_run.assert_called_once()
+    assert list((tmp_path / "dist").iterdir()) == []
 
 
 def test_uv_tool_test(tmp_path, mocker):
@@ -67,7 +78,11 @@ def test_uv_tool_test(tmp_path, mocker):
     mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
     result = tool.test()
     assert result == 0
-    mock_run.assert_called_once_with(["uv", "run", "pytest"], cwd=tmp_path)
+    mock_run.assert_called_once_with(["uv", "run", "pytest", "--ff", "--nf"], cwd=tmp_path, timeout=None)
+
+    tool.options.fail_fast = True
+    tool.test()
+    assert mock_run.call_args.args[0] == ["uv", "run", "pytest", "--ff", "--nf", "-x"]
 
 
 def test_uv_tool_install(tmp_path, mocker):
@@ -164,3 +179,171 @@ def test_uv_tool_uplift_idempotent(tmp_path):
     tool.uplift()
     tool.uplift()
     assert (tmp_path / ".gitignore").read_text() == "existing"
+
+
+def test_uv_affected_tests(tmp_path):
+    src = tmp_path / "src" / "app"
+    src.mkdir(parents=True)
+    tests = tmp_path / "tests"
+    tests.mkdir()
+    (tests / "test_parser.py").write_text("def test_x(): pass\n")
+    (tests / "test_cli.py").write_text("from app.parser import parse\n")
+    (tests / "test_other.py").write_text("import os\n")
+    tool = UvTool(tmp_path)
+
+    tasks = tool.affected_tests([src / "parser.py"])
+    assert tasks[0].args == ["uv", "run", "pytest", "tests/test_cli.py", "tests/test_parser.py"]
+
+    tasks = tool.affected_tests([tests / "test_other.py"])
+    assert tasks[0].args[3:] == ["tests/test_other.py"]
+
+    assert tool.affected_tests([tmp_path / "README.md"]) == []
+    assert tool.affected_tests([tmp_path / "uv.lock"]) is None
+
+
+def test_uv_affected_tests_skip_coverage_gate(tmp_path):
+    tests = tmp_path / "tests"
+    tests.mkdir()
+    (tests / "test_parser.py").write_text("def test_x(): pass\n")
+    (tmp_path / "pyproject.toml").write_text('[tool.pytest.ini_options]\naddopts = "--cov=app --cov-fail-under=90"\n')
+    tasks = UvTool(tmp_path).affected_tests([tests / "test_parser.py"])
+    assert tasks[0].args == ["uv", "run", "pytest", "--no-cov", "tests/test_parser.py"]
+
+
+def test_uv_affected_tests_without_tests_dir(tmp_path):
+    assert UvTool(tmp_path).affected_tests([tmp_path / "main.py"]) is None
+
+
+def test_uv_install_fingerprint_inputs(tmp_path):
+    tool = UvTool(tmp_path)
+    assert tmp_path / "uv.lock" in tool.install_inputs()
+    assert tool.install_state() == ["python:missing"]
+
+    bin_dir = tmp_path / ".venv" / "bin"
+    bin_dir.mkdir(parents=True)
+    (tmp_path / "python3.12").write_text("")
+    (bin_dir / "python").symlink_to(tmp_path / "python3.12")
+    assert tool.install_state()[0].startswith(f"python:{tmp_path / 'python3.12'}:")
+    assert tool.install_environment() == [tmp_path / ".venv" / "pyvenv.cfg", bin_dir / "python"]
+
+
+def test_uv_tool_clean_nested_artifacts(tmp_path):
+    (tmp_path / "src" / "app" / "__pycache__").mkdir(parents=True)
+    (tmp_path / "src" / "app.egg-info").mkdir()
+    (tmp_path / "src" / "app" / "main.py").write_text("")
+    UvTool(tmp_path).clean()
+    assert not (tmp_path / "src" / "app" / "__pycache__").exists()
+    assert not (tmp_path / "src" / "app.egg-info").exists()
+    assert (tmp_path / "src" / "app" / "main.py").exists()
+
+
+def test_uv_tool_test_units(tmp_path, mocker):
+    import subprocess
+
+    tool = UvTool(tmp_path)
+    (tmp_path / "pyproject.toml").write_text('[tool.pytest.ini_options]\naddopts = "--cov=."\n')
+    output = "tests/test_a.py::test_one\ntests/test_a.py::TestX::test_two[1]\n\n2 tests collected in 0.01s\n"
+    run = mocker.patch("pkg.tools.uv.subprocess.run", return_value=subprocess.CompletedProcess([], 0, output, ""))
+    assert tool.test_units() == ["tests/test_a.py::test_one", "tests/test_a.py::TestX::test_two[1]"]
+    assert run.call_args.args[0] == ["uv", "run", "pytest", "--collect-only", "-q", "--no-cov"]
+    assert tool.test_unit_path("tests/test_a.py::test_one") == tmp_path / "tests" / "test_a.py"
+
+    run.return_value = subprocess.CompletedProcess([], 5, "no tests ran\n", "")
+    assert tool.test_units() == []
+    run.return_value = subprocess.CompletedProcess([], 2, "ImportError\n", "")
+    assert tool.test_units() is None
+    run.side_effect = FileNotFoundError("uv")
+    assert tool.test_units() is None
+
+
+def test_uv_tool_run_tests_records_junit_times(tmp_path, mocker):
+    from pkg import timings
+
+    tool = UvTool(tmp_path)
+    (tmp_path / "pyproject.toml").write_text('addopts = "--cov=. --cov-fail-under=90"\n')
+    units = ["tests/test_a.py::test_one", "tests/sub/test_b.py::TestX::test_two[1]"]
+
+    def fake_run(args, cwd, timeout, env):
+        report = next(a for a in args if a.startswith("--junitxml=")).split("=", 1)[1]
+        Path(report).write_text(
+            '<testsuites><testsuite>'
+            '<testcase classname="tests.test_a" name="test_one" time="0.5"/>'
+            '<testcase classname="tests.sub.test_b.TestX" name="test_two[1]" time="2.0"><failure/></testcase>'
+            '<testcase classname="tests.test_a" name="unknown" time="1"/>'
+            '</testsuite></testsuites>'
+        )
+        return 1
+
+    mock_run = mocker.patch("pkg.tools.uv.run_command", side_effect=fake_run)
+    recorder = timings.enable(tmp_path)
+    try:
+        assert tool.run_tests(units) == 1
+    finally:
+        timings.disable()
+    args = mock_run.call_args.args[0]
+    assert args[:5] == ["uv", "run", "pytest", "--ff", "--nf"]
+    assert args[6:] == ["--cov-fail-under=0", *units]
+    assert [(s.name, s.seconds, s.returncode) for s in recorder.samples] == [
+        (units[0], 0.5, 0), (units[1], 2.0, 1),
+    ]
+
+    mock_run.side_effect = None
+    mock_run.return_value = 2
+    assert tool.run_tests(units[:1]) == 2
+
+
+def test_uv_tool_run_tests_in_shard_work_dir(tmp_path, mocker):
+    from pkg.tools.base import ToolOptions
+
+    (tmp_path / "pyproject.toml").write_text('addopts = "--cov=. --cov-fail-under=90"\n')
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    work_dir = tmp_path / "shard-1"
+    tool = UvTool(tmp_path, ToolOptions(work_dir=work_dir))
+
+    tool.run_tests(["tests/test_a.py::test_one"])
+    args = mock_run.call_args.args[0]
+    assert f"--junitxml={work_dir / 'junit.xml'}" in args
+    assert "--cov-report=" in args
+    assert mock_run.call_args.kwargs["env"]["COVERAGE_FILE"] == str(work_dir / ".coverage")
+
+    tool.options.work_dir = None
+    tool.run_tests(["tests/test_a.py::test_one"])
+    assert "--cov-report=" not in mock_run.call_args.args[0]
+    assert mock_run.call_args.kwargs["env"] is None
+
+
+@pytest.mark.parametrize("config", [
+    ("pyproject.toml", '[tool.pytest.ini_options]\naddopts = "-p no:cacheprovider"\n'),
+    ("pytest.ini", "[pytest]\naddopts = -p no:cacheprovider\n"),
+])
+def test_uv_tool_test_without_cacheprovider(tmp_path, mocker, config):
+    name, text = config
+    (tmp_path / name).write_text(text)
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    UvTool(tmp_path).test()
+    assert mock_run.call_args.args[0] == ["uv", "run", "pytest"]
+
+
+def test_uv_tool_test_cacheprovider_disabled_by_env(tmp_path, mocker, monkeypatch):
+    monkeypatch.setenv("PYTEST_ADDOPTS", "-p no:cacheprovider")
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    UvTool(tmp_path).test()
+    assert "--ff" not in mock_run.call_args.args[0]
+
+
+def test_uv_tool_test_profiles(tmp_path, mocker):
+    from pkg.tools.base import ToolOptions
+
+    (tmp_path / "pyproject.toml").write_text('addopts = "--cov=. --cov-fail-under=90"\n')
+    mock_run = mocker.patch("pkg.tools.uv.run_command", return_value=0)
+    tool = UvTool(tmp_path, ToolOptions(coverage=False, parallel=True))
+
+    tool.test()
+    assert mock_run.call_args.args[0] == ["uv", "run", "pytest", "--ff", "--nf", "--no-cov"]
+
+    (tmp_path / "uv.lock").write_text('name = "pytest-xdist"\n')
+    tool.test()
+    assert mock_run.call_args.args[0][-3:] == ["--no-cov", "-n", "auto"]
+
+    tool.run_tests(["tests/test_a.py::test_one"])
+    assert "--cov-fail-under=0" not in mock_run.call_args.args[0]
@@ -0,0 +1,86 @@
+import json
+import threading
+
+import pytest
+from pkg import trace
+from pkg.runner import run_command, run_process
+
+
+@pytest.fixture
+def tracer():
+    tracer = trace.enable()
+    yield tracer
+    trace.disable()
+
+
+def _spans(tracer, cat=None):
+    return [e for e in tracer.events if e["ph"] == "X" and (cat is None or e["cat"] == cat)]
+
+
+def test_span_disabled_is_noop():
+    trace.disable()
+    with trace.span("noop", "pkg", a=1) as args:
+        args["b"] = 2
+
+
+def test_span_records_complete_event(tracer):
+    with trace.span("work", "pkg", key="value") as args:
+        args["extra"] = 1
+    (event,) = _spans(tracer)
+    assert event["name"] == "work"
+    assert event["cat"] == "pkg"
+    assert event["dur"] >= 0
+    assert event["args"] == {"key": "value", "extra": 1}
+
+
+def test_spans_from_threads_get_distinct_tids(tracer):
+    def work():
+        with trace.span("thread", "pkg"):
+            pass
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+    with trace.span("main", "pkg"):
+        pass
+    assert len({e["tid"] for e in _spans(tracer)}) == 2
+    assert sum(1 for e in tracer.events if e["name"] == "thread_name") == 2
+
+
+def test_write_chrome_trace(tracer, tmp_path):
+    with trace.span("work", "pkg"):
+        pass
+    out = tmp_path / "trace.json"
+    tracer.write(out)
+    data = json.loads(out.read_text())
+    assert data["traceEvents"][0]["name"] == "process_name"
+    assert any(e["name"] == "work" for e in data["traceEvents"])
+
+
+def test_run_command_span_has_rusage(tracer, tmp_path):
+    run_command(["true"], tmp_path)
+    (event,) = _spans(tracer, "process")
+    assert event["name"] == "true"
+    assert event["args"]["returncode"] == 0
+    assert {"cpu_user_s", "cpu_sys_s", "max_rss_kb"} <= event["args"].keys()
+
+
+def test_run_process_span_has_rusage(tracer, tmp_path):
+    run_process("exit 3", tmp_path, header="x", shell=True)
+    (event,) = _spans(tracer, "process")
+    assert event["args"]["returncode"] == 3
+    assert "max_rss_kb" in event["args"]
+
+
+def test_cli_trace_option(tmp_path, monkeypatch):
+    from click.testing import CliRunner
+    from pkg.cli import main
+
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "bash"\n[hooks.test]\npre = ["true"]\n')
+    monkeypatch.chdir(tmp_path)
+    out = tmp_path / "trace.json"
+    result = CliRunner().invoke(main, ["--trace", str(out), "test"])
+    trace.disable()
+    assert result.exit_code == 0
+    names = {e["name"] for e in json.loads(out.read_text())["traceEvents"]}
+    assert {"config.load", "plugins.load", "pre hooks", "pre hook true", "test"} <= names
@@ -0,0 +1,193 @@
+import sys
+import time
+
+import pytest
+from pkg.runner import Task
+from pkg.tools.bash import BashTool
+from pkg.tools.uv import UvTool
+from pkg.watch import (
+    IgnoreRules,
+    InotifyWatcher,
+    PollingWatcher,
+    WatchRun,
+    collect_changes,
+    make_watcher,
+    plan_tasks,
+    watch_project,
+)
+
+
+class FakeWatcher:
+    kind = "fake"
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.closed = False
+
+    def poll(self, timeout):
+        if not self.batches:
+            raise KeyboardInterrupt
+        batch = self.batches.pop(0)
+        if isinstance(batch, float):
+            time.sleep(batch)
+            return set()
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+def test_ignore_rules(tmp_path):
+    (tmp_path / ".gitignore").write_text("# comment\n*.log\n/out/\ndocs/build\n!keep.log\n")
+    rules = IgnoreRules.for_project(tmp_path, [".venv"])
+
+    assert rules.ignored(tmp_path / ".git" / "HEAD")
+    assert rules.ignored(tmp_path / ".venv" / "lib" / "x.py")
+    assert rules.ignored(tmp_path / "sub" / "debug.log")
+    assert rules.ignored(tmp_path / "out" / "a.txt")
+    assert rules.ignored(tmp_path / "docs" / "build" / "index.html")
+    assert not rules.ignored(tmp_path / "sub" / "out" / "a.txt")
+    assert not rules.ignored(tmp_path / "src" / "main.py")
+    assert rules.ignored(tmp_path.parent / "elsewhere.py")
+
+
+def test_ignore_rules_walk_prunes(tmp_path):
+    (tmp_path / "node_modules" / "dep").mkdir(parents=True)
+    (tmp_path / "node_modules" / "dep" / "index.js").write_text("")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.js").write_text("")
+    rules = IgnoreRules(tmp_path, ["node_modules"])
+
+    walked = [root for root, _, _ in rules.walk()]
+    assert str(tmp_path / "node_modules") not in walked
+    assert str(tmp_path / "src") in walked
+
+
+def test_polling_watcher(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "gone.txt").write_text("x")
+    watcher = PollingWatcher(IgnoreRules(tmp_path, ["*.log"]), interval=0.01)
+
+    assert watcher.poll(0.02) == set()
+
+    (tmp_path / "a.txt").write_text("changed")
+    (tmp_path / "b.txt").write_text("new")
+    (tmp_path / "gone.txt").unlink()
+    (tmp_path / "debug.log").write_text("ignored")
+    assert watcher.poll(None) == {tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "gone.txt"}
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_watcher(tmp_path):
+    (tmp_path / "build").mkdir()
+    watcher = InotifyWatcher(IgnoreRules(tmp_path, ["build"]))
+    try:
+        assert watcher.poll(0.01) == set()
+
+        (tmp_path / "main.py").write_text("x")
+        assert tmp_path / "main.py" in watcher.poll(1)
+
+        (tmp_path / "build" / "out.o").write_text("ignored")
+        assert watcher.poll(0.05) == set()
+
+        (tmp_path / "pkg").mkdir()
+        (tmp_path / "pkg" / "mod.py").write_text("x")
+        changed = collect_changes(watcher, 0.05)
+        assert tmp_path / "pkg" / "mod.py" in changed
+
+        (tmp_path / "pkg" / "mod.py").write_text("y")
+        assert tmp_path / "pkg" / "mod.py" in watcher.poll(1)
+    finally:
+        watcher.close()
+
+
+def test_make_watcher_falls_back_to_polling(tmp_path, mocker, capsys):
+    rules = IgnoreRules(tmp_path, [])
+    assert isinstance(make_watcher(rules, poll=True), PollingWatcher)
+
+    mocker.patch("pkg.watch.InotifyWatcher", side_effect=OSError(28, "no space"))
+    mocker.patch("pkg.watch.sys.platform", "linux")
+    assert isinstance(make_watcher(rules), PollingWatcher)
+    assert "polling instead" in capsys.readouterr().out
+
+
+def test_collect_changes_debounces(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    watcher = FakeWatcher([set(), {a}, {b}, set(), {tmp_path / "c"}])
+    assert collect_changes(watcher, 0.1) == {a, b}
+
+
+def test_plan_tasks(tmp_path, mocker):
+    tool = UvTool(tmp_path)
+    full = plan_tasks(tool, "build", {tmp_path / "x.py"})
+    assert full[0].args == [sys.executable, "-m", "pkg.cli", "build"]
+
+    assert plan_tasks(tool, "test", {tmp_path / "pkg.toml"})[0].name == "pkg test"
+
+    mocker.patch.object(UvTool, "affected_tests", return_value=None)
+    assert plan_tasks(tool, "test", {tmp_path / "x.py"})[0].name == "pkg test"
+
+    narrowed = [Task("pytest", ["uv", "run", "pytest", "tests/test_x.py"])]
+    mocker.patch.object(UvTool, "affected_tests", return_value=narrowed)
+    assert plan_tasks(tool, "test", {tmp_path / "x.py"}) == narrowed
+
+
+def test_watch_run_reports(tmp_path, capsys):
+    run = WatchRun(BashTool(tmp_path), [Task("ok", ["true"])]).start()
+    run.thread.join()
+    assert run.finished
+    assert "Passed: ok" in capsys.readouterr().out
+
+    run = WatchRun(BashTool(tmp_path), [Task("bad", ["false"])]).start()
+    run.thread.join()
+    assert "Failed: bad" in capsys.readouterr().out
+
+
+def test_watch_run_cancel(tmp_path):
+    run = WatchRun(BashTool(tmp_path), [Task("slow", ["sleep", "10"])]).start()
+    time.sleep(0.1)
+    start = time.monotonic()
+    run.cancel()
+    assert time.monotonic() - start < 5
+    assert not run.finished
+
+
+def test_watch_project_runs_affected_tests(tmp_path, mocker, capsys):
+    tests = tmp_path / "tests"
+    tests.mkdir()
+    (tests / "a_test.sh").write_text("exit 0\n")
+    watcher = FakeWatcher([{tests / "a_test.sh"}, set(), 0.5, {tmp_path / "notes.txt"}, set()])
+    mocker.patch("pkg.watch.make_watcher", return_value=watcher)
+
+    assert watch_project(BashTool(tmp_path), "test", debounce=0.01) == 0
+
+    out = capsys.readouterr().out
+    assert "Changed: tests/a_test.sh" in out
+    assert "Passed: a_test.sh" in out
+    assert "No tests affected" in out
+    assert "Stopped watching" in out
+    assert watcher.closed
+
+
+def test_watch_project_cancels_and_merges_pending(tmp_path, mocker, capsys):
+    tests = tmp_path / "tests"
+    tests.mkdir()
+    (tests / "slow_test.sh").write_text("sleep 10\n")
+    (tests / "fast_test.sh").write_text("exit 0\n")
+    watcher = FakeWatcher([
+        {tests / "slow_test.sh"}, set(), 0.2,
+        {tests / "fast_test.sh"}, set(),
+    ])
+    mocker.patch("pkg.watch.make_watcher", return_value=watcher)
+    started = []
+    real_start = WatchRun.start
+
+    def record(self):
+        started.append([t.name for t in self.tasks])
+        return real_start(self)
+
+    mocker.patch.object(WatchRun, "start", record)
+
+    assert watch_project(BashTool(tmp_path), "test", debounce=0.01) == 0
+    assert "cancelling the current run" in capsys.readouterr().out
+    assert started == [["slow_test.sh"], ["fast_test.sh", "slow_test.sh"]]
@@ -0,0 +1,248 @@
+import pytest
+from click.testing import CliRunner
+from pkg.cli import main
+from pkg.config import Config
+from pkg.scheduler import NodeResult
+from pkg.workspace import (
+    Member,
+    affected_members,
+    changed_files,
+    discover_members,
+    find_affected,
+    find_workspace_root,
+    member_graph,
+    owning_member,
+    print_results,
+    run_workspace,
+)
+
+
+def _member(root, name, tool="bash", depends_on=None, test_body=None):
+    path = root / name
+    path.mkdir(parents=True)
+    lines = ["[pkg]", f'tool = "{tool}"']
+    if depends_on:
+        lines.append(f"depends_on = {depends_on!r}".replace("'", '"'))
+    (path / "pkg.toml").write_text("\n".join(lines) + "\n")
+    if test_body is not None:
+        (path / "tests").mkdir()
+        (path / "tests" / "a_test.sh").write_text(test_body)
+    return path
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "pkg.toml").write_text('[workspace]\nmembers = ["libs/*", "apps/*"]\n')
+    return tmp_path
+
+
+def test_find_workspace_root_from_member(workspace):
+    member = _member(workspace, "libs/core")
+    assert find_workspace_root(member) == workspace
+
+
+def test_find_workspace_root_none(tmp_path):
+    (tmp_path / "pkg.toml").write_text('[pkg]\ntool = "uv"\n')
+    assert find_workspace_root(tmp_path) is None
+
+
+def test_discover_members(workspace):
+    _member(workspace, "libs/core")
+    _member(workspace, "apps/web", tool="bun")
+    (workspace / "libs" / "not-a-project").mkdir()
+    members = discover_members(workspace, Config.load(workspace))
+    assert [m.name for m in members] == ["libs/core", "apps/web"]
+    assert members[1].config.tool == "bun"
+
+
+def test_member_graph_uses_depends_on(workspace):
+    members = [
+        Member("apps/web", workspace / "apps/web", Config(depends_on=["libs/core"])),
+        Member("libs/core", workspace / "libs/core", Config()),
+    ]
+    nodes = member_graph(members, "build", buffered=False)
+    assert nodes[0].needs == ["libs/core"]
+
+
+def test_member_graph_rejects_unknown_dependency(workspace):
+    members = [Member("apps/web", workspace, Config(depends_on=["libs/missing"]))]
+    with pytest.raises(ValueError, match="unknown"):
+        member_graph(members, "build", buffered=False)
+
+
+def test_print_results(capsys):
+    members = [
+        Member("a", None, Config(tool="go")),
+        Member("b", None, Config(tool="uv")),
+        Member("c", None, Config(tool="bun")),
+    ]
+    print_results(members, [NodeResult("a", 0, 1.5), NodeResult("b", 2), NodeResult("c", None)])
+    out = capsys.readouterr().out
+    assert "passed" in out
+    assert "failed (2)" in out
+    assert "skipped" in out
+    assert "1.50s" in out
+
+
+def test_run_workspace_runs_members_in_order(workspace):
+    log = workspace / "log"
+    _member(workspace, "libs/core", test_body=f"sleep 0.2; echo core >> {log}\n")
+    _member(workspace, "apps/web", depends_on=["libs/core"], test_body=f"echo web >> {log}\n")
+    assert run_workspace(workspace, "test") == 0
+    assert log.read_text() == "core\nweb\n"
+
+
+def test_run_workspace_skips_dependents_of_failures(workspace, capsys):
+    log = workspace / "log"
+    _member(workspace, "libs/core", test_body="exit 1\n")
+    _member(workspace, "apps/web", depends_on=["libs/core"], test_body=f"echo web >> {log}\n")
+    assert run_workspace(workspace, "test") == 1
+    assert not log.exists()
+    assert "skipped" in capsys.readouterr().out
+
+
+def test_run_workspace_without_workspace(tmp_path):
+    assert run_workspace(tmp_path, "build") == 1
+
+
+def test_run_workspace_no_members(workspace):
+    assert run_workspace(workspace, "build") == 0
+
+
+def test_run_workspace_cycle(workspace, capsys):
+    _member(workspace, "libs/a", depends_on=["libs/b"])
+    _member(workspace, "libs/b", depends_on=["libs/a"])
+    assert run_workspace(workspace, "build") == 1
+    assert "cycle" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("command", ["build", "test", "install", "clean"])
+def test_cli_workspace_flag(command, workspace, monkeypatch, mocker):
+    monkeypatch.chdir(workspace)
+    run = mocker.patch("pkg.workspace.run_workspace", return_value=0)
+    result = CliRunner().invoke(main, ["-w", command])
+    assert result.exit_code == 0
+    assert run.call_args.args == (workspace, command)
+
+
+def git(root, *args):
+    import subprocess
+
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        cwd=root, check=True, capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(workspace):
+    _member(workspace, "libs/core", test_body="exit 0\n")
+    _member(workspace, "libs/util", test_body="exit 0\n")
+    _member(workspace, "apps/web", depends_on=["libs/core"], test_body="exit 0\n")
+    _member(workspace, "apps/cli", depends_on=["apps/web"], test_body="exit 0\n")
+    (workspace / "libs" / "core" / "src").mkdir()
+    (workspace / "libs" / "core" / "src" / "lib.sh").write_text("echo v1\n")
+    git(workspace, "init", "-q")
+    git(workspace, "add", ".")
+    git(workspace, "commit", "-q", "-m", "init")
+    return workspace
+
+
+def test_owning_member_uses_nearest_project_root(repo):
+    members = discover_members(repo, Config.load(repo))
+    assert owning_member(repo, "libs/core/src/lib.sh", members).name == "libs/core"
+    assert owning_member(repo, "libs/core/gone/deleted.sh", members).name == "libs/core"
+    assert owning_member(repo, "README.md", members) is None
+
+
+def test_affected_members_expands_through_dependents(repo):
+    members = discover_members(repo, Config.load(repo))
+    assert affected_members(members, {"libs/core"}) == {
+        "apps/web": "depends on libs/core",
+        "apps/cli": "depends on apps/web",
+        "libs/core": "changed",
+    }
+    assert affected_members(members, {"libs/util"}) == {"libs/util": "changed"}
+    assert affected_members(members, set()) == {}
+
+
+def test_find_affected_from_git_diff(repo):
+    (repo / "libs" / "core" / "src" / "lib.sh").write_text("echo v2\n")
+    members, reasons = find_affected(repo, "HEAD")
+    assert len(members) == 4
+    assert list(reasons) == ["libs/core", "apps/cli", "apps/web"]
+
+    git(repo, "commit", "-q", "-am", "change core")
+    assert find_affected(repo, "HEAD")[1] == {}
+    assert list(find_affected(repo, "HEAD~1")[1]) == ["libs/core", "apps/cli", "apps/web"]
+
+
+def test_changed_files_bad_ref(repo, capsys):
+    assert changed_files(repo, "no-such-ref") is None
+    assert "git merge-base no-such-ref HEAD failed" in capsys.readouterr().out
+
+
+def test_changed_files_includes_untracked(repo):
+    (repo / "libs" / "util" / "new.sh").write_text("echo new\n")
+    (repo / ".gitignore").write_text("*.log\n")
+    (repo / "libs" / "util" / "debug.log").write_text("")
+    assert changed_files(repo, "HEAD") == [".gitignore", "libs/util/new.sh"]
+    assert changed_files(repo / "libs", "HEAD") == ["util/new.sh"]
+
+
+def test_changed_files_since_merge_base(repo):
+    git(repo, "branch", "-M", "main")
+    git(repo, "checkout", "-q", "-b", "feature")
+    (repo / "libs" / "core" / "src" / "lib.sh").write_text("echo v2\n")
+    git(repo, "commit", "-q", "-am", "change core")
+    git(repo, "checkout", "-q", "main")
+    (repo / "libs" / "util" / "util.sh").write_text("echo main\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "change util on main")
+    git(repo, "checkout", "-q", "feature")
+    assert changed_files(repo, "main") == ["libs/core/src/lib.sh"]
+
+
+def test_changed_files_lists_both_sides_of_a_rename(repo):
+    git(repo, "mv", "libs/core/src/lib.sh", "libs/util/lib.sh")
+    git(repo, "commit", "-q", "-m", "move lib")
+    assert changed_files(repo, "HEAD~1") == ["libs/core/src/lib.sh", "libs/util/lib.sh"]
+    assert list(find_affected(repo, "HEAD~1")[1]) == ["libs/core", "libs/util", "apps/cli", "apps/web"]
+
+
+def test_member_graph_only_keeps_needs_within_selection(workspace):
+    _member(workspace, "libs/core")
+    _member(workspace, "apps/web", depends_on=["libs/core"])
+    members = discover_members(workspace, Config.load(workspace))
+    nodes = member_graph(members, "build", buffered=False, only={"apps/web"})
+    assert [(n.name, n.needs) for n in nodes] == [("apps/web", [])]
+
+
+def test_affected_command_json_and_run(repo, monkeypatch):
+    log = repo / "log"
+    (repo / "libs" / "util" / "tests" / "a_test.sh").write_text(f"echo util >> {log}\n")
+    (repo / "apps" / "web" / "tests" / "a_test.sh").write_text(f"echo web >> {log}\n")
+    monkeypatch.chdir(repo)
+    runner = CliRunner()
+
+    result = runner.invoke(main, ["affected", "--since", "HEAD", "--json"])
+    assert result.exit_code == 0
+    assert result.output.strip() == '["libs/util", "apps/cli", "apps/web"]'
+
+    result = runner.invoke(main, ["affected", "--since", "HEAD", "test"])
+    assert result.exit_code == 0
+    assert "libs/util (changed)" in result.output
+    assert sorted(log.read_text().split()) == ["util", "web"]
+
+
+def test_affected_command_errors(tmp_path_factory, repo, monkeypatch):
+    runner = CliRunner()
+    monkeypatch.chdir(repo)
+    assert runner.invoke(main, ["affected", "--since", "nope"]).exit_code == 1
+    result = runner.invoke(main, ["affected", "--since", "HEAD", "--json", "test"])
+    assert result.exit_code == 2
+    assert "--json cannot be combined with a COMMAND" in result.output
+    monkeypatch.chdir(tmp_path_factory.mktemp("outside"))
+    result = runner.invoke(main, ["affected", "--since", "HEAD"])
+    assert result.exit_code == 1
+    assert "No [workspace] table" in result.output